@@ -0,0 +1,223 @@
+# batch_engine.py - Ejecución de lotes de herramientas con dependencias
+import json
+import time
+from typing import Callable, Dict, List, Optional
+
+from command_runner import Job
+from results import ResultSpool
+from tool_definitions import TOOLS, build_invocation
+
+
+class BatchStep:
+    """Un paso del lote: una herramienta con sus valores y dependencias"""
+
+    PENDING = 'pendiente'
+    WAITING = 'esperando'
+    SKIPPED = 'omitido'
+
+    def __init__(self, step_id: int, tool: str, values: Dict[str, str], depends_on=()):
+        self.id = step_id
+        self.tool = tool
+        self.values = dict(values)
+        self.depends_on = [int(dep) for dep in depends_on]
+        self.status = BatchStep.PENDING
+        self.job: Optional[Job] = None
+
+    @property
+    def is_terminal(self) -> bool:
+        return self.status in (Job.DONE, Job.FAILED, Job.CANCELLED, BatchStep.SKIPPED)
+
+    def describe(self) -> str:
+        return ", ".join(f"{name}={value}" for name, value in self.values.items() if value)
+
+    def to_dict(self) -> Dict:
+        return {'id': self.id, 'tool': self.tool, 'values': self.values, 'depends_on': self.depends_on}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'BatchStep':
+        return cls(data['id'], data['tool'], data.get('values', {}), data.get('depends_on', []))
+
+
+class BatchEngine:
+    """Ejecuta los pasos de un lote en el planificador de CommandRunner.
+
+    Cada paso se envía en cuanto terminan bien todas sus dependencias, así
+    que el lote dura lo que su camino crítico. Los avisos llegan por los
+    callbacks de los trabajos, es decir, en el hilo de la interfaz.
+    timeout es el tiempo máximo de cada paso en segundos.
+    """
+
+    def __init__(self, runner, on_status: Optional[Callable[[BatchStep], None]] = None,
+                 on_output: Optional[Callable[[BatchStep, str], None]] = None,
+                 on_finished: Optional[Callable[[List[BatchStep]], None]] = None,
+                 timeout: int = 300):
+        self.runner = runner
+        self.timeout = timeout
+        self.on_status = on_status
+        self.on_output = on_output
+        self.on_finished = on_finished
+        self.steps: Dict[int, BatchStep] = {}
+        self.started_at = None
+        self.finished_at = None
+        self.is_running = False
+        # Resultados estructurados de la última ejecución, volcados a disco
+        self.results: Optional[ResultSpool] = None
+
+    @staticmethod
+    def validate(steps: List[BatchStep]) -> None:
+        """Comprobar herramientas, dependencias y ausencia de ciclos"""
+        by_id = {step.id: step for step in steps}
+        if len(by_id) != len(steps):
+            raise ValueError("Hay pasos con el mismo número")
+        for step in steps:
+            if step.tool not in TOOLS:
+                raise ValueError(f"Paso #{step.id}: herramienta '{step.tool}' no disponible")
+            build_invocation(step.tool, step.values)
+            for dep in step.depends_on:
+                if dep not in by_id:
+                    raise ValueError(f"Paso #{step.id}: depende de #{dep}, que no existe")
+
+        visiting, visited = set(), set()
+
+        def visit(step_id):
+            if step_id in visited:
+                return
+            if step_id in visiting:
+                raise ValueError(f"Dependencia circular en el paso #{step_id}")
+            visiting.add(step_id)
+            for dep in by_id[step_id].depends_on:
+                visit(dep)
+            visiting.discard(step_id)
+            visited.add(step_id)
+
+        for step in steps:
+            visit(step.id)
+
+    def run(self, steps: List[BatchStep]) -> None:
+        self.validate(steps)
+        self.steps = {step.id: step for step in steps}
+        for step in steps:
+            step.job = None
+            self._set_status(step, BatchStep.WAITING if step.depends_on else BatchStep.PENDING)
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        if self.results:
+            self.results.discard()
+        self.results = ResultSpool()
+        self.is_running = True
+        self._advance()
+
+    def cancel(self) -> None:
+        for step in self.steps.values():
+            if step.job and step.job.is_active:
+                self.runner.cancel_command(step.job)
+            elif not step.job and not step.is_terminal:
+                self._set_status(step, Job.CANCELLED)
+        self._check_finished()
+
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def total_step_time(self) -> float:
+        """Suma de las duraciones individuales (lo que tardaría en serie)"""
+        return sum(step.job.duration() for step in self.steps.values() if step.job)
+
+    def export_results(self, path: str, fmt: Optional[str] = None) -> int:
+        """Exportar los resultados de la última ejecución; devuelve el número de registros"""
+        if not self.results:
+            raise ValueError("No hay resultados: ejecute el lote primero")
+        return self.results.export(path, fmt)
+
+    def close(self) -> None:
+        if self.results:
+            self.results.discard()
+            self.results = None
+
+    def _set_status(self, step: BatchStep, status: str) -> None:
+        step.status = status
+        if self.on_status:
+            self.on_status(step)
+
+    def _advance(self) -> None:
+        """Lanzar los pasos listos y omitir los que dependen de un fallo"""
+        changed = True
+        while changed:
+            changed = False
+            for step in self.steps.values():
+                if step.job or step.is_terminal:
+                    continue
+                deps = [self.steps[dep] for dep in step.depends_on]
+                if any(dep.is_terminal and dep.status != Job.DONE for dep in deps):
+                    self._set_status(step, BatchStep.SKIPPED)
+                    changed = True
+                elif all(dep.status == Job.DONE for dep in deps):
+                    self._submit(step)
+        self._check_finished()
+
+    def _submit(self, step: BatchStep) -> None:
+        command, internal, params = build_invocation(step.tool, step.values)
+        step.job = self.runner.run_command(
+            command, timeout=self.timeout, internal=internal, params=params, name=f"{step.tool} (lote #{step.id})",
+            tool=step.tool, result_callback=self.results.write,
+            output_callback=lambda text: self._on_job_output(step, text),
+            live_callback=lambda text: self._on_job_output(step, text),
+            finished_callback=lambda: self._on_job_finished(step)
+        )
+        self._set_status(step, Job.RUNNING)
+
+    def _on_job_output(self, step: BatchStep, text: str) -> None:
+        if self.on_output:
+            self.on_output(step, text)
+
+    def _on_job_finished(self, step: BatchStep) -> None:
+        self._set_status(step, step.job.status)
+        self._advance()
+
+    def _check_finished(self) -> None:
+        if self.is_running and all(step.is_terminal for step in self.steps.values()):
+            self.is_running = False
+            self.finished_at = time.monotonic()
+            self.results.flush()
+            if self.on_finished:
+                self.on_finished(list(self.steps.values()))
+
+
+def write_batch_file(path: str, steps: List[BatchStep]) -> None:
+    """Guardar un lote en disco como JSON"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'version': 1, 'steps': [step.to_dict() for step in steps]}, f, indent=2, ensure_ascii=False)
+
+
+def _parse_step(number: int, item) -> BatchStep:
+    if not isinstance(item, dict):
+        raise ValueError(f"el paso {number} no es un objeto")
+    if 'id' not in item or 'tool' not in item:
+        raise ValueError(f"al paso {number} le falta 'id' o 'tool'")
+    values = item.get('values', {})
+    depends_on = item.get('depends_on', [])
+    if not isinstance(values, dict) or not isinstance(depends_on, list):
+        raise ValueError(f"paso {number}: 'values' debe ser un objeto y 'depends_on' una lista")
+    try:
+        return BatchStep(int(item['id']), str(item['tool']),
+                         {str(name): '' if value is None else str(value) for name, value in values.items()},
+                         depends_on)
+    except (TypeError, ValueError):
+        raise ValueError(f"paso {number}: 'id' y 'depends_on' deben ser números") from None
+
+
+def read_batch_file(path: str) -> List[BatchStep]:
+    """Cargar un lote guardado con write_batch_file; ValueError si el archivo no es un lote"""
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            data = json.load(f)
+        except ValueError as e:
+            raise ValueError(f"Archivo de lote inválido: {e}") from None
+    steps = data.get('steps') if isinstance(data, dict) else None
+    if not isinstance(steps, list):
+        raise ValueError("Archivo de lote inválido: se esperaba un objeto con la lista 'steps'")
+    try:
+        return [_parse_step(number, item) for number, item in enumerate(steps, 1)]
+    except ValueError as e:
+        raise ValueError(f"Archivo de lote inválido: {e}") from None
@@ -0,0 +1,79 @@
+# bench_formatter.py - Coste por línea del resaltado incremental (StreamingFormatter)
+"""OutputFormatter aparece solo como referencia: antepone un emoji con
+cuatro comprobaciones por línea y no produce etiquetas de color, así que
+es más barato por línea que StreamingFormatter, que comprueba todas las
+reglas de la herramienta y las comunes. Lo que se gana con
+StreamingFormatter es el color y no volver a pintar la salida.
+
+El volcado de netstat alterna estados al azar, de modo que la etiqueta
+cambia casi en cada línea: los segmentos por bloque son el peor caso
+(las líneas seguidas con la misma etiqueta ya se unen en un segmento).
+Todos los segmentos de un bloque se insertan en una sola llamada.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import OutputFormatter, StreamingFormatter
+
+STATES = ['ESTABLISHED', 'LISTEN', 'TIME_WAIT', 'CLOSE_WAIT', 'SYN_SENT']
+
+
+def netstat_dump(lines):
+    rng = random.Random(42)
+    return ''.join(
+        f"tcp        0      0 192.168.1.{rng.randint(2, 254)}:{rng.randint(1024, 65535)}     "
+        f"93.184.216.{rng.randint(1, 254)}:443      {rng.choice(STATES)}\n"
+        for _ in range(lines)
+    )
+
+
+def measure(function, text, chunk_lines, repeat=3):
+    """Aplicar el formateador bloque a bloque, como llega la salida a la terminal (mejor de repeat)"""
+    lines = text.splitlines(True)
+    chunks = [''.join(lines[i:i + chunk_lines]) for i in range(0, len(lines), chunk_lines)]
+    elapsed = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for chunk in chunks:
+            function(chunk)
+        elapsed = min(elapsed, time.perf_counter() - started)
+    return {'seconds': round(elapsed, 4), 'us_per_line': round(elapsed / len(lines) * 1e6, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del resaltado de salida")
+    parser.add_argument('--lines', type=int, default=100000)
+    parser.add_argument('--chunk-lines', type=int, default=500, help="Líneas por bloque entregado")
+    parser.add_argument('--repeat', type=int, default=3, help="Repeticiones (se queda la mejor)")
+    parser.add_argument('--json', action='store_true', help="Imprimir el resultado en JSON")
+    args = parser.parse_args()
+
+    text = netstat_dump(args.lines)
+    formatter = StreamingFormatter.for_tool('NETSTAT')
+    results = {
+        'lines': args.lines,
+        'streaming': measure(formatter.segments, text, args.chunk_lines, args.repeat),
+        'legacy_reference': measure(OutputFormatter.format_netstat_output, text, args.chunk_lines, args.repeat),
+        'segments_per_chunk': round(
+            len(formatter.segments(text)) / max(1, args.lines / args.chunk_lines), 1),
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{args.lines} líneas de netstat en bloques de {args.chunk_lines}")
+        print(f"  StreamingFormatter: {results['streaming']['us_per_line']:.2f} µs/línea")
+        print(f"  OutputFormatter:    {results['legacy_reference']['us_per_line']:.2f} µs/línea "
+              f"(referencia, sin etiquetas de color)")
+        print(f"  Segmentos etiquetados por bloque: {results['segments_per_chunk']} "
+              f"(estados al azar: peor caso)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# bench_output.py - Líneas/s pintadas en la terminal: entrega línea a línea frente a entrega por lotes
+"""Cuenta además las actualizaciones del widget (llamadas a la salida).
+
+Con Tk cada actualización es un insert(), un see() y dos config(), así
+que la diferencia en líneas/s crece con el coste de pintar. Sin pantalla
+(--headless o sin Tk) solo se mide el bombeo de la cola: la entrega por
+líneas paga igualmente un mensaje y una llamada por línea.
+"""
+import argparse
+import heapq
+import itertools
+import json
+import os
+import queue
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from command_runner import CommandRunner
+
+LINE = "tcp        0      0 192.168.100.200:52344     93.184.216.34:443      ESTABLISHED"
+
+
+class HeadlessRoot:
+    """Sustituto mínimo de Tk.after para medir el bombeo sin pantalla"""
+
+    def __init__(self):
+        self._timers = []
+        self._ids = itertools.count()
+
+    def after(self, ms, callback, *args):
+        heapq.heappush(self._timers, (time.perf_counter() + ms / 1000, next(self._ids), callback, args))
+
+    def winfo_exists(self):
+        return True
+
+    def update(self):
+        while self._timers and self._timers[0][0] <= time.perf_counter():
+            _, _, callback, args = heapq.heappop(self._timers)
+            callback(*args)
+        time.sleep(0.0005)
+
+
+class PerLineRunner(CommandRunner):
+    """Entrega anterior: un mensaje por línea en la cola y una llamada a la terminal por mensaje.
+
+    El lector actual encola bloques de hasta 64 KB; para reproducir el
+    readline() de antes cada bloque se parte en líneas antes de encolarlo.
+    """
+
+    def _execute(self, job):
+        enqueue = job.output
+
+        def output_per_line(text, kind='output'):
+            for line in text.splitlines(True):
+                enqueue(line, kind)
+
+        job.output = output_per_line
+        super()._execute(job)
+
+    def _drain_job(self, job, deadline):
+        processed_any = False
+        while True:
+            try:
+                msg_type, content = job.queue.get_nowait()
+            except queue.Empty:
+                break
+            processed_any = True
+            if msg_type in ('output', 'info'):
+                job._release(len(content))
+                job.output_callback(content)
+            elif msg_type == 'finished':
+                self._active.pop(job.id, None)
+                job.output_callback(content + "\n")
+                job.finished_callback()
+                break
+        return processed_any, False
+
+
+def make_sink(use_tk):
+    if not use_tk:
+        rendered = []
+        return HeadlessRoot(), rendered.append
+
+    import tkinter as tk
+    from tkinter import scrolledtext
+    root = tk.Tk()
+    area = scrolledtext.ScrolledText(root, state=tk.DISABLED)
+    area.pack()
+
+    def append_output(text):
+        # Igual que NetworkApp.append_output
+        area.config(state=tk.NORMAL)
+        area.insert(tk.END, text)
+        area.see(tk.END)
+        area.config(state=tk.DISABLED)
+
+    return root, append_output
+
+
+def run_case(runner_class, lines, use_tk):
+    root, render = make_sink(use_tk)
+    finished = []
+    updates = [0]
+
+    def sink(text):
+        updates[0] += 1
+        render(text)
+
+    runner = runner_class(root)
+    script = f"import sys\nfor i in range({lines}): sys.stdout.write({LINE!r} + '\\n')"
+    started = time.perf_counter()
+    runner.run_command([sys.executable, '-c', script], output_callback=sink,
+                       finished_callback=lambda: finished.append(time.perf_counter()))
+    while not finished:
+        root.update()
+    elapsed = finished[0] - started
+    runner.shutdown()
+    if use_tk:
+        root.destroy()
+    return {'lines': lines, 'seconds': round(elapsed, 4), 'lines_per_second': round(lines / elapsed),
+            'updates': updates[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de entrega de salida a la terminal")
+    parser.add_argument('--lines', type=int, default=50000)
+    parser.add_argument('--headless', action='store_true', help="No usar Tk (mide solo el bombeo de la cola)")
+    parser.add_argument('--json', action='store_true', help="Imprimir el resultado en JSON")
+    args = parser.parse_args()
+
+    use_tk = not args.headless
+    if use_tk:
+        try:
+            import tkinter as tk
+            tk.Tk().destroy()
+        except Exception as e:
+            print(f"Tk no disponible ({e}); usando modo sin pantalla", file=sys.stderr)
+            use_tk = False
+
+    results = {
+        'mode': 'tk' if use_tk else 'headless',
+        'per_line': run_case(PerLineRunner, args.lines, use_tk),
+        'batched': run_case(CommandRunner, args.lines, use_tk),
+    }
+    results['speedup'] = round(results['batched']['lines_per_second'] / results['per_line']['lines_per_second'], 2)
+    results['updates_ratio'] = round(results['per_line']['updates'] / max(1, results['batched']['updates']), 1)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"Modo: {results['mode']} | {args.lines} líneas")
+        for case in ('per_line', 'batched'):
+            r = results[case]
+            print(f"  {case:<9} {r['lines_per_second']:>10} líneas/s ({r['seconds']}s), "
+                  f"{r['updates']} actualizaciones del widget")
+        print(f"  Mejora: x{results['speedup']} en líneas/s, x{results['updates_ratio']} menos actualizaciones")
+        if results['mode'] == 'headless':
+            print("  (sin Tk solo se mide el bombeo de la cola, no el coste de pintar)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# bench_startup.py - Arranque en frío: importación de módulos y tiempo hasta la primera ventana
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Se ejecuta en un intérprete nuevo para medir un arranque en frío real
+CHILD = r"""
+import json, sys, time
+started = time.time()
+import main
+imported = time.time()
+window = None
+try:
+    root = main.tk.Tk()
+except Exception as e:
+    error = str(e)
+else:
+    error = None
+    app = main.NetworkApp(root)
+    main.EnhancedNetworkApp(app)
+    root.update()
+    window = time.time()
+    app.runner.shutdown()
+    root.destroy()
+heavy = sorted(m for m in ('matplotlib', 'numpy', 'psutil') if m in sys.modules)
+print(json.dumps({'started': started, 'imported': imported, 'window': window, 'error': error, 'heavy': heavy}))
+"""
+
+
+def measure_once():
+    launched = time.time()
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    data = json.loads(output.strip().splitlines()[-1])
+    result = {
+        'interpreter_ms': (data['started'] - launched) * 1000,
+        'import_ms': (data['imported'] - data['started']) * 1000,
+        'window_ms': None,
+        'heavy_modules': data['heavy'],
+        'display_error': data['error'],
+    }
+    if data['window'] is not None:
+        result['window_ms'] = (data['window'] - data['imported']) * 1000
+        result['total_ms'] = (data['window'] - launched) * 1000
+    else:
+        result['total_ms'] = (data['imported'] - launched) * 1000
+    return result
+
+
+def slowest_imports(count=10):
+    """Módulos con más tiempo acumulado según -X importtime"""
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'], cwd=ROOT, capture_output=True, text=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative) / 1000, name.rstrip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de arranque de la aplicación")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=800,
+                        help="Umbral de regresión para la mediana del tiempo total")
+    parser.add_argument('--details', action='store_true', help="Mostrar los módulos más lentos de importar")
+    parser.add_argument('--json', action='store_true', help="Imprimir el resultado en JSON")
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.runs)]
+    results = {
+        'runs': args.runs,
+        'budget_ms': args.budget_ms,
+        'mode': 'window' if runs[0]['window_ms'] is not None else 'import-only',
+        'heavy_modules': runs[0]['heavy_modules'],
+    }
+    for key in ('interpreter_ms', 'import_ms', 'window_ms', 'total_ms'):
+        values = [run[key] for run in runs if run[key] is not None]
+        results[key] = round(statistics.median(values), 1) if values else None
+    results['passed'] = results['total_ms'] <= args.budget_ms and not results['heavy_modules']
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"Modo: {results['mode']} | mediana de {args.runs} arranques")
+        if results['mode'] == 'import-only':
+            print(f"  (sin pantalla: {runs[0]['display_error']})")
+        print(f"  Intérprete:        {results['interpreter_ms']:8.1f} ms")
+        print(f"  Importar main:     {results['import_ms']:8.1f} ms")
+        if results['window_ms'] is not None:
+            print(f"  Primera ventana:   {results['window_ms']:8.1f} ms")
+        print(f"  Total:             {results['total_ms']:8.1f} ms (umbral {args.budget_ms:.0f} ms)")
+        if results['heavy_modules']:
+            print(f"  ⚠️ Dependencias pesadas cargadas al arrancar: {', '.join(results['heavy_modules'])}")
+        if args.details:
+            print("\nMódulos más lentos (acumulado):")
+            for ms, name in slowest_imports():
+                print(f"  {ms:8.1f} ms  {name.strip()}")
+        print("✅ Dentro del presupuesto" if results['passed'] else "❌ Regresión de arranque")
+
+    return 0 if results['passed'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
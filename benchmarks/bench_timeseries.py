@@ -0,0 +1,81 @@
+# bench_timeseries.py - Espacio en disco y coste del almacén de series de las sondas
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timeseries import DEFAULT_RETENTION, TimeSeriesStore
+
+START = 1_700_000_000
+
+
+def database_bytes(store):
+    store._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(store.path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del almacén de series temporales")
+    parser.add_argument('--targets', type=int, default=300)
+    parser.add_argument('--minutes', type=int, default=20, help="Minutos simulados de sondas cada segundo")
+    parser.add_argument('--json', action='store_true', help="Imprimir el resultado en JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as directory:
+        store = TimeSeriesStore(os.path.join(directory, 'bench.sqlite3'))
+        targets = [f"10.0.{i // 256}.{i % 256}" for i in range(args.targets)]
+        seconds = args.minutes * 60
+        started = time.perf_counter()
+        for second in range(seconds):
+            for target in targets:
+                store.append('ping', target, None if rng.random() < 0.02 else rng.uniform(1, 80), START + second)
+            store.flush()
+        insert_s = time.perf_counter() - started
+        raw_bytes = database_bytes(store)
+
+        started = time.perf_counter()
+        store.rollup(now=START + seconds + 3600)
+        rollup_s = time.perf_counter() - started
+        counts = store.row_counts()
+        store.close()
+
+    samples = seconds * args.targets
+    per_sample = raw_bytes / samples
+    # Proyección de una semana con la retención por defecto
+    week = 7 * 86400
+    raw_rows = min(week, DEFAULT_RETENTION['raw']) * args.targets
+    minute_rows = min(week, DEFAULT_RETENTION['rollup_1m']) // 60 * args.targets
+    hour_rows = min(week, DEFAULT_RETENTION['rollup_1h']) // 3600 * args.targets
+    # Una fila de resumen ocupa aproximadamente lo que tres muestras
+    week_bytes = (raw_rows + 3 * (minute_rows + hour_rows)) * per_sample
+    results = {
+        'targets': args.targets,
+        'samples': samples,
+        'insert_us_per_sample': round(insert_s / samples * 1e6, 2),
+        'bytes_per_sample': round(per_sample, 1),
+        'rollup_seconds': round(rollup_s, 3),
+        'rows': counts,
+        'week_without_rollups_mb': round(week * args.targets * per_sample / 1e6, 1),
+        'week_with_retention_mb': round(week_bytes / 1e6, 1),
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{args.targets} destinos × {args.minutes} min a 1 muestra/s ({samples} muestras)")
+        print(f"  Inserción:            {results['insert_us_per_sample']:8.2f} µs/muestra")
+        print(f"  Disco (sin resumir):  {results['bytes_per_sample']:8.1f} bytes/muestra")
+        print(f"  Resumen 1m/1h:        {results['rollup_seconds']:8.3f} s")
+        print(f"  Una semana en bruto:  {results['week_without_rollups_mb']:8.1f} MB")
+        print(f"  Una semana resumida:  {results['week_with_retention_mb']:8.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
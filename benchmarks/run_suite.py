@@ -0,0 +1,312 @@
+# run_suite.py - Batería de benchmarks reproducible contra servicios locales, con resultados en JSON
+"""Mide el rendimiento de las herramientas contra los servicios de
+stand_ins.py, sin tocar la red, y guarda el resultado para compararlo
+entre versiones:
+
+    python benchmarks/run_suite.py                       # guarda benchmarks/results/<versión>.json
+    python benchmarks/run_suite.py --compare benchmarks/results/v1.2.json --tolerance 15
+
+Con --compare termina con código 1 si alguna métrica empeora más del
+porcentaje indicado respecto a la referencia. udp_echo no mide código
+de la aplicación: sirve para ver si la máquina es más lenta que la de
+la referencia antes de culpar a un cambio.
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from bench_output import run_case
+from bench_startup import measure_once
+from command_runner import CommandRunner, executable_resolver
+from stand_ins import HOST, StandIns
+from utils import NetworkUtils
+
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+
+def metric(value, unit, higher_is_better=True, **details):
+    return dict(details, value=round(value, 2), unit=unit, higher_is_better=higher_is_better)
+
+
+def run_jobs(runner, commands, params_list):
+    """Lanzar un trabajo interno por juego de parámetros y esperar a todos"""
+    jobs = [runner.run_command(command, internal=True, params=params, output_callback=lambda text: None,
+                               finished_callback=lambda: None)
+            for command, params in zip(commands, params_list)]
+    runner.wait(jobs)
+    return jobs
+
+
+def bench_scanner(services, rounds):
+    ports = services.farm.ports
+    # Tantos puertos cerrados como abiertos, fuera del rango efímero de la granja
+    closed = [port for port in range(20000, 20000 + len(ports)) if port not in ports]
+    ports_str = ','.join(map(str, ports + closed))
+    total = len(ports) + len(closed)
+    runner = CommandRunner(None)
+    try:
+        started = time.perf_counter()
+        run_jobs(runner, ["internal_port_scanner"] * rounds, [{'host': HOST, 'ports': ports_str}] * rounds)
+        elapsed = time.perf_counter() - started
+    finally:
+        runner.shutdown()
+    return metric(total * rounds / elapsed, 'puertos/s', ports=total, rounds=rounds)
+
+
+def bench_sweep(services, hosts, workers):
+    port = services.farm.ports[0]
+    # Todo 127.0.0.0/8 es loopback en Linux: cada dirección contesta (abierto o rechazado)
+    addresses = [f"127.0.{i // 254}.{i % 254 + 1}" for i in range(hosts)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda host: NetworkUtils.scan_port(host, port, 1.0), addresses))
+    elapsed = time.perf_counter() - started
+    answered = sum(1 for result in results if result.rtt_ms < 1000)
+    return metric(hosts / elapsed, 'hosts/s', hosts=hosts, answered=answered, workers=workers)
+
+
+def dns_query(sock, name, query_id):
+    """Consulta A mínima por un socket UDP conectado; True si llega una respuesta con registros"""
+    question = b''.join(bytes([len(label)]) + label for label in name.encode().split(b'.'))
+    sock.send(struct.pack('!HHHHHH', query_id, 0x0100, 1, 0, 0, 0) + question + b'\0' + struct.pack('!HH', 1, 1))
+    reply = sock.recv(512)
+    return len(reply) >= 12 and struct.unpack('!H', reply[:2])[0] == query_id and struct.unpack('!H', reply[6:8])[0] > 0
+
+
+def bench_dns(services, names, workers=8):
+    """Consultas directas al DNS de prueba: no depende de qué herramientas tenga la máquina"""
+    domains = [f"host{i}.bench.test" for i in range(names)]
+
+    def resolve_slice(offset):
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.settimeout(1)
+            s.connect((HOST, services.dns.port))
+            return sum(1 for i in range(offset, names, workers) if not dns_query(s, domains[i], i & 0xFFFF))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        failed = sum(executor.map(resolve_slice, range(workers)))
+    elapsed = time.perf_counter() - started
+    return metric(names / elapsed, 'nombres/s', names=names, failed=failed, workers=workers)
+
+
+def bench_nslookup(services, names):
+    """La herramienta real contra el DNS de prueba; None si nslookup no está instalado"""
+    if not executable_resolver.exists('nslookup'):
+        return None
+    domains = [f"host{i}.bench.test" for i in range(names)]
+    runner = CommandRunner(None, max_workers=8)
+    try:
+        started = time.perf_counter()
+        jobs = [runner.run_command(['nslookup', f'-port={services.dns.port}', domain, HOST],
+                                   output_callback=lambda text: None, finished_callback=lambda: None)
+                for domain in domains]
+        runner.wait(jobs)
+        elapsed = time.perf_counter() - started
+    finally:
+        runner.shutdown()
+    return metric(names / elapsed, 'nombres/s', names=names)
+
+
+def bench_whois(services, queries, workers):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(
+            lambda i: NetworkUtils.whois_query(f"dominio{i}.test", HOST, 2.0, services.whois.port),
+            range(queries)))
+    elapsed = time.perf_counter() - started
+    failed = sum(1 for result in results if not result.success)
+    return metric(queries / elapsed, 'consultas/s', queries=queries, failed=failed, workers=workers)
+
+
+def bench_subnet(networks):
+    cidrs = [f"10.{i // 256 % 256}.{i % 256}.0/{16 + i % 15}" for i in range(networks)]
+    runner = CommandRunner(None, max_workers=8)
+    try:
+        # Calentar el planificador para no medir la creación de sus hilos
+        run_jobs(runner, ["internal_subnet_calculator"] * 50, [{'network': cidr} for cidr in cidrs[:50]])
+        started = time.perf_counter()
+        run_jobs(runner, ["internal_subnet_calculator"] * networks, [{'network': cidr} for cidr in cidrs])
+        elapsed = time.perf_counter() - started
+    finally:
+        runner.shutdown()
+    return metric(networks / elapsed, 'redes/s', networks=networks)
+
+
+def bench_udp_echo(services, packets):
+    """Referencia de la máquina: ida y vuelta UDP por loopback sin código de la aplicación"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.settimeout(1)
+        s.connect((HOST, services.udp_echo.port))
+        started = time.perf_counter()
+        for _ in range(packets):
+            s.send(b'x' * 64)
+            s.recv(64)
+        elapsed = time.perf_counter() - started
+    return metric(packets / elapsed, 'paquetes/s', packets=packets)
+
+
+def bench_timeout(services, timeout):
+    started = time.perf_counter()
+    result = NetworkUtils.scan_port(HOST, services.blackhole.port, timeout)
+    elapsed = time.perf_counter() - started
+    # Sobrecoste de un tiempo agotado respecto al pedido; menos es mejor
+    return metric((elapsed - timeout) * 1000, 'ms', higher_is_better=False,
+                  timeout_ms=timeout * 1000, open=result.open)
+
+
+def bench_startup(runs):
+    totals = [measure_once()['total_ms'] for _ in range(runs)]
+    return metric(statistics.median(totals), 'ms', higher_is_better=False, runs=runs)
+
+
+def version_label():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty', '--tags'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'sin-version'
+
+
+def best(first, second):
+    """El mejor de dos resultados de la misma métrica"""
+    if first is None:
+        return second
+    better = second['value'] > first['value'] if second['higher_is_better'] else second['value'] < first['value']
+    return second if better else first
+
+
+def run_suite(args):
+    metrics = {}
+    skipped = set()
+    # Cada medida se repite y se queda la mejor, que es la menos afectada por el ruido de la máquina
+    with StandIns(args.ports) as services:
+        for _ in range(args.repeat):
+            round_metrics = {
+                'udp_echo': bench_udp_echo(services, args.packets),
+                'scanner': bench_scanner(services, args.rounds),
+                'sweep': bench_sweep(services, args.hosts, args.workers),
+                'dns': bench_dns(services, args.names),
+                'nslookup': bench_nslookup(services, args.names),
+                'whois': bench_whois(services, args.queries, args.workers),
+                'timeout_overshoot': bench_timeout(services, 0.5),
+                'subnet': bench_subnet(args.networks),
+                # Sin Tk: mide el bombeo de la cola, no el coste de pintar (ver bench_output.py)
+                'output': metric(run_case(CommandRunner, args.lines, use_tk=False)['lines_per_second'],
+                                 'líneas/s', lines=args.lines),
+            }
+            for name, value in round_metrics.items():
+                if value is None:
+                    skipped.add(name)
+                else:
+                    metrics[name] = best(metrics.get(name), value)
+    if args.startup_runs:
+        metrics['startup'] = bench_startup(args.startup_runs)
+    return {
+        'label': args.label or version_label(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'metrics': metrics,
+        # Medidas que esta máquina no puede hacer (p. ej. nslookup sin instalar)
+        'skipped': sorted(skipped),
+    }
+
+
+def _parameters(m):
+    return {key: value for key, value in m.items() if key not in ('value', 'unit', 'higher_is_better')}
+
+
+def compare(current, baseline, tolerance):
+    """Filas (nombre, antes, ahora, cambio %, regresión) de las métricas comunes.
+
+    Las métricas medidas con parámetros distintos (p. ej. otro número de
+    líneas) se muestran pero no cuentan como regresión (regresión = None).
+    """
+    rows = []
+    for name, now in current['metrics'].items():
+        before = baseline.get('metrics', {}).get(name)
+        if not before or not before['value']:
+            continue
+        change = (now['value'] - before['value']) / abs(before['value']) * 100
+        if _parameters(now) != _parameters(before):
+            rows.append((name, before['value'], now['value'], change, None))
+            continue
+        worse = -change if now.get('higher_is_better', True) else change
+        # Métricas en ms cercanas a cero: se ignoran variaciones por debajo de 1 ms
+        if now['unit'] == 'ms' and abs(now['value'] - before['value']) < 1:
+            worse = 0
+        rows.append((name, before['value'], now['value'], change, worse > tolerance))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de las herramientas contra servicios locales")
+    parser.add_argument('--label', help="nombre del resultado (por defecto git describe)")
+    parser.add_argument('--output', help="archivo JSON de salida (por defecto benchmarks/results/<label>.json)")
+    parser.add_argument('--compare', metavar='JSON', help="resultado de referencia con el que comparar")
+    parser.add_argument('--tolerance', type=float, default=15.0, help="empeoramiento admitido en %% (15)")
+    parser.add_argument('--ports', type=int, default=200, help="puertos abiertos en la granja")
+    parser.add_argument('--rounds', type=int, default=5, help="escaneos completos de la granja")
+    parser.add_argument('--hosts', type=int, default=1000, help="direcciones del barrido")
+    parser.add_argument('--workers', type=int, default=64)
+    parser.add_argument('--names', type=int, default=500)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--networks', type=int, default=500)
+    parser.add_argument('--packets', type=int, default=5000)
+    parser.add_argument('--lines', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3, help="repeticiones de cada medida (se queda la mejor)")
+    parser.add_argument('--startup-runs', type=int, default=3, help="0 para omitir el arranque")
+    parser.add_argument('--json', action='store_true', help="imprimir el resultado en JSON")
+    args = parser.parse_args()
+
+    result = run_suite(args)
+    path = args.output or os.path.join(RESULTS_DIR, f"{result['label']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    else:
+        print(f"{result['label']} | Python {result['python']} | {result['platform']}")
+        for name, m in result['metrics'].items():
+            print(f"  {name:<18}{m['value']:>14,.2f} {m['unit']}")
+        for name in result['skipped']:
+            print(f"  {name:<18}{'omitida':>14}")
+        print(f"Guardado en {path}")
+
+    if not args.compare:
+        return 0
+    with open(args.compare, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    rows = compare(result, baseline, args.tolerance)
+    print(f"\nComparación con {baseline.get('label', args.compare)} (tolerancia {args.tolerance:.0f}%):")
+    for name, before, now, change, regressed in rows:
+        mark = "≠ " if regressed is None else "❌" if regressed else "  "
+        print(f"{mark} {name:<18}{before:>14,.2f} → {now:>14,.2f}  ({change:+.1f}%)")
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(f"Regresiones: {', '.join(regressions)}")
+        return 1
+    print("✅ Sin regresiones")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
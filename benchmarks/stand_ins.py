@@ -0,0 +1,223 @@
+# stand_ins.py - Servicios locales de prueba para medir las herramientas sin depender de la red
+"""Servidores en loopback que sustituyen a los destinos reales:
+
+    ListenerFarm  muchos puertos TCP abiertos (escáner, barrido)
+    UdpEcho       eco UDP (referencia de la velocidad de la máquina)
+    StubDns       DNS mínimo que responde A 127.0.0.1 a cualquier nombre
+    FakeWhois     WHOIS con una respuesta fija
+    Blackhole     puerto que nunca completa la conexión (tiempos agotados)
+
+Todos escuchan en 127.0.0.1 en puertos efímeros y se usan como
+contextos: with StandIns() as services: services.whois.port ...
+"""
+import selectors
+import socket
+import struct
+import threading
+from abc import ABC, abstractmethod
+
+HOST = '127.0.0.1'
+
+WHOIS_REPLY = (
+    "% Servidor WHOIS de prueba\r\n"
+    "domain:       {domain}\r\n"
+    "status:       ACTIVE\r\n"
+    "nserver:      ns1.{domain}\r\n"
+    "created:      2000-01-01\r\n"
+    "source:       stand-in\r\n"
+)
+
+
+class _Service(ABC):
+    """Hilo de servicio que se detiene al cerrar sus sockets"""
+
+    def __init__(self, name):
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=2)
+        self._close_sockets()
+
+    @abstractmethod
+    def _serve(self):
+        """Atender peticiones hasta que se pida parar (se ejecuta en el hilo del servicio)"""
+
+    @abstractmethod
+    def _close_sockets(self):
+        """Cerrar los sockets del servicio"""
+
+
+class ListenerFarm(_Service):
+    """count puertos TCP escuchando; las conexiones se aceptan y se cierran"""
+
+    def __init__(self, count=200):
+        super().__init__('farm')
+        self._selector = selectors.DefaultSelector()
+        self.sockets = []
+        for _ in range(count):
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            s.bind((HOST, 0))
+            s.listen(128)
+            s.setblocking(False)
+            self._selector.register(s, selectors.EVENT_READ)
+            self.sockets.append(s)
+        self.ports = [s.getsockname()[1] for s in self.sockets]
+
+    def _serve(self):
+        while not self._stop.is_set():
+            for key, _ in self._selector.select(timeout=0.1):
+                try:
+                    connection, _ = key.fileobj.accept()
+                    connection.close()
+                except OSError:
+                    pass
+
+    def _close_sockets(self):
+        self._selector.close()
+        for s in self.sockets:
+            s.close()
+
+
+class _UdpService(_Service):
+    def __init__(self, name):
+        super().__init__(name)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((HOST, 0))
+        self.socket.settimeout(0.1)
+        self.port = self.socket.getsockname()[1]
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                data, address = self.socket.recvfrom(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            reply = self.reply(data)
+            if reply:
+                self.socket.sendto(reply, address)
+
+    def reply(self, data):
+        return data
+
+    def _close_sockets(self):
+        self.socket.close()
+
+
+class UdpEcho(_UdpService):
+    def __init__(self):
+        super().__init__('udp-echo')
+
+
+class StubDns(_UdpService):
+    """Responde a cualquier consulta A con 127.0.0.1 y al resto sin respuestas"""
+
+    def __init__(self):
+        super().__init__('stub-dns')
+
+    def reply(self, data):
+        if len(data) < 12:
+            return None
+        end = 12
+        while end < len(data) and data[end]:
+            end += data[end] + 1
+        question = data[12:end + 5]
+        qtype = struct.unpack('!H', question[-4:-2])[0] if len(question) >= 5 else 0
+        answers = 1 if qtype == 1 else 0
+        header = data[:2] + struct.pack('!HHHHH', 0x8180, 1, answers, 0, 0)
+        if not answers:
+            return header + question
+        # Nombre comprimido apuntando a la pregunta, tipo A, clase IN, TTL 60
+        answer = struct.pack('!HHHIH', 0xC00C, 1, 1, 60, 4) + socket.inet_aton(HOST)
+        return header + question + answer
+
+
+class FakeWhois(_Service):
+    """WHOIS de prueba: lee la consulta, responde WHOIS_REPLY y cierra"""
+
+    def __init__(self):
+        super().__init__('fake-whois')
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((HOST, 0))
+        self.socket.listen(128)
+        self.socket.settimeout(0.1)
+        self.port = self.socket.getsockname()[1]
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                connection, _ = self.socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            with connection:
+                connection.settimeout(2)
+                try:
+                    domain = connection.recv(1024).decode(errors='ignore').strip()
+                    connection.sendall(WHOIS_REPLY.format(domain=domain).encode())
+                except OSError:
+                    pass
+
+    def _close_sockets(self):
+        self.socket.close()
+
+
+class Blackhole:
+    """Puerto cuya cola de conexiones está llena y nunca se vacía.
+
+    En Linux los SYN siguientes se descartan sin respuesta, así que un
+    connect() espera hasta agotar su tiempo, como ante un cortafuegos
+    que descarta paquetes.
+    """
+
+    def __init__(self):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.bind((HOST, 0))
+        self.socket.listen(0)
+        self.port = self.socket.getsockname()[1]
+        # Llenar la cola con conexiones que nadie acepta
+        self._fillers = []
+        for _ in range(8):
+            filler = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            filler.setblocking(False)
+            filler.connect_ex((HOST, self.port))
+            self._fillers.append(filler)
+
+    def start(self):
+        return self
+
+    def close(self):
+        for filler in self._fillers:
+            filler.close()
+        self.socket.close()
+
+
+class StandIns:
+    """Todos los servicios de prueba arrancados juntos"""
+
+    def __init__(self, farm_ports=200):
+        self.farm = ListenerFarm(farm_ports)
+        self.udp_echo = UdpEcho()
+        self.dns = StubDns()
+        self.whois = FakeWhois()
+        self.blackhole = Blackhole()
+        self._services = [self.farm, self.udp_echo, self.dns, self.whois, self.blackhole]
+
+    def __enter__(self):
+        for service in self._services:
+            service.start()
+        return self
+
+    def __exit__(self, *exc):
+        for service in self._services:
+            service.close()
+        return False
@@ -0,0 +1,153 @@
+# cancellation.py - Cancelación cooperativa y presupuesto de tiempo para las herramientas internas
+import errno
+import select
+import selectors
+import socket
+import threading
+import time
+from typing import Optional
+
+# connect() no bloqueante en curso (Linux/macOS y Windows)
+_IN_PROGRESS = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, 10035}
+
+
+class Cancelled(Exception):
+    """La operación se interrumpió por cancelación o por agotar el presupuesto"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancelToken:
+    """Señal de cancelación con un plazo total opcional.
+
+    Las esperas en sockets hechas con connect_ex(), recv() o wait() vigilan
+    además un socket interno de aviso, así que cancel() las despierta al
+    momento en lugar de esperar a que venza el tiempo de cada operación.
+    El presupuesto acota todas las esperas: ninguna pasa del plazo.
+    close() libera ese socket; después el token ya no admite esperas en sockets.
+    """
+
+    CANCELLED = "cancelado por el usuario"
+    EXPIRED = "tiempo máximo agotado"
+
+    def __init__(self, budget: Optional[float] = None):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._wake = None
+        self._closed = False
+        self.reason: Optional[str] = None
+        self.deadline: Optional[float] = None
+        if budget:
+            self.start_budget(budget)
+
+    def start_budget(self, budget: float) -> None:
+        """Empezar a contar el presupuesto (segundos) desde ahora"""
+        self.deadline = time.monotonic() + budget
+
+    def clear_budget(self) -> None:
+        self.deadline = None
+
+    def cancel(self, reason: str = CANCELLED) -> None:
+        with self._lock:
+            if self.reason is None:
+                self.reason = reason
+            self._event.set()
+            if self._wake:
+                try:
+                    self._wake[1].send(b'\0')
+                except OSError:
+                    pass
+
+    @property
+    def cancelled(self) -> bool:
+        if self._event.is_set():
+            return True
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel(self.EXPIRED)
+            return True
+        return False
+
+    @property
+    def expired(self) -> bool:
+        return self.cancelled and self.reason == self.EXPIRED
+
+    def remaining(self, timeout: Optional[float] = None) -> Optional[float]:
+        """El menor entre timeout y lo que queda de presupuesto (None = sin límite)"""
+        if self.deadline is None:
+            return timeout
+        left = max(self.deadline - time.monotonic(), 0.0)
+        return left if timeout is None else min(timeout, left)
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise Cancelled(self.reason)
+
+    def wait(self, seconds: float) -> bool:
+        """Dormir hasta seconds; True si se canceló antes"""
+        if self._event.wait(self.remaining(seconds)):
+            return True
+        return self.cancelled
+
+    def _wakeup_socket(self) -> socket.socket:
+        with self._lock:
+            if self._closed:
+                raise ValueError("Operación sobre un CancelToken cerrado")
+            if self._wake is None:
+                self._wake = socket.socketpair()
+                for s in self._wake:
+                    s.setblocking(False)
+                if self._event.is_set():
+                    self._wake[1].send(b'\0')
+            return self._wake[0]
+
+    def fileno(self) -> int:
+        """Descriptor que se vuelve legible al cancelar (para select junto a otros sockets)"""
+        return self._wakeup_socket().fileno()
+
+    def wait_socket(self, sock: socket.socket, events: int, timeout: Optional[float]) -> bool:
+        """Esperar a que sock esté listo; False si vence timeout, Cancelled si se cancela"""
+        self.check()
+        wake = self._wakeup_socket()
+        remaining = self.remaining(timeout)
+        if hasattr(select, 'poll'):
+            # poll no crea descriptores por llamada, a diferencia de epoll (selectors)
+            poller = select.poll()
+            poller.register(sock, select.POLLIN if events == selectors.EVENT_READ else select.POLLOUT)
+            poller.register(wake, select.POLLIN)
+            ready = [fd for fd, _ in poller.poll(None if remaining is None else remaining * 1000)]
+            woken = wake.fileno() in ready
+        else:
+            readers = [sock, wake] if events == selectors.EVENT_READ else [wake]
+            writers = [sock] if events == selectors.EVENT_WRITE else []
+            readable, writable, failed = select.select(readers, writers, [sock], remaining)
+            ready = readable + writable + failed
+            woken = wake in readable
+        if woken or self.cancelled:
+            raise Cancelled(self.reason or self.CANCELLED)
+        return bool(ready)
+
+    def connect_ex(self, sock: socket.socket, address, timeout: Optional[float]) -> int:
+        """connect_ex() interrumpible; devuelve el errno (ETIMEDOUT si vence timeout)"""
+        sock.setblocking(False)
+        code = sock.connect_ex(address)
+        if code not in _IN_PROGRESS:
+            return code
+        if not self.wait_socket(sock, selectors.EVENT_WRITE, timeout):
+            return errno.ETIMEDOUT
+        return sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+
+    def recv(self, sock: socket.socket, size: int, timeout: Optional[float]) -> bytes:
+        """recv() interrumpible; socket.timeout si no llega nada en timeout"""
+        if not self.wait_socket(sock, selectors.EVENT_READ, timeout):
+            raise socket.timeout("timed out")
+        return sock.recv(size)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            if self._wake:
+                for s in self._wake:
+                    s.close()
+                self._wake = None
@@ -3,179 +3,693 @@ import subprocess
 import threading
 import queue
 import os
-import psutil
+import time
+import itertools
+import shutil
+import codecs
+import selectors
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import socket
 import ipaddress
+from cancellation import Cancelled, CancelToken
+from instrumentation import INSTRUMENTS, RunProfiler, span
+from metrics import (CACHE_LOOKUPS, JOBS, OUTPUT_PENDING, PORTS_SCANNED, SCAN_RATE, SPAWN_LATENCY, TOOL_DURATION,
+                     TOOL_RUNS)
+from traceroute import HopStatistics, ParallelTraceroute
+from result_cache import cache_key
+from results import ResultRecord, ScanResults
+from utils import NetworkUtils, PingStreamParser
+
+
+class ExecutableResolver:
+    """Caché en proceso de la ruta de cada ejecutable, invalidada al cambiar PATH"""
+
+    def __init__(self):
+        self._cache = {}
+        self._path_key = None
+        self._lock = threading.Lock()
+
+    def _current_path_key(self):
+        return os.environ.get('PATH', ''), os.environ.get('PATHEXT', '')
+
+    def resolve(self, command):
+        """Ruta absoluta del ejecutable o None si no está en el PATH"""
+        path_key = self._current_path_key()
+        with self._lock:
+            if path_key != self._path_key:
+                self._cache.clear()
+                self._path_key = path_key
+            if command in self._cache:
+                return self._cache[command]
+        path = shutil.which(command)
+        with self._lock:
+            if path_key == self._path_key:
+                self._cache[command] = path
+        return path
+
+    def exists(self, command):
+        return self.resolve(command) is not None
+
+    def preload(self, commands):
+        """Resolver de antemano una lista de ejecutables"""
+        for command in commands:
+            self.resolve(command)
+
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+
+
+executable_resolver = ExecutableResolver()
+
+
+class SpawnLatencyStats:
+    """Latencias de lanzamiento de procesos externos en una ventana de muestras recientes"""
+
+    METRICS = ('launch_ms', 'first_byte_ms', 'exit_ms')
+
+    def __init__(self, max_samples=1000):
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, tool, launch_ms, first_byte_ms, exit_ms):
+        with self._lock:
+            self._samples.append((tool, launch_ms, first_byte_ms, exit_ms))
+            self.count += 1
+
+    def samples(self):
+        with self._lock:
+            return list(self._samples)
+
+    def summary(self):
+        """Mediana, p95 y máximo de cada latencia sobre la ventana"""
+        samples = self.samples()
+        result = {'count': self.count, 'window': len(samples)}
+        for index, metric in enumerate(self.METRICS, start=1):
+            values = sorted(sample[index] for sample in samples if sample[index] is not None)
+            if not values:
+                result[metric] = None
+                continue
+            result[metric] = {
+                'p50': values[len(values) // 2],
+                'p95': values[min(len(values) - 1, int(len(values) * 0.95))],
+                'max': values[-1]
+            }
+        return result
+
+
+class _StreamDecoder:
+    """Convierte bytes leídos de una tubería en líneas completas de texto"""
+
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._partial = ''
+
+    def feed(self, data, final=False):
+        text = self._partial + self._decoder.decode(data, final).replace('\r\n', '\n')
+        if final:
+            complete, self._partial = text, ''
+            if complete and not complete.endswith('\n'):
+                complete += '\n'
+        else:
+            cut = text.rfind('\n') + 1
+            complete, self._partial = text[:cut], text[cut:]
+        return ''.join(
+            f"{self.prefix}{line}" for line in complete.splitlines(True) if line.strip() or self.prefix
+        )
+
+
+def command_target(command, internal=False, params=None):
+    """Destino de una invocación: el host, red, MAC o dominio, o el primer argumento posicional"""
+    params = params or {}
+    for key in Job.TARGET_PARAMS:
+        if params.get(key):
+            return str(params[key])
+    if not internal:
+        args = [arg for arg in command[1:] if not arg.startswith(('-', '/'))]
+        return args[0] if args else ''
+    return ''
+
+
+def format_age(seconds):
+    """Antigüedad legible: 42 s, 5 min, 3 h, 2 d"""
+    if seconds < 60:
+        return f"{seconds:.0f} s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min"
+    if seconds < 86400:
+        return f"{seconds / 3600:.0f} h"
+    return f"{seconds / 86400:.0f} d"
+
+
+class Job:
+    """Ejecución de una herramienta con su propia salida, cancelación y estado"""
+
+    PENDING = 'pendiente'
+    RUNNING = 'ejecutando'
+    DONE = 'completado'
+    FAILED = 'error'
+    CANCELLED = 'cancelado'
+
+    TARGET_PARAMS = ('host', 'network', 'mac', 'targets', 'domain')
+
+    def __init__(self, job_id, name, command, internal=False, params=None, timeout=300,
+                 output_callback=None, finished_callback=None, progress_callback=None, live_callback=None,
+                 max_pending_bytes=1 << 20, tool=None, result_callback=None, profile_path=None):
+        self.id = job_id
+        self.name = name
+        self.tool = tool or name
+        self.command = command
+        self.internal = internal
+        self.params = params or {}
+        self.timeout = timeout
+        self.queue = queue.Queue()
+        self.status = Job.PENDING
+        self.process = None
+        self.future = None
+        self.start_time = None
+        self.end_time = None
+        self.return_code = None
+        # Instantes (perf_counter) de lanzamiento, primer byte y salida del proceso
+        self.spawned_at = None
+        self.launched_at = None
+        self.first_byte_at = None
+        self.exited_at = None
+        self.output_callback = output_callback
+        self.finished_callback = finished_callback
+        self.progress_callback = progress_callback
+        self.live_callback = live_callback or output_callback
+        # Se llama desde el hilo del trabajo con cada ResultRecord producido
+        self.result_callback = result_callback
+        # Analizador incremental de la salida (p. ej. PingStreamParser para PING)
+        self.parser = None
+        # Prefijo de los archivos .prof/.folded si esta ejecución se perfila
+        self.profile_path = profile_path
+        # Caché de resultados: clave, si se puede leer de ella y lo capturado para guardarlo
+        self.cache_key = None
+        self.use_cache = True
+        self.from_cache = False
+        self.capture = None
+        self._captured_bytes = 0
+        # Cancelación y presupuesto de tiempo; las herramientas internas esperan a través de él
+        self.token = CancelToken()
+        # Contrapresión: los productores esperan si la interfaz va retrasada
+        self._pending_bytes = 0
+        self._max_pending_bytes = max_pending_bytes
+        self._space = threading.Condition()
+
+    @property
+    def is_cancelled(self):
+        """Cancelado por el usuario (agotar el presupuesto no cuenta como cancelación)"""
+        return self.token.reason == CancelToken.CANCELLED
+
+    @property
+    def should_stop(self):
+        """Cancelado o sin presupuesto: la herramienta debe parar y dar lo que tenga"""
+        return self.token.cancelled
+
+    @property
+    def is_active(self):
+        return self.status in (Job.PENDING, Job.RUNNING)
+
+    def output(self, text, kind='output'):
+        """Encolar salida; bloquea al productor mientras haya demasiada pendiente de pintar"""
+        if self.capture is not None and kind == 'output':
+            self._capture(text)
+        with self._space:
+            while self._pending_bytes >= self._max_pending_bytes and not self.should_stop:
+                # Despertar también al vencer el presupuesto, no solo cuando la interfaz vacíe la cola
+                self._space.wait(self.token.remaining(0.5))
+            self._pending_bytes += len(text)
+        self.queue.put((kind, text))
+
+    def _capture(self, text, limit=256 * 1024):
+        self._captured_bytes += len(text)
+        if self._captured_bytes > limit:
+            # Demasiado grande para la caché: se deja de capturar
+            self.capture = None
+        else:
+            self.capture.append(text)
+
+    def _release(self, size):
+        with self._space:
+            self._pending_bytes -= size
+            self._space.notify_all()
+
+    def cancel(self):
+        self.token.cancel()
+        with self._space:
+            self._space.notify_all()
+
+    def live(self, text):
+        self.queue.put(('live', text))
+
+    def progress(self, content):
+        self.queue.put(('progress', content))
+
+    @property
+    def target(self):
+        return command_target(self.command, self.internal, self.params)
+
+    def record(self, kind, duration_ms=None, **fields):
+        """Emitir un resultado estructurado (no hace nada si nadie lo recoge)"""
+        if self.capture is not None:
+            self.capture.append([kind, duration_ms, fields])
+        if not self.result_callback:
+            return
+        started = self.start_time or datetime.now()
+        self.result_callback(ResultRecord(
+            self.tool, self.target, kind, started.isoformat(timespec='milliseconds'),
+            duration_ms=duration_ms, fields=fields
+        ))
+
+    def finish(self, message, status):
+        """Marcar el trabajo como terminado y avisar a la interfaz"""
+        if self.is_cancelled:
+            status = Job.CANCELLED
+        self.status = status
+        self.end_time = datetime.now()
+        TOOL_RUNS.inc(self.tool, status)
+        TOOL_DURATION.observe(self.duration(), self.tool)
+        if self.result_callback:
+            started = self.start_time or self.end_time
+            self.result_callback(ResultRecord(
+                self.tool, self.target, 'resumen', started.isoformat(timespec='milliseconds'),
+                duration_ms=round(self.duration() * 1000, 3), exit_code=self.return_code, status=status
+            ))
+        self.queue.put(('finished', message))
+
+    def duration(self):
+        if not self.start_time:
+            return 0.0
+        return ((self.end_time or datetime.now()) - self.start_time).total_seconds()
+
 
 class CommandRunner:
-    def __init__(self, root, output_callback, finished_callback, progress_callback=None):
+    # Analizadores de salida por herramienta, creados con el destino del trabajo
+    LINE_PARSERS = {'PING': PingStreamParser}
+
+    def __init__(self, root, output_callback=None, finished_callback=None, progress_callback=None,
+                 live_callback=None, max_workers=4, batch_interval_ms=50, batch_max_bytes=64 * 1024,
+                 batch_time_budget_ms=15, max_pending_bytes=1 << 20, resolver=None, cache=None):
         self.root = root
-        self.command_queue = queue.Queue()
+        # ResultCache opcional para SUBNET, WHOIS, NSLOOKUP...
+        self.cache = cache
+        self.resolver = resolver or executable_resolver
+        self.spawn_stats = SpawnLatencyStats()
+        self._spawn_env = None
         self.output_callback = output_callback
         self.finished_callback = finished_callback
         self.progress_callback = progress_callback
-        self.current_process = None
-        self.is_cancelled = False
-        self.start_time = None
-        
-    def run_command(self, command_list, timeout=300, internal=False, params={}):
-        """Ejecutar comando con timeout opcional"""
-        while not self.command_queue.empty():
-            try:
-                self.command_queue.get_nowait()
-            except queue.Empty:
-                break
-        
-        self.is_cancelled = False
-        self.start_time = datetime.now()
-        
-        if internal:
-            threading.Thread(
-                target=self._run_internal_command, 
-                args=(command_list, params), 
-                daemon=True
-            ).start()
+        self.live_callback = live_callback
+        self.max_workers = max_workers
+        # Presupuesto de entrega de salida por cada tick de la interfaz
+        self.batch_interval_ms = batch_interval_ms
+        self.batch_max_bytes = batch_max_bytes
+        self.batch_time_budget = batch_time_budget_ms / 1000
+        self.max_pending_bytes = max_pending_bytes
+        self.jobs = {}
+        self._active = {}
+        # Prefijo de perfil para la próxima ejecución (panel de instrumentación)
+        self.profile_next = None
+        self._job_ids = itertools.count(1)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._pump_scheduled = False
+        JOBS.add_source(self._job_counts)
+        OUTPUT_PENDING.add_source(self._pending_output)
+
+    def _job_counts(self):
+        """Profundidad de la cola y trabajos en marcha, para metrics.JOBS"""
+        jobs = list(self._active.values())
+        pending = sum(1 for job in jobs if job.status == Job.PENDING)
+        return {('pending',): pending, ('running',): len(jobs) - pending}
+
+    def _pending_output(self):
+        return {(): sum(job._pending_bytes for job in list(self._active.values()))}
+
+    def run_command(self, command_list, timeout=300, internal=False, params={}, name=None,
+                    output_callback=None, finished_callback=None, progress_callback=None, live_callback=None,
+                    tool=None, result_callback=None, profile_path=None, use_cache=True):
+        """Encolar un comando en el planificador y devolver su trabajo.
+
+        use_cache=False fuerza una ejecución nueva aunque haya un resultado en caché.
+        """
+        if name is None:
+            name = command_list if internal else command_list[0]
+        if profile_path is None and self.profile_next:
+            profile_path, self.profile_next = self.profile_next, None
+        job = Job(
+            next(self._job_ids), name, command_list, internal=internal, params=dict(params), timeout=timeout,
+            output_callback=output_callback or self.output_callback,
+            finished_callback=finished_callback or self.finished_callback,
+            progress_callback=progress_callback or self.progress_callback,
+            live_callback=live_callback or self.live_callback,
+            max_pending_bytes=self.max_pending_bytes, tool=tool, result_callback=result_callback,
+            profile_path=profile_path
+        )
+        if self.cache is not None and self.cache.cacheable(job.tool):
+            job.cache_key = cache_key(job.tool, command_list, job.params)
+            job.use_cache = use_cache
+        self.jobs[job.id] = job
+        self._active[job.id] = job
+        job.future = self._executor.submit(self._run_job, job)
+        self._schedule_pump()
+        return job
+
+    def _run_job(self, job):
+        if job.profile_path:
+            RunProfiler(job.profile_path).run(self._run_job_body, job)
+        else:
+            self._run_job_body(job)
+
+    def _run_job_body(self, job):
+        if job.is_cancelled:
+            job.finish("⚠️ Comando cancelado por el usuario", Job.CANCELLED)
+            return
+        job.status = Job.RUNNING
+        job.start_time = datetime.now()
+        if job.cache_key and self._replay_cached(job):
+            return
+        if job.internal:
+            self._run_internal_command(job)
         else:
-            threading.Thread(
-                target=self._execute, 
-                args=(command_list, timeout), 
-                daemon=True
-            ).start()
-        
-        self._process_queue()
-
-    def _run_internal_command(self, command, params):
+            self._execute(job)
+
+    def _run_internal_command(self, job):
+        command, params = job.command, job.params
+        if job.timeout:
+            job.token.start_budget(job.timeout)
         try:
             if command == "internal_port_scanner":
-                self._port_scanner(params['host'], params['ports'])
+                self._port_scanner(job, params['host'], params['ports'])
             elif command == "internal_subnet_calculator":
-                self._subnet_calculator(params['network'])
+                self._subnet_calculator(job, params['network'])
             elif command == "internal_wol":
-                self._wake_on_lan(params['mac'])
+                self._wake_on_lan(job, params['mac'])
+            elif command == "internal_bulk_wol":
+                self._bulk_wake_on_lan(job, params['targets'], params.get('repeats'), params.get('pace_ms'),
+                                       params.get('verify'))
             elif command == "internal_whois":
-                self._whois_lookup(params['domain'])
+                self._whois_lookup(job, params['domain'])
+            elif command == "internal_traceroute":
+                self._fast_traceroute(job, params['host'], params.get('max_hops'))
+            elif command == "internal_hop_stats":
+                self._hop_statistics(job, params['host'], params.get('rounds'))
+        except Cancelled:
+            # Las herramientas que no recogen la cancelación terminan aquí con lo ya mostrado
+            pass
         except Exception as e:
-            self._handle_unexpected_error(e)
+            self._handle_unexpected_error(job, e)
+            return
+        finally:
+            job.token.close()
+        if job.token.expired:
+            job.output(f"\n⏱️ Tiempo máximo de {job.timeout}s agotado: resultados parciales\n")
+            job.return_code = job.return_code or 1
+        self._send_completion_message(job, job.return_code or 0, job.duration())
 
-    def _port_scanner(self, host, ports_str):
-        self.output_callback(f"Iniciando escaneo de puertos en {host}...\n")
+    def _port_scanner(self, job, host, ports_str):
+        job.output(f"Iniciando escaneo de puertos en {host}...\n")
         try:
             ports = [int(p.strip()) for p in ports_str.split(',')]
         except ValueError:
-            self.output_callback("Error: Formato de puertos inválido. Use una lista separada por comas, ej: 80,443,8080\n")
-            self.finished_callback()
+            job.output("Error: Formato de puertos inválido. Use una lista separada por comas, ej: 80,443,8080\n")
+            job.return_code = 1
             return
 
+        scan = ScanResults(host)
+        started = time.perf_counter()
         for port in ports:
-            if self.is_cancelled:
+            if job.should_stop:
                 break
             try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.settimeout(1)
-                    result = s.connect_ex((host, port))
-                    if result == 0:
-                        self.output_callback(f"Puerto {port}: Abierto\n")
-                    else:
-                        self.output_callback(f"Puerto {port}: Cerrado\n")
+                result = NetworkUtils.scan_port(host, port, token=job.token)
+                scan.append(result)
+                PORTS_SCANNED.inc('open' if result.open else 'closed')
+                if result.open:
+                    job.output(f"Puerto {port}: Abierto\n")
+                else:
+                    job.output(f"Puerto {port}: Cerrado\n")
+                job.record('puerto', result.rtt_ms, port=port, open=result.open, errno=result.errno)
+            except Cancelled:
+                # El puerto en curso se abandona al momento; lo ya comprobado se resume abajo
+                break
             except socket.gaierror:
-                self.output_callback(f"Error: No se pudo resolver el host {host}\n")
+                job.output(f"Error: No se pudo resolver el host {host}\n")
+                job.return_code = 1
                 break
             except Exception as e:
-                self.output_callback(f"Error escaneando el puerto {port}: {e}\n")
-        self.finished_callback()
+                job.output(f"Error escaneando el puerto {port}: {e}\n")
 
-    def _subnet_calculator(self, network_str):
+        if len(scan):
+            SCAN_RATE.set(len(scan) / max(time.perf_counter() - started, 1e-6))
+            open_ports = scan.open_ports()
+            summary = ", ".join(map(str, open_ports)) if open_ports else "ninguno"
+            job.output(f"\n{len(scan)} puertos escaneados, abiertos: {summary}\n")
+        if job.should_stop and len(scan) < len(ports):
+            job.output(f"Escaneo interrumpido ({job.token.reason}): {len(scan)} de {len(ports)} puertos\n")
+
+    def _subnet_calculator(self, job, network_str):
         try:
             net = ipaddress.ip_network(network_str, strict=False)
-            self.output_callback(f"Calculando detalles para la red {network_str}:\n")
-            self.output_callback(f"  Dirección de red: {net.network_address}\n")
-            self.output_callback(f"  Máscara de subred: {net.netmask}\n")
-            self.output_callback(f"  Dirección de broadcast: {net.broadcast_address}\n")
-            self.output_callback(f"  Número de hosts: {net.num_addresses - 2}\n")
-            self.output_callback(f"  Rango de hosts: {net.network_address + 1} - {net.broadcast_address - 1}\n")
+            job.output(f"Calculando detalles para la red {network_str}:\n")
+            job.output(f"  Dirección de red: {net.network_address}\n")
+            job.output(f"  Máscara de subred: {net.netmask}\n")
+            job.output(f"  Dirección de broadcast: {net.broadcast_address}\n")
+            job.output(f"  Número de hosts: {net.num_addresses - 2}\n")
+            job.output(f"  Rango de hosts: {net.network_address + 1} - {net.broadcast_address - 1}\n")
+            job.record('subred', network=str(net.network_address), netmask=str(net.netmask),
+                       broadcast=str(net.broadcast_address), hosts=net.num_addresses - 2)
         except ValueError as e:
-            self.output_callback(f"Error: {e}\n")
-        self.finished_callback()
+            job.output(f"Error: {e}\n")
+            job.return_code = 1
 
-    def _wake_on_lan(self, mac_address):
+    def _wake_on_lan(self, job, mac_address):
+        from wol import magic_packet, parse_mac
         try:
-            mac_bytes = bytes.fromhex(mac_address.replace(':', '').replace('-', ''))
-            if len(mac_bytes) != 6:
-                raise ValueError("Dirección MAC inválida")
-            magic_packet = b'\xff' * 6 + mac_bytes * 16
+            mac_bytes = parse_mac(mac_address)
             with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
                 s.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-                s.sendto(magic_packet, ('<broadcast>', 9))
-            self.output_callback(f"Paquete mágico enviado a {mac_address}\n")
+                s.sendto(magic_packet(mac_bytes), ('<broadcast>', 9))
+            job.output(f"Paquete mágico enviado a {mac_address}\n")
+            job.record('wol', mac=mac_bytes.hex(':'))
         except ValueError as e:
-            self.output_callback(f"Error: {e}\n")
-        self.finished_callback()
+            job.output(f"Error: {e}\n")
+            job.return_code = 1
 
-    def _whois_lookup(self, domain):
-        self.output_callback(f"Consultando WHOIS para {domain}...\n")
+    def _bulk_wake_on_lan(self, job, source, repeats_str, pace_str, verify_str):
+        # wol se importa al usarlo para no alargar el arranque
+        from wol import BulkWakeOnLan, parse_targets, verify_awake
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.connect(("whois.iana.org", 43))
-                s.sendall(f"{domain}\r\n".encode())
-                response = b""
-                while True:
-                    data = s.recv(4096)
-                    if not data:
-                        break
-                    response += data
-                self.output_callback(response.decode(errors='ignore'))
-        except Exception as e:
-            self.output_callback(f"Error en la consulta WHOIS: {e}\n")
-        self.finished_callback()
+            targets = parse_targets(source)
+            repeats = int(repeats_str or 3)
+            pace_ms = float(pace_str or 2)
+            verify = float(verify_str or 0)
+            if repeats < 1 or pace_ms < 0 or verify < 0:
+                raise ValueError("Repeticiones, pausa y verificación deben ser positivas")
+        except (OSError, ValueError) as e:
+            job.output(f"Error: {e}\n")
+            job.return_code = 1
+            return
+
+        sender = BulkWakeOnLan(targets, repeats=repeats, pace=pace_ms / 1000)
+        broadcasts = sorted({address for _, _, addresses in sender.plan for address in addresses})
+        job.output(f"Despertando {len(targets)} equipos: {repeats} rondas, {pace_ms:g} ms entre paquetes, "
+                   f"broadcast {', '.join(broadcasts)}\n")
+        try:
+            sent = sender.send(
+                token=job.token,
+                on_round=lambda number, total: job.output(f"  Ronda {number}/{repeats}: {total} paquetes\n")
+            )
+        except OSError as e:
+            job.output(f"Error enviando los paquetes mágicos: {e}\n")
+            job.return_code = 1
+            return
+        job.output(f"{sent} paquetes mágicos enviados\n")
+
+        up = None
+        if verify and not job.should_stop:
+            checked = [target for target in targets if target.ip]
+            job.output(f"\nVerificando durante {verify:g} s los {len(checked)} equipos con IP...\n")
+            up = verify_awake(
+                checked, verify, token=job.token,
+                on_up=lambda target, seconds: job.output(f"  ✅ {target.label} responde ({seconds:.0f} s)\n")
+            )
+            down = [target for target in checked if target.mac not in up]
+            for target in down:
+                job.output(f"  ❌ {target.label} no responde\n")
+            job.output(f"\n{len(up)} de {len(checked)} equipos despiertos\n")
+            if job.should_stop:
+                job.output(f"Verificación interrumpida ({job.token.reason})\n")
+            if len(checked) < len(targets):
+                job.output(f"({len(targets) - len(checked)} equipos sin IP en el inventario no se verificaron)\n")
+        for target in targets:
+            awake = None if up is None or not target.ip else target.mac in up
+            job.record('wol', mac=target.mac.hex(':'), ip=target.ip, name=target.name, awake=awake)
+
+    def _whois_lookup(self, job, domain):
+        job.output(f"Consultando WHOIS para {domain}...\n")
+        result = NetworkUtils.whois_query(domain, token=job.token)
+        if result.success:
+            job.output(result.text)
+            job.record('whois', server=result.server, bytes=len(result.text))
+        elif job.should_stop:
+            if result.text:
+                job.output(result.text)
+            job.output(f"\nConsulta WHOIS interrumpida ({result.error}): {len(result.text)} caracteres recibidos\n")
+            job.return_code = 1
+        else:
+            job.output(f"Error en la consulta WHOIS: {result.error}\n")
+            job.return_code = 1
+
+    def _fast_traceroute(self, job, host, max_hops_str):
+        try:
+            max_hops = int(max_hops_str or 30)
+            if not 1 <= max_hops <= 64:
+                raise ValueError
+        except ValueError:
+            job.output("Error: El número de saltos debe estar entre 1 y 64\n")
+            job.return_code = 1
+            return
+
+        job.output(f"Traceroute paralelo a {host} (máx. {max_hops} saltos)...\n")
+        tracer = ParallelTraceroute(host, max_hops=max_hops)
+        try:
+            hops = tracer.run(
+                on_hop=lambda hop: job.output(hop.format() + "\n"),
+                token=job.token
+            )
+            job.output(f"\nRuta completa hacia {tracer.destination}:\n")
+            for hop in hops:
+                job.output(hop.format() + "\n")
+                job.record('salto', **hop.to_dict())
+            if not hops or not hops[-1].reached:
+                job.output("⚠️ No se alcanzó el destino\n")
+        except socket.gaierror:
+            job.output(f"Error: No se pudo resolver el host {host}\n")
+            job.return_code = 1
+        except PermissionError:
+            job.output(
+                "Error: Este sistema requiere privilegios de administrador para el traceroute interno. "
+                "Use la herramienta TRACERT.\n"
+            )
+            job.return_code = 1
+        except OSError as e:
+            job.output(f"Error en el traceroute: {e}\n")
+            job.return_code = 1
+
+    def _hop_statistics(self, job, host, rounds_str, interval=1.0):
+        try:
+            rounds = int(rounds_str or 10)
+            if rounds < 0:
+                raise ValueError
+        except ValueError:
+            job.output("Error: El número de rondas debe ser un entero (0 = continuo)\n")
+            job.return_code = 1
+            return
+
+        if rounds == 0:
+            # El modo continuo dura hasta que se cancela, no hasta el tiempo máximo
+            job.token.clear_budget()
+        mode = "modo continuo" if rounds == 0 else f"{rounds} rondas"
+        job.output(f"Estadísticas por salto hacia {host} ({mode})...\n\n")
+        tracer = ParallelTraceroute(host, timeout=interval)
+        stats = HopStatistics(tracer.max_hops)
+        try:
+            while not job.should_stop and (rounds == 0 or stats.rounds < rounds):
+                started = time.monotonic()
+                hops = tracer.run(token=job.token)
+                if job.should_stop:
+                    # Una ronda a medias contaría como perdidos los saltos que no llegaron a responder
+                    break
+                stats.add_round(hops, tracer.queries)
+                job.live(f"Destino: {tracer.destination} | Ronda {stats.rounds}\n{stats.format_table()}")
+                job.token.wait(interval - (time.monotonic() - started))
+            for i in range(stats.hop_count):
+                received = stats.received[i]
+                job.record(
+                    'salto', ttl=i + 1, address=stats.addresses[i], sent=stats.sent[i], received=received,
+                    loss_pct=round(stats.loss(i), 2),
+                    mean_ms=round(stats.mean(i), 3) if received else None,
+                    best_ms=stats.best[i] if received else None,
+                    worst_ms=stats.worst[i] if received else None,
+                    p95_ms=stats.percentile(i, 95) if received else None,
+                    stdev_ms=round(stats.stdev(i), 3) if received else None
+                )
+        except socket.gaierror:
+            job.output(f"Error: No se pudo resolver el host {host}\n")
+            job.return_code = 1
+        except PermissionError:
+            job.output("Error: Este sistema requiere privilegios de administrador para las sondas internas.\n")
+            job.return_code = 1
+        except OSError as e:
+            job.output(f"Error en las sondas: {e}\n")
+            job.return_code = 1
 
-    def _execute(self, command_list, timeout):
+    def _execute(self, job):
         """Ejecutar comando del sistema con manejo avanzado"""
+        command_list, timeout = job.command, job.timeout
         try:
             startupinfo = None
             creationflags = 0
-            env = os.environ.copy()
-            
+
             if os.name == 'nt':
                 startupinfo = subprocess.STARTUPINFO()
                 startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
                 creationflags = subprocess.CREATE_NO_WINDOW
-                env['PYTHONIOENCODING'] = 'utf-8'
-            
+
             full_command = self._prepare_command(command_list)
-            
-            self.command_queue.put(('info', f"🔧 Comando: {' '.join(full_command)}\n"))
-            self.command_queue.put(('info', f"⏰ Iniciado: {self.start_time.strftime('%H:%M:%S')}\n"))
-            
-            self.current_process = subprocess.Popen(
+
+            job.output(f"🔧 Comando: {' '.join(full_command)}\n", 'info')
+            job.output(f"⏰ Iniciado: {job.start_time.strftime('%H:%M:%S')}\n", 'info')
+
+            # Ruta absoluta, sin cerrar descriptores ni preexec: en Linux y macOS
+            # subprocess puede usar posix_spawn en lugar de fork+exec
+            job.spawned_at = time.perf_counter()
+            job.process = subprocess.Popen(
                 full_command,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                stdin=subprocess.PIPE,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                bufsize=1,
+                stdin=subprocess.DEVNULL,
+                bufsize=0,
+                close_fds=False,
                 startupinfo=startupinfo,
                 creationflags=creationflags,
-                env=env,
-                universal_newlines=True
+                env=self._spawn_environment()
             )
+            job.launched_at = time.perf_counter()
+            INSTRUMENTS.record('spawn', job.launched_at - job.spawned_at)
+
+            parser_class = self.LINE_PARSERS.get(job.tool)
+            if parser_class:
+                job.parser = parser_class(job.target)
+            self._monitor_process_output(job, timeout)
 
-            self._monitor_process_output(timeout)
-            
         except FileNotFoundError:
-            self._handle_command_not_found(command_list[0])
+            self._handle_command_not_found(job, command_list[0])
         except PermissionError:
-            self._handle_permission_error(command_list[0])
+            self._handle_permission_error(job, command_list[0])
         except subprocess.TimeoutExpired:
-            self._handle_timeout(timeout)
+            self._handle_timeout(job, timeout)
         except Exception as e:
-            self._handle_unexpected_error(e)
-        finally:
-            self.current_process = None
+            self._handle_unexpected_error(job, e)
 
-    def _handle_permission_error(self, command):
+    def _spawn_environment(self):
+        """Entorno de los procesos hijos: heredado en POSIX, copia reutilizada en Windows"""
+        if os.name != 'nt':
+            return None
+        path = os.environ.get('PATH', '')
+        if self._spawn_env is None or self._spawn_env.get('PATH', '') != path:
+            env = os.environ.copy()
+            env['PYTHONIOENCODING'] = 'utf-8'
+            self._spawn_env = env
+        return self._spawn_env
+
+    def _handle_permission_error(self, job, command):
         message = (
             f"❌ ERROR DE PERMISOS: '{command}'\n\n"
             f"💡 SOLUCIONES:\n"
@@ -183,12 +697,12 @@ class CommandRunner:
             f"• Verificar permisos del usuario actual\n"
             f"• Comprobar restricciones de seguridad del sistema\n"
         )
-        self.command_queue.put(('finished', message))
+        job.finish(message, Job.FAILED)
+
+    def _handle_timeout(self, job, timeout):
+        if job.process:
+            self._terminate_process_tree(job)
 
-    def _handle_timeout(self, timeout):
-        if self.current_process:
-            self._terminate_process_tree()
-        
         message = (
             f"⏱️ TIMEOUT: El comando excedió el tiempo límite de {timeout}s\n\n"
             f"💡 POSIBLES CAUSAS:\n"
@@ -196,16 +710,16 @@ class CommandRunner:
             f"• La operación requiere más tiempo del esperado\n"
             f"• Problemas de red o conectividad\n"
         )
-        self.command_queue.put(('finished', message))
+        job.finish(message, Job.FAILED)
 
-    def _handle_unexpected_error(self, error):
+    def _handle_unexpected_error(self, job, error):
         message = (
             f"❌ ERROR INESPERADO: {str(error)}\n\n"
             f"💡 INFORMACIÓN TÉCNICA:\n"
             f"• Tipo: {type(error).__name__}\n"
             f"• Detalles: {str(error)}\n"
         )
-        self.command_queue.put(('finished', message))
+        job.finish(message, Job.FAILED)
 
     def _get_command_suggestions(self, command):
         common_commands = {
@@ -217,100 +731,192 @@ class CommandRunner:
             'route': ['route'],
             'dns': ['nslookup', 'dig']
         }
-        
+
         suggestions = []
         command_lower = command.lower()
-        
+
         for key, commands in common_commands.items():
             if key in command_lower:
                 suggestions.extend(commands)
-        
+
         return list(set(suggestions))[:3]
 
-    def _terminate_process_tree(self):
-        if not self.current_process:
+    def _terminate_process_tree(self, job):
+        process = job.process
+        if not process:
             return
-            
+        # psutil se importa al usarse para no retrasar el arranque
+        import psutil
+
         try:
             if os.name == 'nt':
                 subprocess.run([
-                    'taskkill', '/F', '/T', '/PID', str(self.current_process.pid)
+                    'taskkill', '/F', '/T', '/PID', str(process.pid)
                 ], capture_output=True, timeout=5)
             else:
-                parent = psutil.Process(self.current_process.pid)
+                parent = psutil.Process(process.pid)
                 children = parent.children(recursive=True)
-                
+
                 for child in children:
                     try:
                         child.terminate()
                     except psutil.NoSuchProcess:
                         pass
-                
+
                 parent.terminate()
-                
+
                 gone, alive = psutil.wait_procs(children + [parent], timeout=3)
                 for p in alive:
                     try:
                         p.kill()
                     except psutil.NoSuchProcess:
                         pass
-                        
+
+        except psutil.NoSuchProcess:
+            pass
         except Exception as e:
             print(f"Error terminando proceso: {e}")
 
+    def _schedule_pump(self):
+        if self.root and not self._pump_scheduled:
+            self._pump_scheduled = True
+            self.root.after(0, self._process_queue)
+
     def _process_queue(self):
-        processed_any = False
-        
-        try:
-            while True:
-                try:
-                    msg_type, content = self.command_queue.get_nowait()
-                    processed_any = True
-                    
-                    if msg_type == 'output':
-                        self.output_callback(content)
-                    elif msg_type == 'info':
-                        self.output_callback(content)
-                    elif msg_type == 'progress' and self.progress_callback:
-                        self.progress_callback(content)
-                    elif msg_type == 'finished':
-                        self.output_callback(content + "\n")
-                        self.finished_callback()
-                        return
-                        
-                except queue.Empty:
-                    break
-                    
-        except Exception as e:
-            print(f"Error procesando cola: {e}")
-        
-        interval = 50 if processed_any else 100
-        
+        """Repartir en el hilo de la interfaz los mensajes de todos los trabajos activos"""
+        self._pump_scheduled = False
+        processed_any, backlog = self._drain_active()
+
+        if not self._active:
+            return
+
+        # Con salida atrasada se vuelve enseguida, dejando a Tk procesar sus eventos
+        if backlog:
+            interval = 1
+        else:
+            interval = self.batch_interval_ms if processed_any else self.batch_interval_ms * 2
+
         if self.root and self.root.winfo_exists():
+            self._pump_scheduled = True
             self.root.after(interval, self._process_queue)
 
-    def cancel_command(self):
-        if not self.current_process:
-            return False
-            
-        self.is_cancelled = True
-        
-        try:
-            self._terminate_process_tree()
-            return True
-        except Exception as e:
-            print(f"Error cancelando comando: {e}")
-            return False
+    def _drain_active(self):
+        started = time.perf_counter()
+        deadline = started + self.batch_time_budget
+        processed_any = False
+        backlog = False
+        for job in list(self._active.values()):
+            try:
+                processed, pending = self._drain_job(job, deadline)
+                processed_any |= processed
+                backlog |= pending
+            except Exception as e:
+                print(f"Error procesando cola: {e}")
+        if processed_any:
+            # Solo los ticks que repartieron algo, para no diluir el histograma
+            INSTRUMENTS.record('queue', time.perf_counter() - started)
+        return processed_any, backlog
+
+    def wait(self, jobs=None, timeout=None):
+        """Modo sin interfaz (root=None): repartir la salida en el hilo actual hasta que terminen los trabajos.
+
+        Devuelve False si se agota el tiempo de espera.
+        """
+        jobs = list(jobs) if jobs is not None else list(self._active.values())
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while any(job.id in self._active for job in jobs):
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            processed_any, backlog = self._drain_active()
+            if not processed_any and not backlog:
+                time.sleep(self.batch_interval_ms / 1000)
+        return True
+
+    def _drain_job(self, job, deadline):
+        """Agrupar la salida pendiente de un trabajo en un único bloque por tick"""
+        chunks = []
+        size = 0
+        processed_any = False
+
+        def flush():
+            nonlocal chunks, size
+            if chunks:
+                job._release(size)
+                if job.output_callback:
+                    job.output_callback(''.join(chunks))
+                chunks, size = [], 0
+
+        while size < self.batch_max_bytes and time.perf_counter() < deadline:
+            try:
+                msg_type, content = job.queue.get_nowait()
+            except queue.Empty:
+                break
+            processed_any = True
+
+            if msg_type in ('output', 'info'):
+                chunks.append(content)
+                size += len(content)
+            elif msg_type == 'live':
+                flush()
+                if job.live_callback:
+                    job.live_callback(content)
+            elif msg_type == 'progress' and job.progress_callback:
+                job.progress_callback(content)
+            elif msg_type == 'finished':
+                flush()
+                self._active.pop(job.id, None)
+                if job.output_callback:
+                    job.output_callback(content + "\n")
+                if job.finished_callback:
+                    job.finished_callback()
+                return processed_any, False
+
+        flush()
+        return processed_any, not job.queue.empty()
 
-    def is_running(self):
-        return self.current_process is not None and self.current_process.poll() is None
+    def cancel_command(self, job=None):
+        """Cancelar un trabajo concreto o, sin argumento, todos los activos"""
+        jobs = [job] if job else list(self._active.values())
+        cancelled = False
+        for job in jobs:
+            if not job.is_active:
+                continue
+            job.cancel()
+            cancelled = True
+            if job.future and job.future.cancel():
+                job.finish("⚠️ Comando cancelado por el usuario", Job.CANCELLED)
+            elif job.process:
+                try:
+                    self._terminate_process_tree(job)
+                except Exception as e:
+                    print(f"Error cancelando comando: {e}")
+        self._schedule_pump()
+        return cancelled
+
+    def is_running(self, job=None):
+        if job:
+            return job.is_active
+        return bool(self._active)
+
+    def active_jobs(self):
+        return list(self._active.values())
 
-    def get_process_info(self):
-        if not self.current_process:
+    def shutdown(self):
+        """Cancelar los trabajos activos y liberar los hilos del planificador"""
+        self.cancel_command()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _latest_job(self):
+        return self.jobs[max(self.jobs)] if self.jobs else None
+
+    def get_process_info(self, job=None):
+        job = job or self._latest_job()
+        if not job or not job.process:
             return None
-            
+
+        import psutil
         try:
-            process = psutil.Process(self.current_process.pid)
+            process = psutil.Process(job.process.pid)
             return {
                 'pid': process.pid,
                 'name': process.name(),
@@ -322,15 +928,18 @@ class CommandRunner:
         except (psutil.NoSuchProcess, psutil.AccessDenied):
             return None
 
-    def get_runtime_stats(self):
-        if not self.start_time:
+    def get_runtime_stats(self, job=None):
+        job = job or self._latest_job()
+        if not job or not job.start_time:
             return None
-            
-        current_time = datetime.now()
-        runtime = (current_time - self.start_time).total_seconds()
-        
+
+        current_time = job.end_time or datetime.now()
+        runtime = (current_time - job.start_time).total_seconds()
+
         return {
-            'start_time': self.start_time,
+            'job_id': job.id,
+            'status': job.status,
+            'start_time': job.start_time,
             'current_time': current_time,
             'runtime_seconds': runtime,
             'runtime_formatted': self._format_duration(runtime)
@@ -351,88 +960,163 @@ class CommandRunner:
     def _prepare_command(self, command_list):
         if not command_list:
             raise ValueError("Lista de comandos vacía")
-        
+
         if command_list[0] == 'netsh' and len(command_list) > 1:
             return [command_list[0]] + command_list[1].split()
-        
-        if not self._command_exists(command_list[0]):
+
+        executable = self.resolver.resolve(command_list[0])
+        if not executable:
             raise FileNotFoundError(f"Comando '{command_list[0]}' no encontrado")
-        
-        return command_list
+
+        return [executable] + list(command_list[1:])
 
     def _command_exists(self, command):
+        return self.resolver.exists(command)
+
+    def _monitor_process_output(self, job, timeout):
+        deadline = time.monotonic() + timeout
         try:
             if os.name == 'nt':
-                subprocess.run(['where', command], 
-                             capture_output=True, 
-                             check=True, 
-                             timeout=5)
+                # select() no admite tuberías en Windows
+                self._read_with_threads(job, deadline)
             else:
-                subprocess.run(['which', command], 
-                             capture_output=True, 
-                             check=True, 
-                             timeout=5)
-            return True
-        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, FileNotFoundError):
-            return False
+                self._read_with_selector(job, deadline)
+            return_code = job.process.wait(timeout=max(deadline - time.monotonic(), 0.1))
+        except subprocess.TimeoutExpired:
+            self._handle_timeout(job, timeout)
+            return
+        finally:
+            job.process.stdout.close()
+            job.process.stderr.close()
+
+        job.exited_at = time.perf_counter()
+        job.return_code = return_code
+        if job.parser:
+            self._parse_output(job, None)
+        self._record_spawn_latency(job)
+        self._send_completion_message(job, return_code, job.duration())
 
-    def _monitor_process_output(self, timeout):
-        def read_stream(stream, prefix=""):
+    def _read_with_selector(self, job, deadline):
+        """Leer stdout y stderr desde un único hilo con un selector"""
+        process = job.process
+        with selectors.DefaultSelector() as selector:
+            selector.register(process.stdout, selectors.EVENT_READ, _StreamDecoder())
+            selector.register(process.stderr, selectors.EVENT_READ, _StreamDecoder("⚠️ "))
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(process.args, job.timeout)
+                for key, _ in selector.select(min(remaining, 0.25)):
+                    with span('read'):
+                        data = os.read(key.fd, 65536)
+                        if data and job.first_byte_at is None:
+                            job.first_byte_at = time.perf_counter()
+                        text = key.data.feed(data, final=not data)
+                        if text:
+                            job.output(text)
+                            if job.parser and key.fileobj is process.stdout:
+                                self._parse_output(job, text)
+                    if not data:
+                        selector.unregister(key.fileobj)
+
+    def _read_with_threads(self, job, deadline):
+        def read_stream(stream, decoder):
             try:
                 while True:
-                    if self.is_cancelled:
-                        break
-                    
-                    line = stream.readline()
-                    if not line:
+                    data = stream.read(65536)
+                    if data and job.first_byte_at is None:
+                        job.first_byte_at = time.perf_counter()
+                    with span('read'):
+                        text = decoder.feed(data or b'', final=not data)
+                        if text:
+                            job.output(text)
+                            if job.parser and stream is job.process.stdout:
+                                self._parse_output(job, text)
+                    if not data:
                         break
-                    
-                    if line.strip() or prefix:
-                        self.command_queue.put(('output', f"{prefix}{line}"))
-                        
             except Exception as e:
-                self.command_queue.put(('output', f"❌ Error leyendo salida: {e}\n"))
+                job.output(f"❌ Error leyendo salida: {e}\n")
 
-        stdout_thread = threading.Thread(
-            target=read_stream, 
-            args=(self.current_process.stdout, ""),
-            daemon=True
-        )
-        stderr_thread = threading.Thread(
-            target=read_stream, 
-            args=(self.current_process.stderr, "⚠️ "),
-            daemon=True
-        )
-        
-        stdout_thread.start()
-        stderr_thread.start()
+        readers = [
+            threading.Thread(target=read_stream, args=(job.process.stdout, _StreamDecoder()), daemon=True),
+            threading.Thread(target=read_stream, args=(job.process.stderr, _StreamDecoder("⚠️ ")), daemon=True)
+        ]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join(timeout=max(deadline - time.monotonic(), 0))
+            if reader.is_alive():
+                raise subprocess.TimeoutExpired(job.process.args, job.timeout)
 
-        try:
-            return_code = self.current_process.wait(timeout=timeout)
-            
-            stdout_thread.join(timeout=2)
-            stderr_thread.join(timeout=2)
-            
-            end_time = datetime.now()
-            duration = (end_time - self.start_time).total_seconds()
-            
-            self._send_completion_message(return_code, duration)
-            
-        except subprocess.TimeoutExpired:
-            self._handle_timeout(timeout)
+    def _parse_output(self, job, text):
+        """Pasar la salida al analizador del trabajo (None = fin de la salida)"""
+        packets = job.parser.feed(text) if text is not None else job.parser.finish()
+        for packet in packets:
+            job.record('paquete', packet.rtt_ms, **packet.to_dict())
+        if packets or text is None:
+            snapshot = job.parser.snapshot()
+            job.progress(snapshot)
+            if text is None:
+                job.record('estadisticas', **snapshot.to_dict())
 
-    def _send_completion_message(self, return_code, duration):
-        if self.is_cancelled:
-            self.command_queue.put(('finished', 
-                "⚠️ Comando cancelado por el usuario"))
+    def _record_spawn_latency(self, job):
+        if job.spawned_at is None or job.exited_at is None:
+            return
+        if job.first_byte_at is not None:
+            first_byte_ms = (job.first_byte_at - job.spawned_at) * 1000
+            exit_ms = (job.exited_at - job.first_byte_at) * 1000
+            detail = f"lanzamiento→primer byte {first_byte_ms:.1f} ms | primer byte→salida {exit_ms:.1f} ms"
+        else:
+            first_byte_ms = None
+            exit_ms = (job.exited_at - job.spawned_at) * 1000
+            detail = f"lanzamiento→salida {exit_ms:.1f} ms (sin salida)"
+        launch_ms = (job.launched_at - job.spawned_at) * 1000
+        self.spawn_stats.record(job.name, launch_ms, first_byte_ms, exit_ms)
+        SPAWN_LATENCY.observe(launch_ms / 1000, job.tool, 'launch')
+        if first_byte_ms is not None:
+            SPAWN_LATENCY.observe(first_byte_ms / 1000, job.tool, 'first_byte')
+        SPAWN_LATENCY.observe(exit_ms / 1000, job.tool, 'exit')
+        job.output(f"⏱️ Latencias: {detail}\n", 'info')
+
+    def _replay_cached(self, job):
+        """Repetir un resultado guardado en lugar de ejecutar; False si no lo hay"""
+        cached = self.cache.get(job.cache_key) if job.use_cache else None
+        CACHE_LOOKUPS.inc(job.tool, 'hit' if cached else 'bypass' if not job.use_cache else 'miss')
+        if cached is None:
+            job.capture = []
+            return False
+        job.from_cache = True
+        job.output(f"💾 Desde caché (obtenido hace {format_age(cached.age())})\n\n", 'info')
+        if cached.output:
+            job.output(cached.output)
+        for kind, duration_ms, fields in cached.records:
+            job.record(kind, duration_ms, **fields)
+        job.return_code = cached.return_code
+        job.finish(f"💾 Resultado desde caché en {job.duration():.2f}s (código: {cached.return_code})", Job.DONE)
+        return True
+
+    def _store_cached(self, job):
+        parts = job.capture
+        job.capture = None
+        output = ''.join(part for part in parts if isinstance(part, str))
+        records = [part for part in parts if isinstance(part, list)]
+        self.cache.put(job.cache_key, job.tool, output, records, job.return_code)
+
+    def _send_completion_message(self, job, return_code, duration):
+        job.return_code = return_code
+        if job.capture is not None and return_code == 0 and not job.is_cancelled:
+            # Antes de finish(): quien espere al trabajo ya encuentra el resultado guardado
+            self._store_cached(job)
+        if job.is_cancelled:
+            job.finish("⚠️ Comando cancelado por el usuario", Job.CANCELLED)
         elif return_code == 0:
-            self.command_queue.put(('finished', 
-                f"✅ Comando completado exitosamente en {duration:.2f}s (código: {return_code})"))
+            job.finish(
+                f"✅ Comando completado exitosamente en {duration:.2f}s (código: {return_code})", Job.DONE)
         else:
-            self.command_queue.put(('finished', 
-                f"⚠️ Comando terminado con errores en {duration:.2f}s (código: {return_code})"))
+            job.finish(
+                f"⚠️ Comando terminado con errores en {duration:.2f}s (código: {return_code})", Job.FAILED)
 
-    def _handle_command_not_found(self, command):
+    def _handle_command_not_found(self, job, command):
         suggestions = self._get_command_suggestions(command)
         message = (
             f"❌ COMANDO NO ENCONTRADO: '{command}'\n\n"
@@ -441,8 +1125,8 @@ class CommandRunner:
             f"• Comprobar que esté en el PATH del sistema\n"
             f"• Ejecutar como administrador si es necesario\n"
         )
-        
+
         if suggestions:
             message += f"\n🔍 COMANDOS SIMILARES:\n" + "\n".join(f"• {s}" for s in suggestions)
-        
-        self.command_queue.put(('finished', message))
\ No newline at end of file
+
+        job.finish(message, Job.FAILED)
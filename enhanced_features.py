@@ -1,9 +1,5 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.animation import FuncAnimation
-import numpy as np
 import threading
 import time
 import json
@@ -14,17 +10,30 @@ import subprocess
 import re
 from datetime import datetime, timedelta
 from collections import deque
-import webbrowser
+from command_runner import Job
+from instrumentation import INSTRUMENTS
+from tool_definitions import TOOLS, build_invocation
+from utils import StreamingFormatter
+from batch_engine import BatchEngine, BatchStep, read_batch_file, write_batch_file
 
 class BatchCommandManager:
     """Gestor de comandos en lote"""
     
+    STATUS_ICONS = {
+        BatchStep.PENDING: '🕓', BatchStep.WAITING: '⏸️', BatchStep.SKIPPED: '⏭️',
+        Job.RUNNING: '⏳', Job.DONE: '✅', Job.FAILED: '❌', Job.CANCELLED: '⚠️'
+    }
+
     def __init__(self, main_app):
         self.main_app = main_app
-        self.batch_queue = queue.Queue()
-        self.is_running = False
         self.current_batch = []
-        self.results = []
+        self.output_terminal = None
+        self.engine = BatchEngine(
+            main_app.runner,
+            on_status=self._on_step_status,
+            on_output=self._on_step_output,
+            on_finished=self._on_batch_finished
+        )
         
     def create_batch_interface(self, parent):
         """Crear interfaz para comandos en lote"""
@@ -40,13 +49,17 @@ class BatchCommandManager:
                                   bg='#2d2d2d', fg='white', font=("Segoe UI", 10, "bold"))
         list_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
         
-        columns = ('#', 'Herramienta', 'Parámetros', 'Estado')
+        columns = ('#', 'Herramienta', 'Parámetros', 'Depende de', 'Estado', 'Duración')
         self.batch_tree = ttk.Treeview(list_frame, columns=columns, show='headings', height=10)
         self.batch_tree.heading('#', text='#')
         self.batch_tree.column('#', width=40, anchor='center')
         self.batch_tree.heading('Herramienta', text='Herramienta')
         self.batch_tree.heading('Parámetros', text='Parámetros')
+        self.batch_tree.heading('Depende de', text='Depende de')
+        self.batch_tree.column('Depende de', width=90, anchor='center')
         self.batch_tree.heading('Estado', text='Estado')
+        self.batch_tree.heading('Duración', text='Duración')
+        self.batch_tree.column('Duración', width=80, anchor='e')
         self.batch_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
         # Botones de control del lote
@@ -54,8 +67,10 @@ class BatchCommandManager:
         btn_frame.pack(fill=tk.X, pady=(0, 10))
 
         tk.Button(btn_frame, text="➕ Agregar", command=self.add_command_dialog, bg='#007acc', fg='white').pack(side=tk.LEFT, padx=2)
+        tk.Button(btn_frame, text="➖ Quitar", command=self.remove_selected, bg='#6c757d', fg='white').pack(side=tk.LEFT, padx=2)
         self.run_batch_btn = tk.Button(btn_frame, text="▶️ Ejecutar", command=self.run_batch, bg='#28a745', fg='white')
         self.run_batch_btn.pack(side=tk.LEFT, padx=2)
+        tk.Button(btn_frame, text="⏹️ Detener", command=self.stop_batch, bg='#ffc107', fg='black').pack(side=tk.LEFT, padx=2)
         tk.Button(btn_frame, text="🗑️ Limpiar", command=self.clear_batch, bg='#dc3545', fg='white').pack(side=tk.LEFT, padx=2)
         tk.Button(btn_frame, text="💾 Guardar", command=self.save_batch, bg='#6c757d', fg='white').pack(side=tk.LEFT, padx=2)
         tk.Button(btn_frame, text="📂 Cargar", command=self.load_batch, bg='#6c757d', fg='white').pack(side=tk.LEFT, padx=2)
@@ -64,17 +79,244 @@ class BatchCommandManager:
         return batch_frame
 
     def add_command_dialog(self):
-        messagebox.showinfo("Info", "Funcionalidad 'Agregar Comando' no implementada en este ejemplo.")
+        """Diálogo para agregar una herramienta con sus parámetros y dependencias"""
+        if self.engine.is_running:
+            return
+        dialog = tk.Toplevel(self.main_app.root)
+        dialog.title("➕ Agregar Comando al Lote")
+        dialog.configure(bg='#2d2d2d')
+        dialog.transient(self.main_app.root)
+
+        tk.Label(dialog, text="Herramienta:", bg='#2d2d2d', fg='white').grid(row=0, column=0, sticky='e', padx=5, pady=5)
+        tool_var = tk.StringVar(value=self.main_app.current_tool if self.main_app.current_tool in TOOLS else next(iter(TOOLS)))
+        ttk.Combobox(dialog, textvariable=tool_var, values=list(TOOLS), state='readonly').grid(
+            row=0, column=1, sticky='we', padx=5, pady=5)
+
+        params_frame = tk.Frame(dialog, bg='#2d2d2d')
+        params_frame.grid(row=1, column=0, columnspan=2, sticky='we', padx=5)
+        entries = {}
+
+        def build_params(*args):
+            for widget in params_frame.winfo_children():
+                widget.destroy()
+            entries.clear()
+            for row, param in enumerate(TOOLS[tool_var.get()]["parameters"]):
+                label_text = f"{'🔹' if param['required'] else '🔸'} {param['name']}:"
+                tk.Label(params_frame, text=label_text, width=25, anchor='e', bg='#2d2d2d', fg='white').grid(row=row, column=0, pady=2)
+                entry = tk.Entry(params_frame, width=35, bg='#3e3e3e', fg='white', relief=tk.FLAT, bd=5)
+                if param.get('default'): entry.insert(0, param['default'])
+                entry.grid(row=row, column=1, pady=2)
+                entries[param['name']] = entry
+
+        tool_var.trace_add('write', build_params)
+        build_params()
+
+        tk.Label(dialog, text="Depende de (#, separados por comas):", bg='#2d2d2d', fg='white').grid(
+            row=2, column=0, sticky='e', padx=5, pady=5)
+        deps_entry = tk.Entry(dialog, bg='#3e3e3e', fg='white', relief=tk.FLAT, bd=5)
+        deps_entry.grid(row=2, column=1, sticky='we', padx=5, pady=5)
+
+        def accept():
+            values = {name: entry.get() for name, entry in entries.items()}
+            try:
+                build_invocation(tool_var.get(), values)
+                depends_on = [int(dep.strip().lstrip('#')) for dep in deps_entry.get().split(',') if dep.strip()]
+            except ValueError as e:
+                messagebox.showerror("Error", str(e) or "Dependencias inválidas", parent=dialog)
+                return
+            step_id = max((step.id for step in self.current_batch), default=0) + 1
+            step = BatchStep(step_id, tool_var.get(), values, depends_on)
+            self.current_batch.append(step)
+            self._insert_row(step)
+            dialog.destroy()
+
+        btns = tk.Frame(dialog, bg='#2d2d2d')
+        btns.grid(row=3, column=0, columnspan=2, pady=10)
+        tk.Button(btns, text="Agregar", command=accept, bg='#28a745', fg='white').pack(side=tk.LEFT, padx=5)
+        tk.Button(btns, text="Cancelar", command=dialog.destroy, bg='#6c757d', fg='white').pack(side=tk.LEFT, padx=5)
+
+    def _insert_row(self, step):
+        deps = ", ".join(f"#{dep}" for dep in step.depends_on)
+        status = f"{self.STATUS_ICONS.get(step.status, '')} {step.status}"
+        self.batch_tree.insert('', tk.END, iid=str(step.id),
+                               values=(step.id, step.tool, step.describe(), deps, status, ''))
+
+    def _refresh_tree(self):
+        self.batch_tree.delete(*self.batch_tree.get_children())
+        for step in self.current_batch:
+            self._insert_row(step)
+
+    def _on_step_status(self, step):
+        if not self.batch_tree.exists(str(step.id)):
+            return
+        self.batch_tree.set(str(step.id), 'Estado', f"{self.STATUS_ICONS.get(step.status, '')} {step.status}")
+        duration = f"{step.job.duration():.2f}s" if step.job and step.is_terminal else ''
+        self.batch_tree.set(str(step.id), 'Duración', duration)
+
+    def _on_step_output(self, step, text):
+        terminal = self.output_terminal
+        if not terminal or not terminal.text.winfo_exists():
+            return
+        terminal.append(text, StreamingFormatter.for_tool(step.tool), prefix=f"[#{step.id} {step.tool}] ")
+
+    def _on_batch_finished(self, steps):
+        counts = {}
+        for step in steps:
+            counts[step.status] = counts.get(step.status, 0) + 1
+        summary = ", ".join(f"{status}: {count}" for status, count in counts.items())
+        message = (
+            f"\n🏁 Lote terminado en {self.engine.elapsed():.2f}s "
+            f"(suma de pasos: {self.engine.total_step_time():.2f}s) | {summary}\n"
+        )
+        if self.output_terminal and self.output_terminal.text.winfo_exists():
+            self.output_terminal.append(message)
+        self.run_batch_btn.config(state=tk.NORMAL)
+        self.main_app.update_status("✅ Lote completado", "success")
+
     def run_batch(self):
-        messagebox.showinfo("Info", "Funcionalidad 'Ejecutar Lote' no implementada en este ejemplo.")
+        if self.engine.is_running:
+            return
+        if not self.current_batch:
+            messagebox.showinfo("Info", "El lote está vacío.")
+            return
+        try:
+            self.engine.validate(self.current_batch)
+        except ValueError as e:
+            messagebox.showerror("Error en el lote", str(e))
+            return
+        self.output_terminal = self.main_app.open_output_tab("🔄 Lote")
+        self.output_terminal.append(
+            f"[{datetime.now().strftime('%H:%M:%S')}]> Lote de {len(self.current_batch)} pasos "
+            f"({self.main_app.runner.max_workers} en paralelo)\n\n")
+        self.run_batch_btn.config(state=tk.DISABLED)
+        self.main_app.update_status("⏳ Ejecutando lote...", "warning")
+        self.engine.run(self.current_batch)
+
+    def stop_batch(self):
+        if self.engine.is_running:
+            self.engine.cancel()
+
+    def remove_selected(self):
+        if self.engine.is_running:
+            return
+        selected = {int(iid) for iid in self.batch_tree.selection()}
+        self.current_batch = [step for step in self.current_batch if step.id not in selected]
+        self._refresh_tree()
+
     def clear_batch(self):
-        messagebox.showinfo("Info", "Funcionalidad 'Limpiar Lote' no implementada en este ejemplo.")
+        if self.engine.is_running or not self.current_batch:
+            return
+        if messagebox.askyesno("Limpiar Lote", "¿Eliminar todos los comandos del lote?"):
+            self.current_batch = []
+            self._refresh_tree()
+
     def save_batch(self):
-        messagebox.showinfo("Info", "Funcionalidad 'Guardar Lote' no implementada en este ejemplo.")
+        if not self.current_batch:
+            messagebox.showinfo("Info", "El lote está vacío.")
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Lote JSON", "*.json")])
+        if not path:
+            return
+        try:
+            write_batch_file(path, self.current_batch)
+        except OSError as e:
+            messagebox.showerror("Error", f"No se pudo guardar el lote: {e}")
+
     def load_batch(self):
-        messagebox.showinfo("Info", "Funcionalidad 'Cargar Lote' no implementada en este ejemplo.")
+        if self.engine.is_running:
+            return
+        path = filedialog.askopenfilename(filetypes=[("Lote JSON", "*.json"), ("Todos", "*.*")])
+        if not path:
+            return
+        try:
+            steps = read_batch_file(path)
+            self.engine.validate(steps)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"No se pudo cargar el lote: {e}")
+            return
+        self.current_batch = steps
+        self._refresh_tree()
+
     def export_results(self):
-        messagebox.showinfo("Info", "Funcionalidad 'Exportar Resultados' no implementada en este ejemplo.")
+        if not self.engine.results:
+            messagebox.showinfo("Info", "Ejecute el lote antes de exportar sus resultados.")
+            return
+        path = filedialog.asksaveasfilename(
+            defaultextension=".jsonl",
+            filetypes=[("JSON Lines", "*.jsonl"), ("CSV", "*.csv")]
+        )
+        if not path:
+            return
+        try:
+            count = self.engine.export_results(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"No se pudieron exportar los resultados: {e}")
+            return
+        self.main_app.update_status(f"📄 {count} resultados exportados", "success")
+
+
+class InstrumentationPanel:
+    """Ventana con los tramos medidos (resolve, connect, spawn, read, queue, format, render)"""
+
+    REFRESH_MS = 1000
+    COLUMNS = (('name', "Tramo", 90), ('count', "Llamadas", 80), ('mean_us', "Media (µs)", 90),
+               ('p50_us', "p50", 70), ('p95_us', "p95", 70), ('p99_us', "p99", 70),
+               ('max_us', "Máx", 80), ('total_ms', "Total (ms)", 90))
+
+    def __init__(self, main_app):
+        self.main_app = main_app
+        self.window = tk.Toplevel(main_app.root)
+        self.window.title("📊 Instrumentación")
+        self.window.geometry("700x320")
+        self.window.configure(bg='#1e1e1e')
+
+        toolbar = tk.Frame(self.window, bg='#2d2d2d')
+        toolbar.pack(fill=tk.X)
+        self.enabled_var = tk.BooleanVar(value=INSTRUMENTS.enabled)
+        tk.Checkbutton(toolbar, text="Medir tramos", variable=self.enabled_var, command=self.toggle,
+                       bg='#2d2d2d', fg='white', selectcolor='#1e1e1e', activebackground='#2d2d2d').pack(side=tk.LEFT, padx=5, pady=5)
+        tk.Button(toolbar, text="🔄 Reiniciar", command=self.reset, bg='#6c757d', fg='white').pack(side=tk.LEFT, padx=2)
+        tk.Button(toolbar, text="📈 Perfilar próxima ejecución", command=self.profile_next,
+                  bg='#007acc', fg='white').pack(side=tk.LEFT, padx=2)
+        self.profile_label = tk.Label(toolbar, text="", bg='#2d2d2d', fg='#999999')
+        self.profile_label.pack(side=tk.LEFT, padx=5)
+
+        self.tree = ttk.Treeview(self.window, columns=[key for key, _, _ in self.COLUMNS], show='headings')
+        for key, title, width in self.COLUMNS:
+            self.tree.heading(key, text=title)
+            self.tree.column(key, width=width, anchor=tk.W if key == 'name' else tk.E)
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.refresh()
+
+    def toggle(self):
+        INSTRUMENTS.enable(self.enabled_var.get())
+        self.main_app.config_manager.set('instrumentation', self.enabled_var.get())
+
+    def reset(self):
+        INSTRUMENTS.reset()
+        self.refresh(reschedule=False)
+
+    def profile_next(self):
+        path = filedialog.asksaveasfilename(
+            parent=self.window, title="Prefijo de los archivos del perfil",
+            defaultextension="", filetypes=[("Perfil", "*")], initialfile="perfil")
+        if not path:
+            return
+        self.main_app.runner.profile_next = path
+        self.profile_label.config(text=f"Se guardará en {os.path.basename(path)}.prof / .folded")
+
+    def refresh(self, reschedule=True):
+        if not self.window.winfo_exists():
+            return
+        self.tree.delete(*self.tree.get_children())
+        for row in INSTRUMENTS.snapshot():
+            self.tree.insert('', tk.END, values=(
+                row['name'], row['count'], f"{row['mean_us']:.1f}", f"{row['p50_us']:.0f}",
+                f"{row['p95_us']:.0f}", f"{row['p99_us']:.0f}", f"{row['max_us']:.0f}", f"{row['total_ms']:.1f}"))
+        if self.main_app.runner.profile_next is None and self.profile_label.cget('text'):
+            self.profile_label.config(text="Perfil en curso o guardado")
+        if reschedule:
+            self.window.after(self.REFRESH_MS, self.refresh)
 
 
 class SystemNotificationManager:
@@ -117,6 +359,11 @@ class EnhancedNetworkApp:
         self.setup_ui_enhancements()
         self.setup_options_menu()
         self.integrate_with_command_system()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        self.batch_manager.engine.close()
+        self.base_app.on_close()
 
     def setup_ui_enhancements(self):
         """Crear las nuevas pestañas en el notebook principal."""
@@ -141,6 +388,7 @@ class EnhancedNetworkApp:
         
         tools_menu.add_command(label="Recargar Plugins (simulado)", 
                               command=lambda: messagebox.showinfo("Plugins", "Simulación de recarga de plugins."))
+        tools_menu.add_command(label="📊 Instrumentación", command=lambda: InstrumentationPanel(self.base_app))
         tools_menu.add_separator()
         tools_menu.add_command(label="Acerca de", command=self.show_about)
 
@@ -148,12 +396,20 @@ class EnhancedNetworkApp:
         """Integrar con el sistema de comandos para notificaciones."""
         original_finished_callback = self.base_app.on_command_finished
 
-        def finished_callback_with_notification():
-            original_finished_callback()
-            self.notification_manager.notify_command_completed(self.base_app.current_tool, success=True)
+        def finished_callback_with_notification(job=None):
+            original_finished_callback(job)
+            if job:
+                self.notification_manager.notify_command_completed(
+                    f"{job.name} #{job.id}", success=job.status == Job.DONE, duration=job.duration())
+            else:
+                self.notification_manager.notify_command_completed(self.base_app.current_tool, success=True)
             
         self.base_app.on_command_finished = finished_callback_with_notification
 
+    def open_link(self, url):
+        import webbrowser
+        webbrowser.open_new(url)
+
     def show_about(self):
         """Mostrar información sobre la aplicación"""
         about_window = tk.Toplevel(self.root)
@@ -177,7 +433,7 @@ class EnhancedNetworkApp:
         tk.Label(creator_frame, text="Creado por:", fg='#cccccc', bg='#1e1e1e').pack(side=tk.LEFT)
         link = tk.Label(creator_frame, text="Ez07-Code", fg="#007acc", cursor="hand2", bg='#1e1e1e')
         link.pack(side=tk.LEFT, padx=5)
-        link.bind("<Button-1>", lambda e: webbrowser.open_new("https://github.com/Ez07-Code"))
+        link.bind("<Button-1>", lambda e: self.open_link("https://github.com/Ez07-Code"))
 
         separator = ttk.Separator(main_frame, orient='horizontal')
         separator.pack(fill='x', padx=20, pady=10)
@@ -0,0 +1,186 @@
+# history_store.py - Historial de ejecuciones persistente e indexado (SQLite)
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tool TEXT NOT NULL,
+    target TEXT NOT NULL DEFAULT '',
+    command TEXT NOT NULL,
+    params TEXT NOT NULL DEFAULT '{}',
+    started_at REAL NOT NULL,
+    duration REAL,
+    status TEXT,
+    exit_code INTEGER,
+    output_path TEXT
+);
+CREATE INDEX IF NOT EXISTS history_started ON history (started_at);
+CREATE INDEX IF NOT EXISTS history_tool ON history (tool, started_at);
+CREATE INDEX IF NOT EXISTS history_target ON history (target, started_at);
+"""
+
+
+@dataclass(slots=True)
+class HistoryEntry:
+    """Una ejecución registrada en el historial"""
+    id: int
+    tool: str
+    target: str
+    command: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    started_at: float = 0.0
+    duration: Optional[float] = None
+    status: Optional[str] = None
+    exit_code: Optional[int] = None
+    output_path: Optional[str] = None
+
+    @property
+    def has_output(self) -> bool:
+        return bool(self.output_path) and os.path.exists(self.output_path)
+
+
+class HistoryStore:
+    """Historial de ejecuciones en SQLite con índices por herramienta, destino y fecha.
+
+    Cada ejecución es una fila que se inserta al empezar y se completa al
+    terminar, así que nunca se reescribe el historial entero. La salida
+    completa de cada ejecución se guarda aparte, en output_dir.
+    """
+
+    def __init__(self, path: str, output_dir: Optional[str] = None, max_outputs: int = 500):
+        self.path = path
+        self.output_dir = output_dir or os.path.join(os.path.dirname(os.path.abspath(path)), "outputs")
+        self.max_outputs = max_outputs
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        # WAL: las inserciones son anexos secuenciales y los lectores no bloquean
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def output_path_for(self, entry_id: int) -> str:
+        return os.path.join(self.output_dir, f"{entry_id}.log")
+
+    def record_start(self, tool: str, target: str, command: str, params: Optional[Dict] = None,
+                     started_at: Optional[float] = None) -> HistoryEntry:
+        """Registrar una ejecución que empieza y devolver su entrada"""
+        started_at = started_at or time.time()
+        params_json = json.dumps(params or {}, ensure_ascii=False)
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT INTO history (tool, target, command, params, started_at) VALUES (?, ?, ?, ?, ?)",
+                (tool, target or '', command, params_json, started_at))
+            entry_id = cursor.lastrowid
+            output_path = self.output_path_for(entry_id)
+            self._db.execute("UPDATE history SET output_path = ? WHERE id = ?", (output_path, entry_id))
+        return HistoryEntry(entry_id, tool, target or '', command, dict(params or {}), started_at,
+                            output_path=output_path)
+
+    def record_finish(self, entry: HistoryEntry, status: str, exit_code: Optional[int],
+                      duration: Optional[float]) -> HistoryEntry:
+        entry.status, entry.exit_code, entry.duration = status, exit_code, duration
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE history SET status = ?, exit_code = ?, duration = ? WHERE id = ?",
+                (status, exit_code, duration, entry.id))
+        return entry
+
+    def get(self, entry_id: int) -> Optional[HistoryEntry]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM history WHERE id = ?", (entry_id,)).fetchone()
+        return self._entry(row) if row else None
+
+    def search(self, tool: Optional[str] = None, target: Optional[str] = None,
+               since: Optional[float] = None, until: Optional[float] = None,
+               limit: int = 200, before_id: Optional[int] = None) -> List[HistoryEntry]:
+        """Buscar ejecuciones (de la más reciente a la más antigua).
+
+        El destino se busca por prefijo con un rango sobre el índice, y
+        before_id permite paginar sin OFFSET.
+        """
+        clauses, args = [], []
+        if tool:
+            clauses.append("tool = ?")
+            args.append(tool)
+        if target:
+            clauses.append("target >= ? AND target < ?")
+            args.extend([target, target + '\uffff'])
+        if since is not None:
+            clauses.append("started_at >= ?")
+            args.append(since)
+        if until is not None:
+            clauses.append("started_at < ?")
+            args.append(until)
+        if before_id is not None:
+            clauses.append("id < ?")
+            args.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = f"SELECT * FROM history {where} ORDER BY started_at DESC, id DESC LIMIT ?"
+        with self._lock:
+            rows = self._db.execute(query, (*args, limit)).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def tools(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT DISTINCT tool FROM history ORDER BY tool")]
+
+    def prune_outputs(self) -> int:
+        """Borrar los archivos de salida más antiguos que superen max_outputs"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, output_path FROM history WHERE output_path IS NOT NULL ORDER BY id DESC LIMIT -1 OFFSET ?",
+                (self.max_outputs,)).fetchall()
+            if not rows:
+                return 0
+            with self._db:
+                self._db.executemany("UPDATE history SET output_path = NULL WHERE id = ?", [(row[0],) for row in rows])
+        for _, path in rows:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return len(rows)
+
+    def import_legacy_json(self, path: str) -> int:
+        """Importar un history.json antiguo (lista de diccionarios) y renombrarlo"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        rows = []
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict):
+                continue
+            timestamp = item.get('timestamp')
+            try:
+                started_at = time.mktime(time.strptime(timestamp[:19], '%Y-%m-%dT%H:%M:%S'))
+            except (TypeError, ValueError):
+                started_at = os.path.getmtime(path)
+            # Los campos nulos o ausentes se guardan vacíos (las columnas son NOT NULL)
+            tool, target, command = (str(item.get(name) or '') for name in ('tool', 'target', 'command'))
+            rows.append((tool, target, command,
+                         json.dumps(item.get('parameters') or {}, ensure_ascii=False), started_at))
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO history (tool, target, command, params, started_at) VALUES (?, ?, ?, ?, ?)", rows)
+        os.replace(path, path + ".importado")
+        return len(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def _entry(row) -> HistoryEntry:
+        return HistoryEntry(
+            row['id'], row['tool'], row['target'], row['command'], json.loads(row['params'] or '{}'),
+            row['started_at'], row['duration'], row['status'], row['exit_code'], row['output_path'])
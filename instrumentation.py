@@ -0,0 +1,209 @@
+# instrumentation.py - Tramos medidos en los puntos calientes y perfiles de una ejecución
+"""Medición opcional de los tramos por los que pasa una herramienta:
+
+    resolve  resolución DNS (getaddrinfo)
+    connect  conexiones TCP (escáner, WHOIS)
+    spawn    lanzamiento del proceso externo (Popen)
+    read     lectura y decodificación de cada bloque de salida del proceso
+    queue    reparto de la salida encolada en cada tick de la interfaz
+    format   resaltado de la salida (StreamingFormatter)
+    render   inserción en el widget de Tk
+
+Desactivada, span() devuelve un contexto vacío compartido y cuesta una
+llamada; activada, cada tramo suma su duración a un histograma
+logarítmico (y a metrics.SPANS para el endpoint de métricas).
+RunProfiler guarda el perfil de una ejecución en .prof (cProfile) y
+en pilas plegadas (.folded) para flamegraph.pl o speedscope.
+"""
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Dict, List
+
+from metrics import SPANS
+
+SPAN_NAMES = ('resolve', 'connect', 'spawn', 'read', 'queue', 'format', 'render')
+
+# Cubeta i: duraciones de hasta 2**i microsegundos
+BUCKETS = 32
+
+
+class SpanHistogram:
+    """Histograma logarítmico en base 2 de las duraciones de un tramo"""
+
+    def __init__(self):
+        self.counts = array('Q', [0] * BUCKETS)
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, ns: int) -> None:
+        self.counts[min((ns // 1000).bit_length(), BUCKETS - 1)] += 1
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def percentile(self, q: float) -> float:
+        """Límite superior (µs) de la cubeta que contiene el percentil q"""
+        rank = self.count * q / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(float(1 << index), self.max_ns / 1000)
+        return self.max_ns / 1000
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'total_ms': self.total_ns / 1e6,
+            'mean_us': self.total_ns / self.count / 1000 if self.count else 0.0,
+            'p50_us': self.percentile(50),
+            'p95_us': self.percentile(95),
+            'p99_us': self.percentile(99),
+            'max_us': self.max_ns / 1000,
+        }
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'started', 'owner')
+
+    def __init__(self, owner, name):
+        self.owner = owner
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.owner.record_ns(self.name, time.perf_counter_ns() - self.started)
+        return False
+
+
+class Instrumentation:
+    """Registro de tramos, activable en caliente"""
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, SpanHistogram] = {}
+
+    def enable(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+
+    def span(self, name: str):
+        return _Span(self, name) if self.enabled else _NULL_SPAN
+
+    def record(self, name: str, seconds: float) -> None:
+        """Registrar un tramo medido por otros medios (p. ej. los tiempos del Job)"""
+        if self.enabled:
+            self.record_ns(name, int(seconds * 1e9))
+
+    def record_ns(self, name: str, ns: int) -> None:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = SpanHistogram()
+            histogram.add(ns)
+        SPANS.observe(ns / 1e9, name)
+
+    def snapshot(self) -> List[Dict]:
+        """Resumen por tramo, en el orden de SPAN_NAMES"""
+        with self._lock:
+            items = [(name, histogram.summary()) for name, histogram in self._histograms.items()]
+        order = {name: i for i, name in enumerate(SPAN_NAMES)}
+        items.sort(key=lambda item: (order.get(item[0], len(order)), item[0]))
+        return [dict(summary, name=name) for name, summary in items]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def format_table(self) -> str:
+        lines = [f"{'Tramo':<10}{'Llamadas':>10}{'Media':>10}{'p50':>10}{'p95':>10}{'p99':>10}"
+                 f"{'Máx':>10}{'Total':>12}"]
+        for row in self.snapshot():
+            lines.append(
+                f"{row['name']:<10}{row['count']:>10}{row['mean_us']:>8.1f}µs{row['p50_us']:>8.0f}µs"
+                f"{row['p95_us']:>8.0f}µs{row['p99_us']:>8.0f}µs{row['max_us']:>8.0f}µs{row['total_ms']:>10.1f}ms")
+        return '\n'.join(lines) + '\n'
+
+
+INSTRUMENTS = Instrumentation()
+
+
+def span(name: str):
+    """Contexto que mide un tramo si la instrumentación está activa"""
+    return INSTRUMENTS.span(name) if INSTRUMENTS.enabled else _NULL_SPAN
+
+
+class RunProfiler:
+    """Perfil de una ejecución: cProfile del hilo del trabajo y muestreo de todos los hilos.
+
+    El muestreo incluye el hilo de Tk, así que el .folded muestra también
+    el coste de repartir y pintar la salida mientras la herramienta corre.
+    """
+
+    def __init__(self, path_prefix: str, interval: float = 0.005):
+        import cProfile
+        self.path_prefix = path_prefix
+        self.interval = interval
+        self.profile = cProfile.Profile()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name='profiler', daemon=True)
+
+    @property
+    def paths(self) -> List[str]:
+        return [self.path_prefix + '.prof', self.path_prefix + '.folded']
+
+    def _sample(self) -> None:
+        names = {}
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def run(self, function, *args):
+        """Ejecutar function(*args) perfilada y guardar los archivos al terminar"""
+        self._sampler.start()
+        try:
+            return self.profile.runcall(function, *args)
+        finally:
+            self._stop.set()
+            self._sampler.join()
+            self.save()
+
+    def save(self) -> None:
+        self.profile.dump_stats(self.path_prefix + '.prof')
+        with open(self.path_prefix + '.folded', 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
@@ -1,14 +1,23 @@
 # main_app.py - Enhanced Version
+import queue
 import tkinter as tk
-from tkinter import scrolledtext, messagebox, ttk, simpledialog
-import json
-import os
+from tkinter import messagebox, ttk, simpledialog
 from datetime import datetime
-from tool_definitions import TOOLS
-from command_runner import CommandRunner
+from tool_definitions import TOOLS, build_invocation, tool_executable, tool_executables
+from command_runner import CommandRunner, Job, command_target
+from terminal import SpillViewer, TerminalView
+from utils import NETWORK_STATE, ConfigManager, StreamingFormatter
+from instrumentation import INSTRUMENTS
 from enhanced_features import EnhancedNetworkApp
 
 class NetworkApp:
+    MAX_JOB_TABS = 12
+    HISTORY_PAGE = 200
+    NETWORK_POLL_MS = 500
+    JOB_STATUS_ICONS = {
+        Job.PENDING: '🕓', Job.RUNNING: '⏳', Job.DONE: '✅', Job.FAILED: '❌', Job.CANCELLED: '⚠️'
+    }
+
     def __init__(self, root):
         self.root = root
         self.root.title("Network Tools Pro v2.0")
@@ -19,21 +28,39 @@ class NetworkApp:
         self.setup_modern_theme()
         
         self.widgets = {}
-        self.is_running = False
-        self.command_history = []
+        self.job_tabs = {}
         self.current_tool = None
+        self.config_manager = ConfigManager()
+        self.history = self.config_manager.open_history()
+        self.history.prune_outputs()
+        self.history_entries = []
         
         self.setup_styles()
         
+        config = self.config_manager
         self.runner = CommandRunner(
-            self.root,
-            output_callback=self.append_output,
-            finished_callback=self.on_command_finished
-        )
+            self.root, max_workers=config.get('max_workers'),
+            batch_interval_ms=config.get('output_batch_interval_ms'),
+            batch_max_bytes=config.get('output_batch_max_bytes'),
+            batch_time_budget_ms=config.get('output_time_budget_ms'),
+            cache=config.open_result_cache())
+        # Resolver una sola vez los ejecutables de todas las herramientas
+        self.runner.resolver.preload(tool_executables())
         
         self.create_interface()
         self.setup_keyboard_shortcuts()
         self.load_last_tool()
+        self.config_manager.subscribe(self.on_config_changed)
+        INSTRUMENTS.enable(bool(config.get('instrumentation')))
+        self.metrics_server = None
+        if config.get('metrics_port'):
+            self.start_metrics_server(config.get('metrics_port'))
+        # La IP y el gateway se leen en segundo plano y se refrescan al cambiar la red
+        self.network_updates = queue.Queue()
+        NETWORK_STATE.subscribe(self.on_network_changed)
+        NETWORK_STATE.start_monitor()
+        self.poll_network_state()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def setup_modern_theme(self):
         self.colors = {
@@ -114,22 +141,80 @@ class NetworkApp:
         terminal_toolbar = tk.Frame(terminal_container, bg=self.colors['bg_secondary'])
         terminal_toolbar.pack(fill=tk.X, padx=5, pady=(5, 0))
         
+        tk.Button(terminal_toolbar, text="Cerrar pestaña", command=self.close_output_tab, bg=self.colors['bg_tertiary'],
+                 fg='white', font=("Segoe UI", 8)).pack(side=tk.RIGHT, padx=5)
+        tk.Button(terminal_toolbar, text="Cancelar", command=self.cancel_current_job, bg=self.colors['danger'],
+                 fg='white', font=("Segoe UI", 8)).pack(side=tk.RIGHT, padx=5)
+        tk.Button(terminal_toolbar, text="Ver completo", command=self.open_full_output, bg=self.colors['bg_tertiary'],
+                 fg='white', font=("Segoe UI", 8)).pack(side=tk.RIGHT, padx=5)
         tk.Button(terminal_toolbar, text="Limpiar", command=self.clear_output, bg=self.colors['accent'],
                  fg='white', font=("Segoe UI", 8)).pack(side=tk.RIGHT, padx=5)
 
-        self.output_area = scrolledtext.ScrolledText(
-            terminal_container, wrap=tk.WORD, state=tk.DISABLED, bg=self.colors['terminal_bg'],
-            fg=self.colors['terminal_fg'], font=("Courier New", 10), relief=tk.FLAT, bd=0)
-        self.output_area.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        # Cada trabajo escribe en su propia pestaña; la primera es la terminal general
+        self.output_notebook = ttk.Notebook(terminal_container, style='Modern.TNotebook')
+        self.output_notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.console_tab, self.console_terminal = self.create_output_tab("💻 Terminal")
         parent.add(terminal_container, height=300)
 
+    def create_output_tab(self, title, spill_path=None):
+        frame = tk.Frame(self.output_notebook, bg=self.colors['terminal_bg'])
+        terminal = TerminalView(
+            frame, max_lines=self.config_manager.get('terminal_max_lines'), formatter=StreamingFormatter.for_tool(None),
+            spill_path=spill_path, wrap=tk.WORD, bg=self.colors['terminal_bg'],
+            fg=self.colors['terminal_fg'], font=("Courier New", 10), relief=tk.FLAT, bd=0)
+        terminal.pack(fill=tk.BOTH, expand=True)
+        self.output_notebook.add(frame, text=title)
+        self.output_notebook.select(frame)
+        return frame, terminal
+
+    def open_output_tab(self, title):
+        """Abrir una pestaña de salida que no pertenece a un único trabajo"""
+        self.prune_output_tabs()
+        frame, terminal = self.create_output_tab(title)
+        self.job_tabs[str(frame)] = {'job': None, 'terminal': terminal}
+        return terminal
+
+    @property
+    def output_terminal(self):
+        """Terminal de la pestaña de salida seleccionada"""
+        tab = self.job_tabs.get(self.output_notebook.select())
+        return tab['terminal'] if tab else self.console_terminal
+
+    def current_job(self):
+        tab = self.job_tabs.get(self.output_notebook.select())
+        return tab['job'] if tab else None
+
     def create_history_tab(self):
         tk.Label(self.history_frame, text="📋 Historial de Comandos", font=("Segoe UI", 14, "bold"),
                 bg=self.colors['bg_primary'], fg=self.colors['text_primary']).pack(pady=10)
+        filter_frame = tk.Frame(self.history_frame, bg=self.colors['bg_primary'])
+        filter_frame.pack(fill=tk.X, padx=10)
+        label_options = {'bg': self.colors['bg_primary'], 'fg': self.colors['text_secondary']}
+        entry_options = {'bg': self.colors['bg_tertiary'], 'fg': self.colors['text_primary'],
+                         'insertbackground': self.colors['text_primary'], 'relief': tk.FLAT, 'bd': 4}
+        tk.Label(filter_frame, text="Herramienta:", **label_options).pack(side=tk.LEFT)
+        self.history_tool_var = tk.StringVar(value="Todas")
+        ttk.Combobox(filter_frame, textvariable=self.history_tool_var, values=["Todas"] + list(TOOLS),
+                     state='readonly', width=12).pack(side=tk.LEFT, padx=(2, 10))
+        tk.Label(filter_frame, text="Destino:", **label_options).pack(side=tk.LEFT)
+        self.history_target_entry = tk.Entry(filter_frame, width=20, **entry_options)
+        self.history_target_entry.pack(side=tk.LEFT, padx=(2, 10))
+        tk.Label(filter_frame, text="Desde (AAAA-MM-DD):", **label_options).pack(side=tk.LEFT)
+        self.history_since_entry = tk.Entry(filter_frame, width=12, **entry_options)
+        self.history_since_entry.pack(side=tk.LEFT, padx=(2, 10))
+        tk.Button(filter_frame, text="🔍 Buscar", command=self.search_history, bg=self.colors['accent'],
+                  fg='white', relief=tk.FLAT).pack(side=tk.LEFT, padx=2)
+        tk.Button(filter_frame, text="✖ Limpiar", command=self.reset_history_filter, bg=self.colors['bg_tertiary'],
+                  fg='white', relief=tk.FLAT).pack(side=tk.LEFT, padx=2)
+        self.history_target_entry.bind('<Return>', lambda e: self.search_history())
+
         self.history_listbox = tk.Listbox(self.history_frame, bg=self.colors['bg_tertiary'],
                                          fg=self.colors['text_primary'], selectbackground=self.colors['accent'],
                                          font=("Segoe UI", 10))
         self.history_listbox.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.history_listbox.bind('<Double-Button-1>', lambda e: self.open_history_output())
+        self.history_filtered = False
+        self.show_history_entries(self.history.search(limit=self.HISTORY_PAGE))
 
     def create_status_bar(self):
         self.status_bar = tk.Frame(self.root, bg=self.colors['bg_tertiary'], relief=tk.SUNKEN, bd=1, height=25)
@@ -137,6 +222,12 @@ class NetworkApp:
         self.status_label = tk.Label(self.status_bar, text="✅ Listo", bg=self.colors['bg_tertiary'],
                                    fg=self.colors['text_secondary'], font=("Segoe UI", 9))
         self.status_label.pack(side=tk.LEFT, padx=10, pady=2)
+        self.jobs_label = tk.Label(self.status_bar, text="", bg=self.colors['bg_tertiary'],
+                                   fg=self.colors['text_muted'], font=("Segoe UI", 9))
+        self.jobs_label.pack(side=tk.LEFT, padx=10, pady=2)
+        self.network_label = tk.Label(self.status_bar, text="", bg=self.colors['bg_tertiary'],
+                                      fg=self.colors['text_muted'], font=("Segoe UI", 9))
+        self.network_label.pack(side=tk.LEFT, padx=10, pady=2)
         
         signature_label = tk.Label(self.status_bar, text="Created by: Ez07-Code", bg=self.colors['bg_tertiary'],
                                    fg=self.colors['text_muted'], font=("Segoe UI", 9))
@@ -146,20 +237,26 @@ class NetworkApp:
         self.tool_listbox.delete(0, tk.END)
         search_term = self.search_var.get().lower()
         emoji_map = {
-            'PING': '📡', 'TRACERT': '🛤️', 'NSLOOKUP': '🔍', 'NETSTAT': '🌐', 
+            'PING': '📡', 'TRACERT': '🛤️', 'FASTTRACE': '🚀', 'MTR': '📈', 'NSLOOKUP': '🔍', 'NETSTAT': '🌐', 
             'IPCONFIG': '⚙️', 'ARP': '🏷️', 'SCANNER': '🔎', 'SUBNET': '🧮', 
-            'WOL': '⚡', 'WHOIS': '🌎'
+            'WOL': '⚡', 'BULKWOL': '⚡', 'WHOIS': '🌎'
         }
         for tool_name in TOOLS.keys():
             if not search_term or search_term in tool_name.lower():
                 emoji = emoji_map.get(tool_name, '🔧')
                 self.tool_listbox.insert(tk.END, f"{emoji} {tool_name}")
+                if not self.is_tool_available(tool_name):
+                    self.tool_listbox.itemconfig(tk.END, fg=self.colors['text_muted'])
+
+    def is_tool_available(self, tool_key):
+        executable = tool_executable(tool_key)
+        return executable is None or self.runner.resolver.exists(executable)
 
     def filter_tools(self, *args):
         self.populate_tool_list()
 
     def on_tool_select(self, event):
-        if self.is_running or not self.tool_listbox.curselection(): return
+        if not self.tool_listbox.curselection(): return
         selected_text = self.tool_listbox.get(self.tool_listbox.curselection()[0])
         tool_key = selected_text.split(' ', 1)[1]
         self.current_tool = tool_key
@@ -183,6 +280,12 @@ class NetworkApp:
         desc_text.config(state=tk.DISABLED)
         desc_text.pack(fill=tk.X, padx=5, pady=5)
 
+        if not self.is_tool_available(tool_key):
+            tk.Label(self.tool_detail_frame,
+                    text=f"⛔ '{tool_executable(tool_key)}' no está instalado o no está en el PATH del sistema",
+                    bg=self.colors['bg_secondary'], fg=self.colors['danger'], font=("Segoe UI", 9, "bold")
+                    ).pack(anchor="w", padx=10)
+
         params_frame = tk.LabelFrame(self.tool_detail_frame, text="⚙️ Parámetros", bg=self.colors['bg_secondary'],
                                     fg=self.colors['text_primary'], font=("Segoe UI", 10, "bold"))
         params_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -207,101 +310,238 @@ class NetworkApp:
         self.execute_button = tk.Button(action_frame, text=f"▶️ Ejecutar {tool_key}", command=self.build_and_run_command,
                                        bg=self.colors['success'], fg='white', font=("Segoe UI", 10, "bold"))
         self.execute_button.pack(side=tk.LEFT, padx=5)
+        # Mayús+clic: ejecutar de nuevo sin usar un resultado en caché
+        self.execute_button.bind('<Shift-Button-1>', lambda e: self.build_and_run_command(fresh=True) or "break")
+        if not self.is_tool_available(tool_key):
+            self.execute_button.config(state=tk.DISABLED)
 
     def setup_keyboard_shortcuts(self):
         self.root.bind('<Control-Return>', lambda e: self.build_and_run_command())
         self.root.bind('<F5>', lambda e: self.build_and_run_command())
+        self.root.bind('<Control-Shift-Return>', lambda e: self.build_and_run_command(fresh=True))
+        self.root.bind('<Shift-F5>', lambda e: self.build_and_run_command(fresh=True))
 
-    def build_and_run_command(self):
-        if self.is_running or not self.current_tool: return
-        tool_info = TOOLS[self.current_tool]
-        
-        params = {}
-        for param_def in tool_info["parameters"]:
-            widget = self.widgets.get(param_def['name'])
-            if not widget: continue
-            value = widget.get().strip()
-            if param_def["required"] and not value:
-                messagebox.showerror("Error", f"El parámetro '{param_def['name']}' es obligatorio.")
-                return
-            params[param_def['arg']] = value
+    def build_and_run_command(self, fresh=False):
+        if not self.current_tool: return
+        values = {name: widget.get() for name, widget in self.widgets.items()}
+        try:
+            command, internal, params = build_invocation(self.current_tool, values)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.execute_command(command, internal=internal, params=params, fresh=fresh)
 
-        if tool_info.get("internal"):
-            self.execute_command(tool_info["command"], internal=True, params=params)
-        else:
-            command_list = list(tool_info["command"])
-            for param_def in tool_info["parameters"]:
-                value = params.get(param_def['arg'])
-                if value:
-                    if param_def["arg"]: command_list.extend([param_def["arg"], value])
-                    else: command_list.extend(value.split())
-            self.execute_command(command_list)
-
-    def execute_command(self, command, internal=False, params={}):
-        self.is_running = True
-        self.set_ui_state(False)
-        self.update_status("⏳ Ejecutando...", "warning")
-        self.clear_output()
-        
-        if internal:
-            cmd_str = f"{command} with params {params}"
-            self.runner.run_command(command, internal=True, params=params)
+    def execute_command(self, command, internal=False, params={}, fresh=False):
+        name = self.current_tool or (command if internal else command[0])
+        cmd_str = f"{command} with params {params}" if internal else ' '.join(command)
+        entry = self.history.record_start(name, command_target(command, internal, params), cmd_str, params)
+        self.prune_output_tabs()
+        frame, terminal = self.create_output_tab(
+            f"{self.JOB_STATUS_ICONS[Job.PENDING]} {name}", spill_path=entry.output_path)
+        terminal.formatter = StreamingFormatter.for_tool(self.current_tool)
+        self.append_output(f"[{datetime.now().strftime('%H:%M:%S')}]> {cmd_str}\n\n", terminal)
+
+        job = self.runner.run_command(
+            command, timeout=self.config_manager.get('default_timeout'), internal=internal, params=params, name=name,
+            output_callback=lambda text: self.append_output(text, terminal),
+            live_callback=lambda text: self.show_live_table(text, terminal),
+            progress_callback=lambda stats: terminal.set_status(f"📊 {stats.format()}"),
+            finished_callback=lambda: self.on_command_finished(job), use_cache=not fresh
+        )
+        self.job_tabs[str(frame)] = {'job': job, 'terminal': terminal, 'history': entry}
+        self.output_notebook.tab(frame, text=f"{self.JOB_STATUS_ICONS[Job.RUNNING]} {name} #{job.id}")
+        self.update_status(f"⏳ Ejecutando {name}...", "warning")
+        self.update_jobs_label()
+        self.add_to_history(entry)
+        return job
+
+    def on_command_finished(self, job=None):
+        if job:
+            for frame, tab in self.job_tabs.items():
+                if tab['job'] is job:
+                    self.output_notebook.tab(frame, text=f"{self.JOB_STATUS_ICONS[job.status]} {job.name} #{job.id}")
+                    tab['terminal'].flush()
+                    entry = self.history.record_finish(tab['history'], job.status, job.return_code, job.duration())
+                    self.update_history_entry(entry)
+                    # También durante la sesión: las salidas guardadas no pasan de max_outputs
+                    self.history.prune_outputs()
+        self.update_jobs_label()
+        if job and job.status != Job.DONE:
+            self.update_status(f"⚠️ {job.name} #{job.id}: {job.status}", "danger")
+        elif job and job.from_cache:
+            self.update_status("💾 Resultado desde caché (Mayús+F5 para ejecutar de nuevo)", "success")
         else:
-            cmd_str = ' '.join(command)
-            self.runner.run_command(command)
+            self.update_status("✅ Comando completado", "success")
+
+    def update_jobs_label(self):
+        active = len(self.runner.active_jobs())
+        self.jobs_label.config(text=f"⏳ Trabajos activos: {active}" if active else "")
 
-        self.append_output(f"[{datetime.now().strftime('%H:%M:%S')}]> {cmd_str}\n\n")
-        self.add_to_history(cmd_str)
+    def prune_output_tabs(self):
+        """Cerrar las pestañas terminadas más antiguas al superar el límite"""
+        finished = [frame for frame, tab in self.job_tabs.items() if tab['job'] and not tab['job'].is_active]
+        excess = len(self.job_tabs) + 1 - self.MAX_JOB_TABS
+        for frame in finished[:max(excess, 0)]:
+            self.output_notebook.forget(frame)
+            self.job_tabs.pop(frame)['terminal'].close()
 
-    def on_command_finished(self):
-        self.is_running = False
-        self.set_ui_state(True)
-        self.update_status("✅ Comando completado", "success")
+    def cancel_current_job(self):
+        job = self.current_job()
+        if job and self.runner.cancel_command(job):
+            self.update_status(f"⚠️ Cancelando {job.name} #{job.id}...", "warning")
 
-    def set_ui_state(self, enabled):
-        state = tk.NORMAL if enabled else tk.DISABLED
-        if hasattr(self, 'execute_button'): self.execute_button.config(state=state)
-        self.tool_listbox.config(state=state)
-        for widget in self.widgets.values(): widget.config(state=state)
+    def close_output_tab(self):
+        frame = self.output_notebook.select()
+        tab = self.job_tabs.get(frame)
+        if not tab:
+            return
+        if tab['job'] and tab['job'].is_active:
+            if not messagebox.askyesno("Trabajo en ejecución", "El trabajo sigue en ejecución. ¿Cancelarlo y cerrar la pestaña?"):
+                return
+            self.runner.cancel_command(tab['job'])
+        self.output_notebook.forget(frame)
+        self.job_tabs.pop(frame)['terminal'].close()
+
+    def append_output(self, text, terminal=None):
+        (terminal or self.output_terminal).append(text)
 
-    def append_output(self, text):
-        self.output_area.config(state=tk.NORMAL)
-        self.output_area.insert(tk.END, text)
-        self.output_area.see(tk.END)
-        self.output_area.config(state=tk.DISABLED)
+    def show_live_table(self, text, terminal=None):
+        """Reemplazar la tabla en vivo al final de la terminal"""
+        (terminal or self.output_terminal).replace_tail(text)
 
     def clear_output(self):
-        if self.is_running: return
-        self.output_area.config(state=tk.NORMAL)
-        self.output_area.delete(1.0, tk.END)
-        self.output_area.config(state=tk.DISABLED)
+        self.output_terminal.clear()
+
+    def open_full_output(self):
+        """Abrir la salida completa de la pestaña actual en el visor paginado"""
+        job = self.current_job()
+        title = f"Salida completa - {job.name} #{job.id}" if job else "Salida completa - Terminal"
+        self.output_terminal.open_viewer(title=title)
 
-    def add_to_history(self, command):
-        self.command_history.insert(0, f"[{datetime.now().strftime('%H:%M')}] {command}")
-        if len(self.command_history) > 100: self.command_history.pop()
-        self.update_history_display()
+    def format_history_entry(self, entry):
+        started = datetime.fromtimestamp(entry.started_at).strftime('%Y-%m-%d %H:%M:%S')
+        icon = self.JOB_STATUS_ICONS.get(entry.status or Job.RUNNING, '•')
+        duration = f" ({entry.duration:.2f}s)" if entry.duration is not None else ""
+        target = f" → {entry.target}" if entry.target else ""
+        return f"[{started}] {icon} {entry.tool}{target}{duration} | {entry.command}"
 
-    def update_history_display(self):
+    def show_history_entries(self, entries):
+        self.history_entries = list(entries)
         self.history_listbox.delete(0, tk.END)
-        for entry in self.command_history: self.history_listbox.insert(tk.END, entry)
+        if self.history_entries:
+            self.history_listbox.insert(tk.END, *(self.format_history_entry(e) for e in self.history_entries))
 
-    def load_last_tool(self):
+    def add_to_history(self, entry):
+        """Insertar la nueva ejecución arriba sin reconstruir la lista"""
+        if self.history_filtered:
+            return
+        self.history_entries.insert(0, entry)
+        self.history_listbox.insert(0, self.format_history_entry(entry))
+        if len(self.history_entries) > self.HISTORY_PAGE:
+            self.history_entries.pop()
+            self.history_listbox.delete(tk.END)
+
+    def update_history_entry(self, entry):
+        """Actualizar solo la fila de una ejecución que ha terminado"""
+        for index, shown in enumerate(self.history_entries):
+            if shown.id == entry.id:
+                self.history_entries[index] = entry
+                self.history_listbox.delete(index)
+                self.history_listbox.insert(index, self.format_history_entry(entry))
+                break
+
+    def search_history(self):
+        tool = self.history_tool_var.get()
+        since_text = self.history_since_entry.get().strip()
         try:
-            if os.path.exists('config.json'):
-                with open('config.json', 'r') as f:
-                    tool = json.load(f).get('last_tool')
-                    if tool and tool in TOOLS:
-                        for i, item in enumerate(self.tool_listbox.get(0, tk.END)):
-                            if tool in item:
-                                self.tool_listbox.selection_set(i)
-                                self.on_tool_select(None)
-                                return
-        except: pass
+            since = datetime.strptime(since_text, '%Y-%m-%d').timestamp() if since_text else None
+        except ValueError:
+            messagebox.showerror("Error", "La fecha debe tener el formato AAAA-MM-DD.")
+            return
+        entries = self.history.search(
+            tool=None if tool == "Todas" else tool, target=self.history_target_entry.get().strip() or None,
+            since=since, limit=self.HISTORY_PAGE)
+        self.history_filtered = True
+        self.show_history_entries(entries)
+
+    def reset_history_filter(self):
+        self.history_tool_var.set("Todas")
+        self.history_target_entry.delete(0, tk.END)
+        self.history_since_entry.delete(0, tk.END)
+        self.history_filtered = False
+        self.show_history_entries(self.history.search(limit=self.HISTORY_PAGE))
+
+    def open_history_output(self):
+        selection = self.history_listbox.curselection()
+        if not selection:
+            return
+        entry = self.history_entries[selection[0]]
+        if not entry.has_output:
+            messagebox.showinfo("Historial", "La salida de esta ejecución ya no está disponible.")
+            return
+        SpillViewer(self.root, entry.output_path, title=f"Historial #{entry.id} - {entry.tool}")
+
+    def load_last_tool(self):
+        tool = self.config_manager.get('last_tool')
+        if self.config_manager.load_error:
+            self.update_status("⚠️ Configuración no válida, se usan los valores por defecto", "warning")
+        if tool in TOOLS:
+            for i, item in enumerate(self.tool_listbox.get(0, tk.END)):
+                if tool in item:
+                    self.tool_listbox.selection_set(i)
+                    self.on_tool_select(None)
+                    return
         self.tool_listbox.selection_set(0)
         self.on_tool_select(None)
 
     def save_last_tool(self, tool_name):
-        with open('config.json', 'w') as f: json.dump({'last_tool': tool_name}, f)
+        # Solo cambia el valor en memoria; ConfigManager lo guarda en segundo plano
+        self.config_manager.set('last_tool', tool_name)
+
+    def on_config_changed(self, key, value):
+        if key == 'terminal_max_lines':
+            self.root.after(0, self.apply_terminal_max_lines, value)
+
+    def start_metrics_server(self, port):
+        from metrics import MetricsServer
+        try:
+            self.metrics_server = MetricsServer(port).start()
+        except OSError as e:
+            self.update_status(f"⚠️ No se pudo abrir el puerto de métricas {port}: {e}", "warning")
+
+    def on_network_changed(self, local_ip, gateway):
+        # Llamado desde el hilo del monitor de red; la interfaz lo recoge en poll_network_state
+        self.network_updates.put((local_ip, gateway))
+
+    def poll_network_state(self):
+        state = None
+        while not self.network_updates.empty():
+            state = self.network_updates.get_nowait()
+        if state:
+            local_ip, gateway = state
+            self.network_label.config(text=f"🖧 {local_ip} · gateway {gateway or 'no detectado'}")
+        self.root.after(self.NETWORK_POLL_MS, self.poll_network_state)
+
+    def apply_terminal_max_lines(self, max_lines):
+        for terminal in [self.console_terminal] + [tab['terminal'] for tab in self.job_tabs.values()]:
+            terminal.max_lines = max_lines
+
+    def on_close(self):
+        self.runner.shutdown()
+        self.console_terminal.close()
+        for tab in self.job_tabs.values():
+            tab['terminal'].close()
+        self.history.close()
+        try:
+            self.runner.cache.save()
+        except OSError as e:
+            print(f"Error guardando la caché de resultados: {e}")
+        self.config_manager.flush()
+        NETWORK_STATE.stop_monitor()
+        if self.metrics_server:
+            self.metrics_server.close()
+        NETWORK_STATE.unsubscribe(self.on_network_changed)
+        self.root.destroy()
 
     def update_status(self, message, status_type="primary"):
         color_map = {'success': self.colors['success'], 'warning': '#ffc107', 'danger': self.colors['danger']}
@@ -0,0 +1,287 @@
+# metrics.py - Métricas de herramientas y sondas en formato de texto de Prometheus
+"""Contadores, histogramas y gauges en memoria y un endpoint HTTP local
+que los sirve para que el sistema de monitorización los recoja:
+
+    curl http://127.0.0.1:9464/metrics
+
+Registrar una observación cuesta un bisect y un incremento bajo un
+cerrojo, y render() solo recorre las series existentes, así que se
+puede consultar cada pocos segundos sin coste apreciable.
+"""
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+RTT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SPAWN_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SPAN_BUCKETS = (0.00001, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+DURATION_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base de las métricas: nombre, ayuda, nombres de etiquetas y series por etiquetas"""
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple, object] = {}
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._series.items())
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in items]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, *labels) -> None:
+        with self._lock:
+            self._series[labels] = value
+
+
+class CallbackGauge(Metric):
+    """Gauge calculado al consultarlo, sumando las fuentes registradas.
+
+    Cada fuente devuelve {etiquetas: valor}; se guardan con referencias
+    débiles para que un CommandRunner cerrado deje de contar solo.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._sources = []
+
+    def add_source(self, source: Callable[[], Dict[Tuple, float]]) -> None:
+        ref = weakref.WeakMethod(source) if hasattr(source, '__self__') else (lambda: source)
+        with self._lock:
+            self._sources.append(ref)
+
+    def samples(self) -> List[str]:
+        totals: Dict[Tuple, float] = {}
+        with self._lock:
+            sources = [ref() for ref in self._sources]
+            self._sources = [ref for ref, source in zip(self._sources, sources) if source is not None]
+        for source in sources:
+            if source is None:
+                continue
+            for key, value in source().items():
+                totals[key] = totals.get(key, 0) + value
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in totals.items()]
+
+
+class Histogram(Metric):
+    """Histograma de cubetas fijas; las cuentas se acumulan al generar el texto"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = RTT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas que se publican juntas"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric: Metric) -> Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, documentation, labels))
+
+    def callback_gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> CallbackGauge:
+        return self._add(CallbackGauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = RTT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        """Texto en el formato de exposición de Prometheus (0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            samples = metric.samples()
+            if samples:
+                lines.extend(metric.header())
+                lines.extend(samples)
+        lines.extend(process_samples())
+        return '\n'.join(lines) + '\n'
+
+
+_STARTED = time.time()
+
+
+def process_samples() -> List[str]:
+    """Memoria, CPU y procesos hijos de esta aplicación (psutil si está instalado)"""
+    lines = [
+        "# HELP process_start_time_seconds Inicio del proceso (epoch)",
+        "# TYPE process_start_time_seconds gauge",
+        f"process_start_time_seconds {_STARTED}",
+    ]
+    try:
+        import psutil
+    except ImportError:
+        return lines
+    process = psutil.Process(os.getpid())
+    with process.oneshot():
+        cpu = process.cpu_times()
+        lines += [
+            "# HELP process_cpu_seconds_total Tiempo de CPU del proceso",
+            "# TYPE process_cpu_seconds_total counter",
+            f"process_cpu_seconds_total {cpu.user + cpu.system}",
+            "# HELP process_resident_memory_bytes Memoria residente del proceso",
+            "# TYPE process_resident_memory_bytes gauge",
+            f"process_resident_memory_bytes {process.memory_info().rss}",
+            "# HELP networktools_child_processes Procesos hijo en ejecución (herramientas externas)",
+            "# TYPE networktools_child_processes gauge",
+            f"networktools_child_processes {len(process.children(recursive=True))}",
+        ]
+    return lines
+
+
+REGISTRY = MetricsRegistry()
+
+TOOL_RUNS = REGISTRY.counter(
+    'networktools_tool_runs_total', "Ejecuciones de herramientas por estado final", ('tool', 'status'))
+TOOL_DURATION = REGISTRY.histogram(
+    'networktools_tool_duration_seconds', "Duración de las ejecuciones de herramientas", ('tool',),
+    DURATION_BUCKETS)
+SPAWN_LATENCY = REGISTRY.histogram(
+    'networktools_spawn_latency_seconds',
+    "Latencias de procesos externos: launch (Popen), first_byte (hasta el primer byte) y exit",
+    ('tool', 'phase'), SPAWN_BUCKETS)
+JOBS = REGISTRY.callback_gauge(
+    'networktools_jobs', "Trabajos en el planificador por estado (pending = cola)", ('state',))
+OUTPUT_PENDING = REGISTRY.callback_gauge(
+    'networktools_output_pending_bytes', "Salida producida y aún no pintada en la interfaz")
+PORTS_SCANNED = REGISTRY.counter(
+    'networktools_ports_scanned_total', "Puertos comprobados por el escáner", ('result',))
+# Sin etiqueta de host: un barrido por muchos equipos no debe crear una serie por cada uno
+SCAN_RATE = REGISTRY.gauge(
+    'networktools_scan_ports_per_second', "Ritmo del último escaneo de puertos")
+PROBE_RESULTS = REGISTRY.counter(
+    'networktools_probe_results_total', "Sondas ejecutadas por resultado (lost = sin respuesta)",
+    ('probe', 'target', 'result'))
+CACHE_LOOKUPS = REGISTRY.counter(
+    'networktools_result_cache_lookups_total', "Consultas a la caché de resultados (hit, miss, bypass)",
+    ('tool', 'result'))
+SPANS = REGISTRY.histogram(
+    'networktools_span_seconds', "Tramos medidos por instrumentation.py (solo con la instrumentación activa)",
+    ('span',), SPAN_BUCKETS)
+PROBE_RTT = REGISTRY.histogram(
+    'networktools_probe_rtt_seconds', "Tiempo de respuesta de las sondas", ('probe', 'target'), RTT_BUCKETS)
+
+
+def _make_handler(registry: MetricsRegistry):
+    # http.server se importa aquí para no cargarlo al arrancar la aplicación
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+class MetricsServer:
+    """Servidor HTTP en un hilo aparte que publica un registro en /metrics"""
+
+    def __init__(self, port: int = 9464, host: str = '127.0.0.1', registry: Optional[MetricsRegistry] = None):
+        from http.server import ThreadingHTTPServer
+        self._server = ThreadingHTTPServer((host, port), _make_handler(registry or REGISTRY))
+        self._server.daemon_threads = True
+        self.address = self._server.server_address
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.address[0]}:{self.address[1]}/metrics"
+
+    def start(self) -> 'MetricsServer':
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,207 @@
+# networktools.py - Punto de entrada sin interfaz gráfica (python -m networktools)
+"""Ejecuta las herramientas de TOOLS desde la línea de comandos.
+
+No importa tkinter, matplotlib ni NumPy, de modo que arranca rápido y se
+puede usar desde cron o CI en los equipos de sondeo.
+
+Ejemplos:
+    python -m networktools list
+    python -m networktools scan 192.168.1.10 22,80,443 --output puertos.jsonl
+    python -m networktools mtr 8.8.8.8 20
+    python -m networktools batch lote.json --output resultados.csv
+    python -m networktools daemon sondas.json
+"""
+import argparse
+import sys
+
+from batch_engine import BatchEngine, read_batch_file
+from command_runner import CommandRunner, Job
+from instrumentation import INSTRUMENTS
+from results import ResultWriter
+from tool_definitions import TOOLS, build_invocation
+
+# Nombres cortos para las herramientas más usadas en scripts
+ALIASES = {
+    'scan': 'SCANNER',
+    'trace': 'FASTTRACE',
+    'traceroute': 'FASTTRACE',
+    'ifconfig': 'IPCONFIG',
+}
+
+
+def resolve_tool(name):
+    key = ALIASES.get(name.lower(), name.upper())
+    if key not in TOOLS:
+        raise ValueError(f"Herramienta desconocida: '{name}' (use 'list' para ver las disponibles)")
+    return key
+
+
+def values_from_args(tool_key, args):
+    """Asignar los argumentos posicionales a los parámetros en orden ('' = valor por defecto)"""
+    parameters = TOOLS[tool_key]["parameters"]
+    if len(args) > len(parameters):
+        raise ValueError(f"{tool_key} admite como máximo {len(parameters)} parámetros")
+    return {param['name']: (value or None) for param, value in zip(parameters, args)}
+
+
+class ConsoleOutput:
+    """Callbacks de trabajo que escriben en la consola"""
+
+    def __init__(self, stream, quiet=False, prefix=None):
+        self.stream = stream
+        self.quiet = quiet
+        self.prefix = prefix
+        self.interactive = stream.isatty()
+        self.last_live = None
+        self.last_progress = None
+
+    def output(self, text):
+        if self.quiet:
+            return
+        if self.prefix:
+            text = ''.join(self.prefix + line for line in text.splitlines(True))
+        self.stream.write(text)
+        self.stream.flush()
+
+    def live(self, text):
+        # En una terminal se redibuja la tabla; en un archivo solo se escribe la última
+        if self.interactive and not self.quiet:
+            self.stream.write("\x1b[H\x1b[J" + text)
+            self.stream.flush()
+        self.last_live = text
+
+    def progress(self, stats):
+        self.last_progress = stats
+
+    def finish(self):
+        if self.last_live and not self.interactive and not self.quiet:
+            self.stream.write(self.last_live)
+        if self.last_progress is not None and not self.quiet:
+            self.stream.write(f"📊 {self.last_progress.format()}\n")
+        self.stream.flush()
+
+
+def list_tools(stream):
+    width = max(len(key) for key in TOOLS)
+    for key, tool in TOOLS.items():
+        params = " ".join(
+            f"<{p['name']}>" if p['required'] else f"[{p['name']}={p.get('default', '')}]"
+            for p in tool["parameters"]
+        )
+        stream.write(f"{key.lower():<{width}}  {params}\n")
+    return 0
+
+
+def run_tool(runner, tool_key, values, timeout, writer, quiet, profile=None, fresh=False):
+    command, internal, params = build_invocation(tool_key, values)
+    console = ConsoleOutput(sys.stdout, quiet)
+    job = runner.run_command(
+        command, timeout=timeout, internal=internal, params=params, name=tool_key, tool=tool_key,
+        output_callback=console.output, live_callback=console.live, progress_callback=console.progress,
+        result_callback=writer.write if writer else None, profile_path=profile, use_cache=not fresh
+    )
+    runner.wait([job])
+    if profile:
+        # Los archivos del perfil se escriben al volver del hilo del trabajo
+        job.future.result()
+    console.finish()
+    return 0 if job.status == Job.DONE else 1
+
+
+def run_batch(runner, path, output, quiet, timeout=300):
+    consoles = {}
+
+    def on_output(step, text):
+        if step.id not in consoles:
+            consoles[step.id] = ConsoleOutput(sys.stdout, quiet, prefix=f"[#{step.id} {step.tool}] ")
+        consoles[step.id].output(text)
+
+    engine = BatchEngine(runner, on_output=on_output, timeout=timeout)
+    steps = read_batch_file(path)
+    engine.run(steps)
+    try:
+        # Los pasos dependientes se envían al terminar sus dependencias
+        while engine.is_running:
+            runner.wait()
+        if output:
+            engine.export_results(output)
+    finally:
+        engine.close()
+    sys.stderr.write(
+        f"Lote terminado en {engine.elapsed():.2f}s (suma de pasos: {engine.total_step_time():.2f}s)\n")
+    return 0 if all(step.status == Job.DONE for step in steps) else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="networktools", description="Herramientas de red sin interfaz gráfica.")
+    parser.add_argument('tool', help="herramienta (ver 'list'), 'list', 'batch' o 'daemon'")
+    parser.add_argument('values', nargs='*',
+                        help="parámetros de la herramienta en orden, o el archivo del lote o de las sondas")
+    parser.add_argument('-o', '--output', help="guardar los resultados estructurados (.jsonl o .csv)")
+    parser.add_argument('-t', '--timeout', type=int, default=300, help="tiempo máximo por comando en segundos")
+    parser.add_argument('-j', '--jobs', type=int, default=4, help="trabajos en paralelo para los lotes")
+    parser.add_argument('-q', '--quiet', action='store_true', help="no mostrar la salida de las herramientas")
+    parser.add_argument('--spans', action='store_true',
+                        help="medir los tramos (resolve, connect, spawn, read...) y mostrarlos al terminar")
+    parser.add_argument('--profile', metavar='PREFIJO',
+                        help="guardar el perfil de la ejecución en PREFIJO.prof y PREFIJO.folded")
+    parser.add_argument('--cache', metavar='ARCHIVO',
+                        help="reutilizar los resultados de SUBNET, WHOIS y NSLOOKUP guardados en ARCHIVO")
+    parser.add_argument('--fresh', action='store_true',
+                        help="con --cache, ejecutar de nuevo y actualizar el resultado guardado")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.tool == 'list':
+        return list_tools(sys.stdout)
+
+    if args.tool == 'daemon':
+        if len(args.values) != 1:
+            sys.stderr.write("Error: Uso: networktools daemon <sondas.json>\n")
+            return 2
+        from probe_daemon import main as probe_main
+        return probe_main(['run', args.values[0]] + (['--quiet'] if args.quiet else []))
+
+    INSTRUMENTS.enable(args.spans)
+    cache = None
+    if args.cache:
+        from result_cache import ResultCache
+        cache = ResultCache(path=args.cache)
+    runner = CommandRunner(None, max_workers=args.jobs, cache=cache)
+    writer = None
+    try:
+        if args.tool == 'batch':
+            if len(args.values) != 1:
+                raise ValueError("Uso: networktools batch <archivo.json>")
+            return run_batch(runner, args.values[0], args.output, args.quiet, args.timeout)
+        tool_key = resolve_tool(args.tool)
+        values = values_from_args(tool_key, args.values)
+        writer = ResultWriter(args.output) if args.output else None
+        return run_tool(runner, tool_key, values, args.timeout, writer, args.quiet, args.profile, args.fresh)
+    except (ValueError, OSError) as e:
+        sys.stderr.write(f"Error: {e}\n")
+        return 2
+    except KeyboardInterrupt:
+        runner.cancel_command()
+        runner.wait(timeout=5)
+        return 130
+    finally:
+        if writer:
+            writer.close()
+        runner.shutdown()
+        if cache:
+            try:
+                cache.save()
+            except OSError as e:
+                sys.stderr.write(f"Error guardando la caché: {e}\n")
+        if args.spans:
+            sys.stderr.write(INSTRUMENTS.format_table())
+        if args.profile:
+            sys.stderr.write(f"Perfil guardado en {args.profile}.prof y {args.profile}.folded\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+# probe_daemon.py - Sondas programadas sin interfaz gráfica (ping, puertos, DNS)
+"""Ejecuta sondas periódicas contra listas de destinos y guarda los
+resultados en un TimeSeriesStore local.
+
+    python -m probe_daemon run sondas.json
+    python -m probe_daemon query sondas.sqlite3 ping 8.8.8.8 --hours 6
+
+Ejemplo de sondas.json:
+    {
+      "store": "sondas.sqlite3",
+      "workers": 64,
+      "retention": {"raw": 21600},
+      "metrics_port": 9464,
+      "probes": [
+        {"type": "ping", "interval": 1, "timeout": 1, "targets": ["192.168.1.1", "8.8.8.8"]},
+        {"type": "port", "interval": 10, "targets": ["example.com:443"]},
+        {"type": "dns", "interval": 30, "targets": ["google.com"]}
+      ]
+    }
+"""
+import argparse
+import heapq
+import json
+import math
+import random
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from metrics import PROBE_RESULTS, PROBE_RTT, MetricsServer
+from timeseries import TimeSeriesStore
+from utils import NetworkUtils
+
+
+def probe_ping(target: str, timeout: float) -> Optional[float]:
+    result = NetworkUtils.ping_host(target, count=1, timeout=max(1, math.ceil(timeout)), max_time=timeout + 1)
+    return result.avg_time if result.success else None
+
+
+def probe_port(target: str, timeout: float) -> Optional[float]:
+    host, _, port = target.rpartition(':')
+    try:
+        result = NetworkUtils.scan_port(host, int(port), timeout)
+    except OSError:
+        return None
+    return result.rtt_ms if result.open else None
+
+
+def probe_dns(target: str, timeout: float) -> Optional[float]:
+    started = time.perf_counter()
+    result = NetworkUtils.resolve_hostname(target)
+    return round((time.perf_counter() - started) * 1000, 3) if result.success else None
+
+
+# Cada sonda devuelve el tiempo en ms o None si no hubo respuesta
+PROBES: Dict[str, Callable[[str, float], Optional[float]]] = {
+    'ping': probe_ping,
+    'port': probe_port,
+    'dns': probe_dns,
+}
+
+
+@dataclass(slots=True)
+class ProbeTask:
+    """Una sonda sobre un destino, con su próxima ejecución prevista"""
+    kind: str
+    target: str
+    interval: float
+    timeout: float
+    next_run: float = 0.0
+    running: bool = False
+
+
+def build_tasks(probes: List[Dict], start: float, rng: random.Random) -> List[ProbeTask]:
+    """Repartir los destinos de cada grupo a lo largo de su intervalo"""
+    tasks = []
+    for group in probes:
+        kind = group.get('type')
+        if kind not in PROBES:
+            raise ValueError(f"Tipo de sonda desconocido: {kind!r} (disponibles: {', '.join(PROBES)})")
+        interval = float(group.get('interval', 60))
+        if interval < 1:
+            # El almacén guarda una muestra por segundo y serie
+            raise ValueError(f"Intervalo no válido para {kind}: {interval} (mínimo 1 s)")
+        timeout = float(group.get('timeout', min(interval, 5)))
+        targets = group.get('targets') or []
+        for i, target in enumerate(targets):
+            # Desfase uniforme más un poco de azar: nunca salen todas a la vez
+            offset = interval * i / len(targets) + rng.uniform(0, interval / len(targets))
+            tasks.append(ProbeTask(kind, str(target), interval, timeout, start + offset))
+    return tasks
+
+
+class ProbeScheduler:
+    """Planificador de sondas a ritmo fijo con desfase y jitter.
+
+    Cada tarea conserva su calendario (next_run += interval) para no ir
+    acumulando retraso; si una ejecución sigue en marcha cuando toca la
+    siguiente, esa se omite en lugar de solaparse.
+    """
+
+    def __init__(self, store: TimeSeriesStore, probes: List[Dict], workers: int = 64,
+                 jitter: float = 0.05, flush_interval: float = 1.0, rollup_interval: float = 60.0,
+                 seed: Optional[int] = None):
+        self.store = store
+        self.jitter = jitter
+        self.flush_interval = flush_interval
+        self.rollup_interval = rollup_interval
+        self.rng = random.Random(seed)
+        self.tasks = build_tasks(probes, time.monotonic(), self.rng)
+        if not self.tasks:
+            raise ValueError("La configuración no tiene destinos que sondear")
+        self.stats = {'runs': 0, 'failures': 0, 'skipped': 0, 'errors': 0}
+        self._stats_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='probe')
+        self._stop = threading.Event()
+        self._heap = []
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _run_task(self, task: ProbeTask) -> None:
+        ts = time.time()
+        try:
+            value = PROBES[task.kind](task.target, task.timeout)
+        except Exception as e:
+            # Una sonda rota no debe parar el demonio
+            self._count('errors')
+            print(f"Error en sonda {task.kind} {task.target}: {e}", file=sys.stderr)
+            value = None
+        self.store.append(task.kind, task.target, value, ts)
+        self._count('runs')
+        if value is None:
+            self._count('failures')
+            PROBE_RESULTS.inc(task.kind, task.target, 'lost')
+        else:
+            PROBE_RESULTS.inc(task.kind, task.target, 'ok')
+            PROBE_RTT.observe(value / 1000, task.kind, task.target)
+        task.running = False
+
+    def _push(self, task: ProbeTask) -> None:
+        due = task.next_run + self.rng.uniform(0, self.jitter * task.interval)
+        heapq.heappush(self._heap, (due, id(task), task))
+
+    def run(self, duration: Optional[float] = None) -> None:
+        """Ejecutar hasta stop() o durante duration segundos"""
+        for task in self.tasks:
+            self._push(task)
+        maintenance = threading.Thread(target=self._maintenance, name='probe-store', daemon=True)
+        maintenance.start()
+        end = time.monotonic() + duration if duration is not None else None
+        try:
+            while not self._stop.is_set():
+                due, _, task = self._heap[0]
+                now = time.monotonic()
+                if end is not None and due >= end:
+                    self._stop.wait(max(end - now, 0))
+                    break
+                if due > now:
+                    self._stop.wait(due - now)
+                    continue
+                heapq.heappop(self._heap)
+                if task.running:
+                    self._count('skipped')
+                else:
+                    task.running = True
+                    self._executor.submit(self._run_task, task)
+                task.next_run += task.interval
+                # Tras una pausa larga (p. ej. suspensión) se salta a la próxima cita
+                if task.next_run < now - task.interval:
+                    task.next_run += (now - task.next_run) // task.interval * task.interval
+                self._push(task)
+        finally:
+            self._stop.set()
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            maintenance.join()
+            self.store.rollup()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _maintenance(self) -> None:
+        last_rollup = time.monotonic()
+        while not self._stop.wait(self.flush_interval):
+            self.store.flush()
+            if time.monotonic() - last_rollup >= self.rollup_interval:
+                self.store.rollup()
+                last_rollup = time.monotonic()
+
+
+def load_config(path: str) -> Dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    if not isinstance(config, dict) or not isinstance(config.get('probes'), list):
+        raise ValueError(f"{path}: se esperaba un objeto con la lista 'probes'")
+    return config
+
+
+def run_daemon(config_path: str, store_path: Optional[str] = None, duration: Optional[float] = None,
+               quiet: bool = False, metrics_port: Optional[int] = None) -> int:
+    config = load_config(config_path)
+    metrics_port = metrics_port if metrics_port is not None else config.get('metrics_port')
+    store = TimeSeriesStore(store_path or config.get('store', 'sondas.sqlite3'), config.get('retention'))
+    server = None
+    try:
+        if metrics_port:
+            server = MetricsServer(int(metrics_port), config.get('metrics_host', '127.0.0.1')).start()
+            if not quiet:
+                print(f"Métricas en {server.url}", file=sys.stderr)
+        scheduler = ProbeScheduler(store, config['probes'], workers=int(config.get('workers', 64)),
+                                   jitter=float(config.get('jitter', 0.05)))
+        previous = signal.signal(signal.SIGTERM, lambda *_: scheduler.stop())
+        if not quiet:
+            print(f"Sondeando {len(scheduler.tasks)} destinos → {store.path}", file=sys.stderr)
+        try:
+            scheduler.run(duration)
+        except KeyboardInterrupt:
+            scheduler.stop()
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+        if not quiet:
+            stats = scheduler.stats
+            print(f"Sondas: {stats['runs']} ejecutadas, {stats['failures']} sin respuesta, "
+                  f"{stats['skipped']} omitidas por solaparse, {stats['errors']} errores", file=sys.stderr)
+    finally:
+        if server:
+            server.close()
+        store.close()
+    return 0
+
+
+def print_series(store_path: str, probe: str, target: str, hours: float, resolution: Optional[int]) -> int:
+    store = TimeSeriesStore(store_path)
+    try:
+        now = time.time()
+        points = store.query(probe, target, now - hours * 3600, now, resolution)
+    finally:
+        store.close()
+    for point in points:
+        stamp = datetime.fromtimestamp(point.ts).strftime('%Y-%m-%d %H:%M:%S')
+        if point.avg_ms is None:
+            print(f"{stamp}  sin respuesta ({point.samples} muestras)")
+        else:
+            print(f"{stamp}  media {point.avg_ms:8.2f} ms  mín {point.min_ms:8.2f}  máx {point.max_ms:8.2f}  "
+                  f"pérdida {point.loss:5.1f}%  ({point.samples} muestras)")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="probe_daemon", description="Sondas programadas de red.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help="ejecutar las sondas de un archivo de configuración")
+    run.add_argument('config')
+    run.add_argument('--store', help="base de datos de series (por defecto la de la configuración)")
+    run.add_argument('--duration', type=float, help="parar a los N segundos")
+    run.add_argument('--metrics-port', type=int, help="publicar métricas de Prometheus en este puerto")
+    run.add_argument('-q', '--quiet', action='store_true')
+    query = commands.add_parser('query', help="mostrar una serie guardada")
+    query.add_argument('store')
+    query.add_argument('probe', choices=sorted(PROBES))
+    query.add_argument('target')
+    query.add_argument('--hours', type=float, default=1.0)
+    query.add_argument('--resolution', type=int, choices=(1, 60, 3600),
+                       help="segundos por punto (por defecto según el intervalo)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        if args.command == 'run':
+            return run_daemon(args.config, args.store, args.duration, args.quiet, args.metrics_port)
+        return print_series(args.store, args.probe, args.target, args.hours, args.resolution)
+    except (ValueError, OSError) as e:
+        sys.stderr.write(f"Error: {e}\n")
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+# result_cache.py - Caché de resultados de herramientas idempotentes (TTL por herramienta y LRU)
+import ipaddress
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from utils import atomic_write_json
+
+# Segundos que vale un resultado; las herramientas que no aparecen no se guardan
+DEFAULT_TTLS = {
+    'SUBNET': 7 * 86400,
+    'WHOIS': 86400,
+    'NSLOOKUP': 300,
+}
+
+
+@dataclass(slots=True)
+class CachedResult:
+    """Salida, registros estructurados y código de salida de una ejecución"""
+    tool: str
+    output: str
+    records: List[list] = field(default_factory=list)
+    return_code: int = 0
+    created: float = 0.0
+    expires: float = 0.0
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (now if now is not None else time.time()) - self.created
+
+
+def _normalize(value: str) -> str:
+    value = str(value).strip().lower()
+    # example.com. y example.com son el mismo dominio
+    return value[:-1] if value.endswith('.') and len(value) > 1 else value
+
+
+def cache_key(tool: str, command, params: Optional[Dict] = None) -> str:
+    """Clave de un resultado: herramienta y parámetros normalizados"""
+    if params:
+        normalized = {}
+        for name, value in params.items():
+            value = _normalize(value)
+            if name == 'network':
+                try:
+                    value = str(ipaddress.ip_network(value, strict=False))
+                except ValueError:
+                    pass
+            normalized[name] = value
+        parts = sorted(normalized.items())
+    else:
+        parts = [_normalize(arg) for arg in (command[1:] if isinstance(command, list) else [command])]
+    return json.dumps([tool, parts], ensure_ascii=False)
+
+
+class ResultCache:
+    """Resultados recientes en memoria con caducidad por herramienta y límite LRU.
+
+    Con path, las entradas vigentes se leen del disco al primer uso y se
+    guardan con save() (escritura atómica), así que sobreviven a un reinicio.
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, max_entries: int = 256,
+                 path: Optional[str] = None, max_entry_bytes: int = 256 * 1024):
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_entries = max_entries
+        self.path = path
+        self.max_entry_bytes = max_entry_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[str, CachedResult]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._loaded = path is None
+        self._dirty = False
+
+    def cacheable(self, tool: Optional[str]) -> bool:
+        return self.max_entries > 0 and bool(self.ttls.get(tool))
+
+    def _ensure_loaded(self) -> None:
+        # Con el cerrojo tomado
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        entries = data.get('entries') if isinstance(data, dict) else None
+        if not isinstance(entries, list):
+            return
+        now = time.time()
+        for item in entries:
+            try:
+                key, entry = item
+                result = CachedResult(**entry)
+            except (TypeError, ValueError):
+                continue
+            if result.expires > now:
+                self._entries[key] = result
+        self._trim()
+
+    def _trim(self) -> None:
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._dirty = True
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        """Resultado vigente para la clave, o None"""
+        now = time.time()
+        with self._lock:
+            self._ensure_loaded()
+            result = self._entries.get(key)
+            if result is not None and result.expires <= now:
+                del self._entries[key]
+                self._dirty = True
+                result = None
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: str, tool: str, output: str, records: List[list], return_code: int = 0) -> bool:
+        """Guardar un resultado; False si la herramienta no se guarda o la salida es demasiado grande"""
+        ttl = self.ttls.get(tool)
+        if not ttl or self.max_entries <= 0 or len(output) > self.max_entry_bytes:
+            return False
+        now = time.time()
+        with self._lock:
+            self._ensure_loaded()
+            self._entries[key] = CachedResult(tool, output, records, return_code, now, now + ttl)
+            self._entries.move_to_end(key)
+            self._trim()
+            self._dirty = True
+        return True
+
+    def invalidate(self, tool: Optional[str] = None) -> int:
+        """Olvidar los resultados de una herramienta (o todos); devuelve cuántos"""
+        with self._lock:
+            self._ensure_loaded()
+            keys = [key for key, result in self._entries.items() if tool is None or result.tool == tool]
+            for key in keys:
+                del self._entries[key]
+            self._dirty = self._dirty or bool(keys)
+        return len(keys)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._entries)
+
+    def save(self) -> None:
+        """Escribir las entradas vigentes en path (si hay cambios); OSError si falla la escritura"""
+        if not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = [[key, {name: getattr(result, name) for name in CachedResult.__slots__}]
+                       for key, result in self._entries.items() if result.expires > now]
+            self._dirty = False
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            atomic_write_json(self.path, {'version': 1, 'entries': entries})
+        except OSError:
+            # Se reintenta en el próximo save()
+            with self._lock:
+                self._dirty = True
+            raise
@@ -0,0 +1,298 @@
+# results.py - Resultados estructurados y exportación en streaming (JSONL/CSV)
+import csv
+import json
+import os
+import tempfile
+import threading
+from array import array
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+FORMATS = ('jsonl', 'csv')
+CSV_COLUMNS = ('tool', 'target', 'kind', 'started_at', 'duration_ms', 'exit_code', 'status', 'fields')
+
+
+@dataclass(slots=True)
+class PingResult:
+    """Estadísticas de un ping (tiempos en ms)"""
+    host: str
+    packets_sent: int = 0
+    packets_received: int = 0
+    packet_loss: float = 100.0
+    min_time: Optional[float] = None
+    avg_time: Optional[float] = None
+    max_time: Optional[float] = None
+    success: bool = False
+    error: Optional[str] = None
+    jitter: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def format(self) -> str:
+        """Resumen en una línea para mostrar mientras el ping sigue en marcha"""
+        text = (f"Enviados {self.packets_sent} | Recibidos {self.packets_received} | "
+                f"Pérdida {self.packet_loss:.1f}%")
+        if self.avg_time is not None:
+            text += f" | mín/media/máx {self.min_time:.1f}/{self.avg_time:.1f}/{self.max_time:.1f} ms"
+        if self.jitter is not None:
+            text += f" | jitter {self.jitter:.2f} ms"
+        return text
+
+
+@dataclass(slots=True)
+class PingPacket:
+    """Una respuesta (o pérdida) individual de un ping"""
+    seq: Optional[int]
+    address: Optional[str] = None
+    ttl: Optional[int] = None
+    rtt_ms: Optional[float] = None
+    lost: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass(slots=True)
+class ResolveResult:
+    """Direcciones obtenidas al resolver un nombre"""
+    hostname: str
+    ipv4_addresses: Tuple[str, ...] = ()
+    ipv6_addresses: Tuple[str, ...] = ()
+    error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return bool(self.ipv4_addresses or self.ipv6_addresses)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data['success'] = self.success
+        return data
+
+
+@dataclass(slots=True)
+class PortResult:
+    """Estado de un puerto TCP tras intentar conectar"""
+    host: str
+    port: int
+    open: bool
+    rtt_ms: Optional[float] = None
+    errno: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass(slots=True)
+class WhoisResult:
+    """Respuesta en texto de un servidor WHOIS"""
+    domain: str
+    server: str
+    text: str = ''
+    error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class ScanResults:
+    """Resultados de un escaneo guardados en arrays compactos.
+
+    Cada puerto ocupa unos 7 bytes (puerto, estado y RTT) en lugar de un
+    objeto por resultado; PortResult se construye solo al recorrerlos.
+    """
+
+    NO_RTT = -1.0
+
+    def __init__(self, host: str):
+        self.host = host
+        self.ports = array('H')
+        self.errnos = array('h')
+        self.rtts = array('f')
+
+    def append(self, result: PortResult) -> None:
+        self.ports.append(result.port)
+        self.errnos.append(0 if result.open else (result.errno or -1))
+        self.rtts.append(self.NO_RTT if result.rtt_ms is None else result.rtt_ms)
+
+    def __len__(self) -> int:
+        return len(self.ports)
+
+    def __getitem__(self, index: int) -> PortResult:
+        errno = self.errnos[index]
+        rtt = self.rtts[index]
+        return PortResult(self.host, self.ports[index], errno == 0,
+                          None if rtt == self.NO_RTT else round(rtt, 3), max(errno, 0))
+
+    def __iter__(self) -> Iterator[PortResult]:
+        for i in range(len(self.ports)):
+            yield self[i]
+
+    def open_ports(self):
+        return [port for port, errno in zip(self.ports, self.errnos) if errno == 0]
+
+
+@dataclass(slots=True)
+class NetworkDiagnosis:
+    """Resultado de SystemInfo.diagnose_network"""
+    local_ip: str
+    gateway: Optional[str] = None
+    gateway_ping: Optional[PingResult] = None
+    dns_pings: Dict[str, PingResult] = field(default_factory=dict)
+    resolutions: Dict[str, ResolveResult] = field(default_factory=dict)
+    timed_out: List[str] = field(default_factory=list)
+    elapsed: Optional[float] = None
+
+    @property
+    def local_connectivity(self) -> bool:
+        return self.local_ip != '127.0.0.1'
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'local_ip': self.local_ip,
+            'local_connectivity': self.local_connectivity,
+            'gateway': self.gateway,
+            'gateway_ping': self.gateway_ping.to_dict() if self.gateway_ping else None,
+            'dns_pings': {host: ping.to_dict() for host, ping in self.dns_pings.items()},
+            'resolutions': {name: res.to_dict() for name, res in self.resolutions.items()},
+            'timed_out': list(self.timed_out),
+            'elapsed': self.elapsed,
+        }
+
+
+@dataclass(slots=True)
+class ResultRecord:
+    """Un resultado de una herramienta: un puerto, un salto o el resumen del trabajo"""
+    tool: str
+    target: str
+    kind: str
+    started_at: str
+    duration_ms: Optional[float] = None
+    exit_code: Optional[int] = None
+    status: Optional[str] = None
+    fields: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ResultRecord':
+        return cls(
+            data['tool'], data['target'], data['kind'], data['started_at'],
+            data.get('duration_ms'), data.get('exit_code'), data.get('status'), data.get('fields') or {}
+        )
+
+    def to_row(self) -> Dict[str, Any]:
+        """Fila CSV; los campos específicos de la herramienta van como JSON"""
+        row = self.to_dict()
+        row['fields'] = json.dumps(self.fields, ensure_ascii=False, separators=(',', ':'))
+        return row
+
+    @classmethod
+    def from_row(cls, row: Dict[str, str]) -> 'ResultRecord':
+        return cls(
+            row['tool'], row['target'], row['kind'], row['started_at'],
+            float(row['duration_ms']) if row.get('duration_ms') else None,
+            int(row['exit_code']) if row.get('exit_code') else None,
+            row.get('status') or None,
+            json.loads(row['fields']) if row.get('fields') else {}
+        )
+
+
+def format_for(path: str) -> str:
+    """Formato según la extensión del archivo (JSONL por defecto)"""
+    return 'csv' if os.path.splitext(path)[1].lower() == '.csv' else 'jsonl'
+
+
+class ResultWriter:
+    """Escribe registros a disco a medida que se producen.
+
+    Cada registro se serializa y se escribe en el momento, por lo que un
+    escaneo de millones de filas nunca se acumula en memoria. Es seguro
+    llamarlo desde los hilos de los trabajos.
+    """
+
+    def __init__(self, path: str, fmt: Optional[str] = None):
+        self.path = path
+        self.format = fmt or format_for(path)
+        if self.format not in FORMATS:
+            raise ValueError(f"Formato de exportación no soportado: {self.format}")
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = open(path, 'w', encoding='utf-8', newline='', buffering=1 << 16)
+        self._csv = None
+        if self.format == 'csv':
+            self._csv = csv.DictWriter(self._file, fieldnames=CSV_COLUMNS)
+            self._csv.writeheader()
+
+    def write(self, record: ResultRecord) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            if self._csv:
+                self._csv.writerow(record.to_row())
+            else:
+                self._file.write(json.dumps(record.to_dict(), ensure_ascii=False, separators=(',', ':')) + '\n')
+            self.count += 1
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ResultSpool(ResultWriter):
+    """Archivo temporal JSONL con los resultados de una ejecución, listo para exportar"""
+
+    def __init__(self):
+        fd, path = tempfile.mkstemp(prefix='networktools_', suffix='.jsonl')
+        os.close(fd)
+        super().__init__(path, 'jsonl')
+
+    def export(self, path: str, fmt: Optional[str] = None) -> int:
+        self.flush()
+        return convert_results(self.path, path, fmt)
+
+    def discard(self) -> None:
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def read_results(path: str, fmt: Optional[str] = None) -> Iterator[ResultRecord]:
+    """Recorrer los registros de un archivo exportado sin cargarlo entero"""
+    fmt = fmt or format_for(path)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            for row in csv.DictReader(f):
+                yield ResultRecord.from_row(row)
+        else:
+            loads = json.loads
+            for line in f:
+                if line.strip():
+                    yield ResultRecord.from_dict(loads(line))
+
+
+def convert_results(source: str, destination: str, fmt: Optional[str] = None) -> int:
+    """Copiar registros de un archivo a otro (JSONL o CSV) en streaming"""
+    with ResultWriter(destination, fmt) as writer:
+        for record in read_results(source):
+            writer.write(record)
+        return writer.count
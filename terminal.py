@@ -0,0 +1,272 @@
+# terminal.py - Terminal acotada con volcado a disco y visor paginado
+import mmap
+import os
+import tempfile
+import tkinter as tk
+from array import array
+from tkinter import scrolledtext
+
+from instrumentation import span
+
+
+# Colores de las etiquetas que produce utils.StreamingFormatter
+TAG_COLORS = {
+    'ok': '#28a745',
+    'warn': '#ffc107',
+    'error': '#dc3545',
+    'info': '#17a2b8',
+    'muted': '#999999',
+}
+TERMINAL_STATUS_BG = '#2d2d2d'
+
+
+class TerminalView:
+    """Área de salida que conserva solo las últimas N líneas en el widget.
+
+    Toda la salida se vuelca además a un archivo temporal, de modo que la
+    memoria de Tk se mantiene estable y el historial completo sigue
+    disponible a través de SpillViewer.
+    """
+
+    def __init__(self, parent, max_lines=5000, formatter=None, spill_path=None, **text_options):
+        self.max_lines = max_lines
+        self.formatter = formatter
+        self.text = scrolledtext.ScrolledText(parent, state=tk.DISABLED, **text_options)
+        for tag, color in TAG_COLORS.items():
+            self.text.tag_configure(tag, foreground=color)
+        # Con spill_path la salida se conserva al cerrar (p. ej. para el historial)
+        self.keep_spill = spill_path is not None
+        if self.keep_spill:
+            self._spill = open(spill_path, 'w', encoding='utf-8', newline='')
+        else:
+            self._spill = tempfile.NamedTemporaryFile(
+                'w', encoding='utf-8', newline='', prefix='networktools_', suffix='.log', delete=False)
+        self._live_text = None
+        self._status_label = None
+        self.trimmed_lines = 0
+
+    @property
+    def spill_path(self):
+        return self._spill.name
+
+    def pack(self, **options):
+        self.text.pack(**options)
+
+    def append(self, text, formatter=None, prefix=''):
+        """Añadir texto; con un formateador se inserta en segmentos etiquetados en una sola llamada"""
+        self._flush_live()
+        formatter = formatter or self.formatter
+        with span('format'):
+            if formatter:
+                segments = formatter.segments(text, prefix)
+                text = ''.join(chunk for chunk, _ in segments)
+                args = [item for segment in segments for item in segment]
+            else:
+                if prefix:
+                    text = ''.join(prefix + line for line in text.splitlines(True))
+                args = [text]
+        self._spill.write(text)
+        with span('render'):
+            self.text.config(state=tk.NORMAL)
+            self.text.insert(tk.END, *args)
+            self._trim()
+            self.text.see(tk.END)
+            self.text.config(state=tk.DISABLED)
+
+    def set_status(self, text):
+        """Mostrar una línea de estado fija encima de la salida (p. ej. estadísticas en vivo)"""
+        if self._status_label is None:
+            self._status_label = tk.Label(
+                self.text.frame.master, anchor='w', font=("Courier New", 10, "bold"),
+                bg=TERMINAL_STATUS_BG, fg=TAG_COLORS['info'])
+            self._status_label.pack(fill=tk.X, before=self.text.frame)
+        self._status_label.config(text=text)
+
+    def replace_tail(self, text):
+        """Reemplazar la tabla en vivo al final de la terminal"""
+        self.text.config(state=tk.NORMAL)
+        if 'live_table' not in self.text.mark_names():
+            self.text.mark_set('live_table', 'end-1c')
+            self.text.mark_gravity('live_table', tk.LEFT)
+        self.text.delete('live_table', tk.END)
+        self.text.insert(tk.END, text)
+        self.text.see(tk.END)
+        self.text.config(state=tk.DISABLED)
+        # En disco solo se guarda la última versión de la tabla
+        self._live_text = text
+
+    def _flush_live(self):
+        if self._live_text is not None:
+            self._spill.write(self._live_text)
+            self._live_text = None
+            self.text.mark_unset('live_table')
+
+    def _trim(self):
+        lines = int(self.text.index('end-1c').split('.')[0])
+        # Margen del 10% para no recortar en cada inserción
+        if lines > self.max_lines + self.max_lines // 10:
+            excess = lines - self.max_lines
+            self.text.delete('1.0', f'{excess + 1}.0')
+            self.trimmed_lines += excess
+
+    def clear(self):
+        """Vaciar el widget; el volcado temporal se vacía también, el persistente se conserva"""
+        if self.keep_spill:
+            # El historial apunta a este archivo: la salida completa no se pierde al limpiar
+            self._flush_live()
+        self.text.config(state=tk.NORMAL)
+        self.text.delete(1.0, tk.END)
+        self.text.mark_unset('live_table')
+        self.text.config(state=tk.DISABLED)
+        self._live_text = None
+        if not self.keep_spill:
+            self._spill.seek(0)
+            self._spill.truncate()
+        self.trimmed_lines = 0
+
+    def flush(self):
+        """Asegurar que el archivo de volcado refleja toda la salida"""
+        self._flush_live()
+        self._spill.flush()
+
+    def open_viewer(self, title="Salida completa"):
+        self.flush()
+        return SpillViewer(self.text.winfo_toplevel(), self.spill_path, title=title, source=self)
+
+    def close(self):
+        """Cerrar el archivo de volcado y eliminarlo si es temporal"""
+        try:
+            self._flush_live()
+            self._spill.close()
+            if not self.keep_spill:
+                os.remove(self._spill.name)
+        except OSError:
+            pass
+
+
+class SpillViewer:
+    """Visor paginado de un archivo de volcado leído con mmap bajo demanda"""
+
+    PAGE_LINES = 500
+
+    def __init__(self, master, path, title="Salida completa", source=None, colors=None):
+        self.path = path
+        self.source = source
+        self.offsets = array('Q', [0])
+        self._indexed_bytes = 0
+        self._map = None
+        self._file = None
+        self.first_line = 0
+
+        colors = colors or {'bg': '#0c0c0c', 'fg': '#d3d3d3', 'toolbar': '#2d2d2d'}
+        self.window = tk.Toplevel(master)
+        self.window.title(title)
+        self.window.geometry("900x600")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        toolbar = tk.Frame(self.window, bg=colors['toolbar'])
+        toolbar.pack(fill=tk.X)
+        for label, command in (("⏮", self.first_page), ("◀", self.previous_page),
+                               ("▶", self.next_page), ("⏭", self.last_page),
+                               ("🔄 Actualizar", self.refresh)):
+            tk.Button(toolbar, text=label, command=command).pack(side=tk.LEFT, padx=2, pady=2)
+        self.position_label = tk.Label(toolbar, bg=colors['toolbar'], fg='white')
+        self.position_label.pack(side=tk.RIGHT, padx=10)
+
+        body = tk.Frame(self.window)
+        body.pack(fill=tk.BOTH, expand=True)
+        self.scrollbar = tk.Scrollbar(body, orient=tk.VERTICAL, command=self._on_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.text = tk.Text(body, wrap=tk.NONE, bg=colors['bg'], fg=colors['fg'], font=("Courier New", 10))
+        self.text.pack(fill=tk.BOTH, expand=True)
+        self.text.bind('<Prior>', lambda e: self.previous_page())
+        self.text.bind('<Next>', lambda e: self.next_page())
+
+        self.refresh()
+        self.last_page()
+
+    @property
+    def line_count(self):
+        # El último desplazamiento marca el inicio de una línea aún sin terminar
+        return len(self.offsets) - 1 + (1 if self._map and self._indexed_bytes < len(self._map) else 0)
+
+    def refresh(self):
+        """Volver a mapear el archivo e indexar solo lo añadido desde la última vez"""
+        if self.source:
+            self.source.flush()
+        if self._map:
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+        if os.path.getsize(self.path) == 0:
+            self.offsets = array('Q', [0])
+            self._indexed_bytes = 0
+            self._render()
+            return
+        self._file = open(self.path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < self._indexed_bytes:
+            self.offsets = array('Q', [0])
+            self._indexed_bytes = 0
+        position = self._indexed_bytes
+        while True:
+            newline = self._map.find(b'\n', position)
+            if newline < 0:
+                break
+            position = newline + 1
+            self.offsets.append(position)
+        self._indexed_bytes = position
+        self._render()
+
+    def _line_offset(self, line):
+        if line < len(self.offsets):
+            return self.offsets[line]
+        return len(self._map) if self._map else 0
+
+    def _render(self):
+        total = self.line_count
+        self.first_line = max(0, min(self.first_line, total - self.PAGE_LINES))
+        last_line = min(self.first_line + self.PAGE_LINES, total)
+        if self._map:
+            chunk = self._map[self._line_offset(self.first_line):self._line_offset(last_line)]
+        else:
+            chunk = b''
+        self.text.config(state=tk.NORMAL)
+        self.text.delete('1.0', tk.END)
+        self.text.insert('1.0', chunk.decode('utf-8', errors='replace'))
+        self.text.config(state=tk.DISABLED)
+        self.position_label.config(text=f"Líneas {self.first_line + 1}-{last_line} de {total}")
+        if total:
+            self.scrollbar.set(self.first_line / total, last_line / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _on_scroll(self, action, amount, unit=None):
+        if action == tk.MOVETO:
+            self.first_line = int(float(amount) * self.line_count)
+        elif action == tk.SCROLL:
+            step = self.PAGE_LINES if unit == 'pages' else 20
+            self.first_line += int(amount) * step
+        self._render()
+
+    def first_page(self):
+        self.first_line = 0
+        self._render()
+
+    def previous_page(self):
+        self.first_line -= self.PAGE_LINES
+        self._render()
+
+    def next_page(self):
+        self.first_line += self.PAGE_LINES
+        self._render()
+
+    def last_page(self):
+        self.first_line = self.line_count
+        self._render()
+
+    def close(self):
+        if self._map:
+            self._map.close()
+            self._file.close()
+        self.window.destroy()
@@ -0,0 +1,203 @@
+# timeseries.py - Almacén local de series temporales para las sondas (SQLite)
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+# Los valores son tiempos en ms; se guardan como enteros en microsegundos,
+# que SQLite codifica en 3-4 bytes en lugar de los 8 de un REAL.
+# Un valor NULL es una sonda sin respuesta (paquete perdido, puerto cerrado...).
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    id INTEGER PRIMARY KEY,
+    probe TEXT NOT NULL,
+    target TEXT NOT NULL,
+    UNIQUE (probe, target)
+);
+CREATE TABLE IF NOT EXISTS raw (
+    series_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    value INTEGER,
+    PRIMARY KEY (series_id, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_1m (
+    series_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    ok INTEGER NOT NULL,
+    total INTEGER,
+    min INTEGER,
+    max INTEGER,
+    PRIMARY KEY (series_id, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_1h (
+    series_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    ok INTEGER NOT NULL,
+    total INTEGER,
+    min INTEGER,
+    max INTEGER,
+    PRIMARY KEY (series_id, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Resolución en segundos -> tabla
+RESOLUTIONS = {1: 'raw', 60: 'rollup_1m', 3600: 'rollup_1h'}
+
+DEFAULT_RETENTION = {
+    'raw': 6 * 3600,
+    'rollup_1m': 14 * 86400,
+    'rollup_1h': 400 * 86400,
+}
+
+# Margen para las sondas que terminan tarde antes de dar un minuto por cerrado
+ROLLUP_DELAY = 30
+
+
+@dataclass(slots=True)
+class SeriesPoint:
+    """Un punto de una serie: una muestra o el resumen de un intervalo"""
+    ts: int
+    samples: int
+    ok: int
+    avg_ms: Optional[float] = None
+    min_ms: Optional[float] = None
+    max_ms: Optional[float] = None
+
+    @property
+    def loss(self) -> float:
+        return 100.0 * (self.samples - self.ok) / self.samples if self.samples else 0.0
+
+
+def _to_us(value_ms: Optional[float]) -> Optional[int]:
+    return None if value_ms is None else int(round(value_ms * 1000))
+
+
+def _to_ms(value_us) -> Optional[float]:
+    return None if value_us is None else value_us / 1000
+
+
+class TimeSeriesStore:
+    """Series temporales de las sondas con resúmenes por minuto y por hora.
+
+    Las muestras se acumulan en memoria y se escriben por lotes en una sola
+    transacción (flush). rollup() resume los minutos y horas ya cerrados
+    y aplica la retención de cada tabla, así que el tamaño en disco depende
+    del número de series y no del tiempo que lleve funcionando.
+    """
+
+    def __init__(self, path: str, retention: Optional[Dict[str, int]] = None):
+        self.path = path
+        self.retention = dict(DEFAULT_RETENTION, **(retention or {}))
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[int, int, Optional[int]]] = []
+        self._series: Dict[Tuple[str, str], int] = {}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        for series_id, probe, target in self._db.execute("SELECT id, probe, target FROM series"):
+            self._series[(probe, target)] = series_id
+
+    def series_id(self, probe: str, target: str) -> int:
+        key = (probe, target)
+        series_id = self._series.get(key)
+        if series_id is None:
+            with self._lock, self._db:
+                self._db.execute("INSERT OR IGNORE INTO series (probe, target) VALUES (?, ?)", key)
+                series_id = self._db.execute(
+                    "SELECT id FROM series WHERE probe = ? AND target = ?", key).fetchone()[0]
+            self._series[key] = series_id
+        return series_id
+
+    def series(self) -> List[Tuple[str, str]]:
+        return sorted(self._series)
+
+    def append(self, probe: str, target: str, value_ms: Optional[float], ts: Optional[float] = None) -> None:
+        """Añadir una muestra (value_ms=None si la sonda no obtuvo respuesta)"""
+        sample = (self.series_id(probe, target), int(ts if ts is not None else time.time()), _to_us(value_ms))
+        with self._lock:
+            self._pending.append(sample)
+
+    def flush(self) -> int:
+        """Escribir las muestras pendientes en una sola transacción"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if pending:
+                with self._db:
+                    # Dos muestras en el mismo segundo: se conserva la última
+                    self._db.executemany("INSERT OR REPLACE INTO raw VALUES (?, ?, ?)", pending)
+        return len(pending)
+
+    def rollup(self, now: Optional[float] = None) -> None:
+        """Resumir los minutos y horas cerrados y borrar lo que exceda la retención"""
+        now = int(now if now is not None else time.time())
+        self.flush()
+        with self._lock, self._db:
+            series_ids = list(self._series.values())
+            self._aggregate('raw', 'rollup_1m', 60, now, series_ids)
+            self._aggregate('rollup_1m', 'rollup_1h', 3600, now, series_ids)
+            # Por serie, para que el borrado recorra solo un rango de la clave primaria
+            for table, seconds in self.retention.items():
+                self._db.executemany(f"DELETE FROM {table} WHERE series_id = ? AND ts < ?",
+                                     [(series_id, now - seconds) for series_id in series_ids])
+
+    def _aggregate(self, source: str, target: str, step: int, now: int, series_ids: List[int]) -> None:
+        done = self._db.execute("SELECT value FROM meta WHERE key = ?", (target,)).fetchone()
+        start = done[0] if done else 0
+        end = (now - ROLLUP_DELAY) // step * step
+        if end <= start:
+            return
+        if source == 'raw':
+            columns = "count(*), count(value), sum(value), min(value), max(value)"
+        else:
+            columns = "sum(samples), sum(ok), sum(total), min(min), max(max)"
+        self._db.executemany(
+            f"INSERT OR REPLACE INTO {target} "
+            f"SELECT series_id, ts / {step} * {step}, {columns} FROM {source} "
+            f"WHERE series_id = ? AND ts >= ? AND ts < ? GROUP BY ts / {step}",
+            [(series_id, start, end) for series_id in series_ids])
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (target, end))
+
+    def query(self, probe: str, target: str, since: float, until: Optional[float] = None,
+              resolution: Optional[int] = None, max_points: int = 1000) -> List[SeriesPoint]:
+        """Puntos de una serie; sin resolución se elige la más fina que no pase de max_points"""
+        until = until if until is not None else time.time()
+        if resolution is None:
+            resolution = next((step for step in sorted(RESOLUTIONS)
+                               if (until - since) / step <= max_points), 3600)
+        table = RESOLUTIONS[resolution]
+        series_id = self._series.get((probe, target))
+        if series_id is None:
+            return []
+        self.flush()
+        with self._lock:
+            if table == 'raw':
+                rows = self._db.execute(
+                    "SELECT ts, 1, value IS NOT NULL, value, value, value FROM raw "
+                    "WHERE series_id = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                    (series_id, int(since), int(until))).fetchall()
+            else:
+                rows = self._db.execute(
+                    f"SELECT ts, samples, ok, total, min, max FROM {table} "
+                    "WHERE series_id = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                    (series_id, int(since), int(until))).fetchall()
+        return [SeriesPoint(ts, samples, ok, _to_ms(total / ok) if ok else None, _to_ms(low), _to_ms(high))
+                for ts, samples, ok, total, low, high in rows]
+
+    def row_counts(self) -> Dict[str, int]:
+        with self._lock:
+            return {table: self._db.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+                    for table in RESOLUTIONS.values()}
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._db.close()
+
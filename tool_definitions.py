@@ -28,6 +28,30 @@ TOOLS = {
         ],
         "command": ["tracert"] if OS_TYPE == "windows" else ["traceroute"]
     },
+    "FASTTRACE": {
+        "description": (
+            "Utilidad: Traceroute interno que envía las sondas de todos los TTL a la vez, por lo que la ruta completa tarda aproximadamente un RTT máximo.\n"
+            "Funcionamiento: Introduce la IP o el dominio del destino. Los saltos se muestran a medida que responden."
+        ),
+        "parameters": [
+            {"name": "Host/IP", "type": "entry", "required": True, "arg": "host"},
+            {"name": "Saltos máximos", "type": "entry", "required": False, "arg": "max_hops", "default": "30"}
+        ],
+        "command": "internal_traceroute",
+        "internal": True
+    },
+    "MTR": {
+        "description": (
+            "Utilidad: Ejecuta rondas de traceroute continuas y muestra por cada salto la pérdida de paquetes y la distribución de latencias (último, media, mejor, peor, P95, desviación). Sustituye a PATHPING en todos los sistemas.\n"
+            "Funcionamiento: Introduce la IP o el dominio del destino y el número de rondas (0 = continuo hasta cancelar)."
+        ),
+        "parameters": [
+            {"name": "Host/IP", "type": "entry", "required": True, "arg": "host"},
+            {"name": "Rondas (0 = continuo)", "type": "entry", "required": False, "arg": "rounds", "default": "10"}
+        ],
+        "command": "internal_hop_stats",
+        "internal": True
+    },
     "PATHPING": {
         "description": (
             "Utilidad: Combina la funcionalidad de PING y TRACERT. Proporciona información sobre la latencia de red y la pérdida de paquetes en cada salto intermedio.\n"
@@ -125,6 +149,21 @@ TOOLS = {
         "command": "internal_wol",
         "internal": True
     },
+    "BULKWOL": {
+        "description": (
+            "Utilidad: Despierta muchos equipos a la vez (p. ej. un aula tras un mantenimiento) enviando el paquete mágico al broadcast de la red de cada equipo desde un único socket.\n"
+            "Funcionamiento: Introduce MACs separadas por comas o la ruta de un archivo de inventario con una línea por equipo (MAC, IP y nombre opcionales). "
+            "Con una verificación mayor que 0 se hace ping a los equipos con IP durante esos segundos y se indica cuáles arrancaron."
+        ),
+        "parameters": [
+            {"name": "MACs o archivo de inventario", "type": "entry", "required": True, "arg": "targets"},
+            {"name": "Repeticiones", "type": "entry", "required": False, "arg": "repeats", "default": "3"},
+            {"name": "Pausa entre paquetes (ms)", "type": "entry", "required": False, "arg": "pace_ms", "default": "2"},
+            {"name": "Verificar durante (s, 0 = no)", "type": "entry", "required": False, "arg": "verify", "default": "0"}
+        ],
+        "command": "internal_bulk_wol",
+        "internal": True
+    },
     "WHOIS": {
         "description": "Consulta información de un dominio.",
         "parameters": [
@@ -141,3 +180,46 @@ if OS_TYPE != "windows":
     if "NETSH" in TOOLS: del TOOLS["NETSH"]
     if "TRACERT" in TOOLS:
         pass
+
+
+def tool_executable(tool_key):
+    """Ejecutable externo que necesita una herramienta (None si es interna)"""
+    tool = TOOLS[tool_key]
+    if tool.get("internal"):
+        return None
+    return tool["command"][0]
+
+
+def tool_executables():
+    """Ejecutables externos de todas las herramientas disponibles"""
+    return [cmd for cmd in (tool_executable(key) for key in TOOLS) if cmd]
+
+
+def build_invocation(tool_key, values):
+    """Construir (comando, interno, parámetros) a partir de los valores por nombre de parámetro.
+
+    Los parámetros ausentes toman su valor por defecto; lanza ValueError si
+    falta uno obligatorio.
+    """
+    tool_info = TOOLS[tool_key]
+    resolved = {}
+    for param_def in tool_info["parameters"]:
+        value = values.get(param_def['name'])
+        if value is None:
+            value = param_def.get('default', '')
+        value = str(value).strip()
+        if param_def["required"] and not value:
+            raise ValueError(f"El parámetro '{param_def['name']}' es obligatorio.")
+        resolved[param_def['name']] = value
+
+    if tool_info.get("internal"):
+        params = {param_def['arg']: resolved[param_def['name']] for param_def in tool_info["parameters"]}
+        return tool_info["command"], True, params
+
+    command_list = list(tool_info["command"])
+    for param_def in tool_info["parameters"]:
+        value = resolved[param_def['name']]
+        if value:
+            if param_def["arg"]: command_list.extend([param_def["arg"], value])
+            else: command_list.extend(value.split())
+    return command_list, False, {}
@@ -0,0 +1,393 @@
+# traceroute.py - Motor de traceroute en proceso con todos los TTL en paralelo
+import math
+import platform
+import select
+import socket
+import struct
+import time
+from array import array
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from instrumentation import span
+
+BASE_PORT = 33434
+
+# Constantes de Linux que el módulo socket no siempre expone
+IP_RECVERR = getattr(socket, 'IP_RECVERR', 11)
+IPV6_RECVERR = getattr(socket, 'IPV6_RECVERR', 25)
+MSG_ERRQUEUE = getattr(socket, 'MSG_ERRQUEUE', 0x2000)
+SO_EE_ORIGIN_ICMP = 2
+SO_EE_ORIGIN_ICMP6 = 3
+
+ICMP_DEST_UNREACH = 3
+ICMP_TIME_EXCEEDED = 11
+ICMP_PORT_UNREACH = 3
+ICMP6_DEST_UNREACH = 1
+ICMP6_TIME_EXCEEDED = 3
+ICMP6_PORT_UNREACH = 4
+
+# struct sock_extended_err: errno, origin, type, code, pad, info, data
+_EXTENDED_ERR = struct.Struct('=IBBBBII')
+
+UNREACH_NOTES = {
+    0: '!N', 1: '!H', 2: '!P', 9: '!X', 10: '!X', 13: '!X'
+}
+
+
+@dataclass(slots=True)
+class TraceHop:
+    """Un salto de la ruta con los tiempos de sus sondas"""
+    ttl: int
+    address: Optional[str] = None
+    rtts: List[float] = field(default_factory=list)
+    reached: bool = False
+    note: str = ''
+
+    def format(self) -> str:
+        """Formatear el salto como una línea de traceroute"""
+        if not self.address:
+            return f"{self.ttl:>3}  *"
+        times = '  '.join(f"{rtt:.1f} ms" for rtt in self.rtts)
+        note = f" {self.note}" if self.note else ''
+        return f"{self.ttl:>3}  {self.address:<39} {times}{note}"
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class ParallelTraceroute:
+    """Traceroute que envía las sondas de todos los TTL a la vez.
+
+    En Linux usa sockets UDP sin privilegios con IP_RECVERR y lee los
+    ICMP time-exceeded de la cola de errores. En otros sistemas recurre a
+    un socket ICMP raw (requiere administrador).
+    """
+
+    def __init__(self, host: str, max_hops: int = 30, timeout: float = 3.0,
+                 queries: int = 1, base_port: int = BASE_PORT):
+        self.host = host
+        self.max_hops = max_hops
+        self.timeout = timeout
+        self.queries = queries
+        self.base_port = base_port
+        self.family = None
+        self.destination = None
+
+    def run(self, on_hop: Optional[Callable[[TraceHop], None]] = None,
+            should_stop: Optional[Callable[[], bool]] = None, token=None) -> List[TraceHop]:
+        """Ejecutar el traceroute y devolver los saltos ordenados por TTL.
+
+        Con un CancelToken la espera de respuestas termina en cuanto se cancela.
+        """
+        waiters = []
+        if token is not None:
+            waiters.append(token)
+            should_stop = should_stop or (lambda: token.cancelled)
+        # La resolución se hace una sola vez aunque se repitan las rondas
+        if self.destination is None:
+            self.family, self.destination = self._resolve()
+        family = self.family
+        hops = {ttl: TraceHop(ttl) for ttl in range(1, self.max_hops + 1)}
+        emitted = set()
+
+        def emit(ttl):
+            if ttl in emitted:
+                return
+            emitted.add(ttl)
+            if on_hop:
+                on_hop(hops[ttl])
+
+        if platform.system() == 'Linux':
+            last_ttl = self._run_recverr(family, hops, emit, should_stop, waiters)
+        else:
+            last_ttl = self._run_raw(family, hops, emit, should_stop, waiters)
+
+        # El destino y los saltos que no respondieron se informan al final
+        for ttl in range(1, last_ttl + 1):
+            emit(ttl)
+        return [hops[ttl] for ttl in range(1, last_ttl + 1)]
+
+    def _resolve(self) -> Tuple[int, str]:
+        with span('resolve'):
+            info = socket.getaddrinfo(self.host, None, socket.AF_UNSPEC, socket.SOCK_DGRAM)
+        family, _, _, _, sockaddr = info[0]
+        return family, sockaddr[0]
+
+    def _open_probe(self, family: int, ttl: int, recverr: bool) -> socket.socket:
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        if family == socket.AF_INET6:
+            sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_UNICAST_HOPS, ttl)
+            if recverr:
+                sock.setsockopt(socket.IPPROTO_IPV6, IPV6_RECVERR, 1)
+        else:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+            if recverr:
+                sock.setsockopt(socket.IPPROTO_IP, IP_RECVERR, 1)
+        return sock
+
+    def _send_probes(self, family: int, recverr: bool) -> Dict[socket.socket, Tuple[int, float]]:
+        """Enviar una sonda por TTL y consulta; devuelve socket -> (ttl, enviado)"""
+        probes = {}
+        try:
+            for query in range(self.queries):
+                for ttl in range(1, self.max_hops + 1):
+                    sock = self._open_probe(family, ttl, recverr)
+                    port = self.base_port + (query * self.max_hops) + ttl
+                    sock.connect((self.destination, port))
+                    sock.send(b'\x00' * 32)
+                    probes[sock] = (ttl, time.perf_counter())
+        except Exception:
+            for sock in probes:
+                sock.close()
+            raise
+        return probes
+
+    def _record(self, hops: Dict[int, TraceHop], ttl: int, address: str, sent_at: float,
+                reached: bool, note: str = '') -> None:
+        hop = hops[ttl]
+        hop.address = hop.address or address
+        hop.rtts.append((time.perf_counter() - sent_at) * 1000)
+        hop.reached = hop.reached or reached
+        hop.note = hop.note or note
+
+    def _run_recverr(self, family, hops, emit, should_stop, waiters=()) -> int:
+        probes = self._send_probes(family, recverr=True)
+        answered = {ttl: 0 for ttl in hops}
+        last_ttl = self.max_hops
+        deadline = time.monotonic() + self.timeout
+        try:
+            while probes:
+                if should_stop and should_stop():
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                readable, _, _ = select.select(list(probes) + list(waiters), [], [], min(remaining, 0.1))
+                for sock in readable:
+                    if sock not in probes:
+                        continue
+                    ttl, sent_at = probes.pop(sock)
+                    self._read_error_queue(family, sock, hops, ttl, sent_at)
+                    sock.close()
+                    answered[ttl] += 1
+                    if hops[ttl].reached and ttl < last_ttl:
+                        last_ttl = ttl
+                    if answered[ttl] == self.queries and not hops[ttl].reached:
+                        emit(ttl)
+                # Las sondas más allá del destino ya no aportan nada
+                for sock, (ttl, _) in list(probes.items()):
+                    if ttl > last_ttl:
+                        probes.pop(sock)
+                        sock.close()
+        finally:
+            for sock in probes:
+                sock.close()
+        return last_ttl
+
+    def _read_error_queue(self, family, sock, hops, ttl, sent_at) -> None:
+        try:
+            _, ancdata, _, _ = sock.recvmsg(512, 512, MSG_ERRQUEUE)
+        except BlockingIOError:
+            # Sin error ICMP: el destino respondió directamente por UDP
+            try:
+                sock.recv(512)
+                self._record(hops, ttl, self.destination, sent_at, reached=True)
+            except OSError:
+                pass
+            return
+
+        for level, msg_type, data in ancdata:
+            if msg_type not in (IP_RECVERR, IPV6_RECVERR) or len(data) < _EXTENDED_ERR.size:
+                continue
+            _, origin, icmp_type, code, _, _, _ = _EXTENDED_ERR.unpack_from(data)
+            if origin not in (SO_EE_ORIGIN_ICMP, SO_EE_ORIGIN_ICMP6):
+                continue
+            address = self._offender_address(data[_EXTENDED_ERR.size:])
+            if origin == SO_EE_ORIGIN_ICMP6:
+                time_exceeded = icmp_type == ICMP6_TIME_EXCEEDED
+                port_unreach = icmp_type == ICMP6_DEST_UNREACH and code == ICMP6_PORT_UNREACH
+            else:
+                time_exceeded = icmp_type == ICMP_TIME_EXCEEDED
+                port_unreach = icmp_type == ICMP_DEST_UNREACH and code == ICMP_PORT_UNREACH
+            if time_exceeded:
+                self._record(hops, ttl, address, sent_at, reached=False)
+            elif port_unreach:
+                self._record(hops, ttl, address, sent_at, reached=True)
+            else:
+                self._record(hops, ttl, address, sent_at, reached=True,
+                             note=UNREACH_NOTES.get(code, f'!<{code}>'))
+            return
+
+    @staticmethod
+    def _offender_address(raw: bytes) -> Optional[str]:
+        if len(raw) < 2:
+            return None
+        family = struct.unpack_from('=H', raw)[0]
+        if family == socket.AF_INET and len(raw) >= 8:
+            return socket.inet_ntop(socket.AF_INET, raw[4:8])
+        if family == socket.AF_INET6 and len(raw) >= 24:
+            return socket.inet_ntop(socket.AF_INET6, raw[8:24])
+        return None
+
+    def _run_raw(self, family, hops, emit, should_stop, waiters=()) -> int:
+        if family != socket.AF_INET:
+            raise OSError("El modo raw solo admite IPv4 en este sistema")
+        listener = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+        listener.setblocking(False)
+        if platform.system() == 'Windows':
+            listener.bind((socket.gethostbyname(socket.gethostname()), 0))
+
+        probes = self._send_probes(family, recverr=False)
+        by_port = {sock.getsockname()[1]: (sock, ttl, sent_at) for sock, (ttl, sent_at) in probes.items()}
+        answered = {ttl: 0 for ttl in hops}
+        last_ttl = self.max_hops
+        deadline = time.monotonic() + self.timeout
+        try:
+            while by_port:
+                if should_stop and should_stop():
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                readable, _, _ = select.select([listener] + list(waiters), [], [], min(remaining, 0.1))
+                if listener not in readable:
+                    continue
+                try:
+                    packet, (address, _) = listener.recvfrom(1024)
+                except BlockingIOError:
+                    continue
+                parsed = self._parse_icmp(packet)
+                if not parsed or parsed[2] not in by_port:
+                    continue
+                icmp_type, code, source_port = parsed
+                sock, ttl, sent_at = by_port.pop(source_port)
+                sock.close()
+                if icmp_type == ICMP_TIME_EXCEEDED:
+                    self._record(hops, ttl, address, sent_at, reached=False)
+                elif code == ICMP_PORT_UNREACH:
+                    self._record(hops, ttl, address, sent_at, reached=True)
+                else:
+                    self._record(hops, ttl, address, sent_at, reached=True,
+                                 note=UNREACH_NOTES.get(code, f'!<{code}>'))
+                answered[ttl] += 1
+                if hops[ttl].reached and ttl < last_ttl:
+                    last_ttl = ttl
+                if answered[ttl] == self.queries and not hops[ttl].reached:
+                    emit(ttl)
+        finally:
+            listener.close()
+            for sock, _, _ in by_port.values():
+                sock.close()
+        return last_ttl
+
+    def _parse_icmp(self, packet: bytes) -> Optional[Tuple[int, int, int]]:
+        """Extraer (tipo, código, puerto origen) de un ICMP que cita una sonda UDP"""
+        ihl = (packet[0] & 0x0F) * 4
+        if len(packet) < ihl + 8:
+            return None
+        icmp_type, code = packet[ihl], packet[ihl + 1]
+        if icmp_type not in (ICMP_TIME_EXCEEDED, ICMP_DEST_UNREACH):
+            return None
+        inner = packet[ihl + 8:]
+        if len(inner) < 20 or inner[9] != socket.IPPROTO_UDP:
+            return None
+        if socket.inet_ntoa(inner[16:20]) != self.destination:
+            return None
+        inner_ihl = (inner[0] & 0x0F) * 4
+        if len(inner) < inner_ihl + 4:
+            return None
+        source_port = struct.unpack_from('!H', inner, inner_ihl)[0]
+        return icmp_type, code, source_port
+
+
+class HopStatistics:
+    """Estadísticas acumuladas por salto (estilo MTR/PathPing) en arrays compactos"""
+
+    # Límites superiores (ms) de los intervalos del histograma de RTT
+    BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, math.inf)
+
+    def __init__(self, max_hops: int = 30):
+        self.max_hops = max_hops
+        self.rounds = 0
+        self.hop_count = 0
+        self.addresses: List[Optional[str]] = [None] * max_hops
+        self.sent = array('I', [0]) * max_hops
+        self.received = array('I', [0]) * max_hops
+        self.last = array('d', [0.0]) * max_hops
+        self.best = array('d', [math.inf]) * max_hops
+        self.worst = array('d', [0.0]) * max_hops
+        self.total = array('d', [0.0]) * max_hops
+        self.total_sq = array('d', [0.0]) * max_hops
+        self.histogram = array('I', [0]) * (max_hops * len(self.BUCKETS))
+
+    def add_round(self, hops: List[TraceHop], queries: int = 1) -> None:
+        """Acumular el resultado de una ronda de traceroute"""
+        self.rounds += 1
+        buckets = len(self.BUCKETS)
+        for hop in hops:
+            i = hop.ttl - 1
+            self.sent[i] += queries
+            if not hop.address:
+                continue
+            self.addresses[i] = hop.address
+            self.hop_count = max(self.hop_count, hop.ttl)
+            for rtt in hop.rtts:
+                self.received[i] += 1
+                self.last[i] = rtt
+                self.best[i] = min(self.best[i], rtt)
+                self.worst[i] = max(self.worst[i], rtt)
+                self.total[i] += rtt
+                self.total_sq[i] += rtt * rtt
+                bucket = next(b for b, limit in enumerate(self.BUCKETS) if rtt <= limit)
+                self.histogram[i * buckets + bucket] += 1
+
+    def loss(self, i: int) -> float:
+        if not self.sent[i]:
+            return 0.0
+        return 100.0 * (self.sent[i] - self.received[i]) / self.sent[i]
+
+    def mean(self, i: int) -> float:
+        return self.total[i] / self.received[i] if self.received[i] else 0.0
+
+    def stdev(self, i: int) -> float:
+        n = self.received[i]
+        if n < 2:
+            return 0.0
+        variance = (self.total_sq[i] - self.total[i] * self.total[i] / n) / (n - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def percentile(self, i: int, q: float) -> float:
+        """Percentil aproximado a partir del histograma (límite superior del intervalo)"""
+        n = self.received[i]
+        if not n:
+            return 0.0
+        buckets = len(self.BUCKETS)
+        target = q / 100.0 * n
+        seen = 0
+        for b in range(buckets):
+            seen += self.histogram[i * buckets + b]
+            if seen >= target:
+                return min(self.BUCKETS[b], self.worst[i])
+        return self.worst[i]
+
+    def format_table(self) -> str:
+        """Renderizar la tabla de estadísticas por salto"""
+        lines = [
+            f"{'Salto':>5}  {'Dirección':<39} {'Pérd%':>6} {'Env':>5} {'Rec':>5} "
+            f"{'Últ':>7} {'Media':>7} {'Mejor':>7} {'Peor':>7} {'P95':>7} {'Desv':>6}"
+        ]
+        for i in range(self.hop_count):
+            address = self.addresses[i] or '???'
+            if not self.received[i]:
+                lines.append(f"{i + 1:>4}.  {address:<39} {self.loss(i):>5.1f}% "
+                             f"{self.sent[i]:>5} {0:>5}")
+                continue
+            lines.append(
+                f"{i + 1:>4}.  {address:<39} {self.loss(i):>5.1f}% {self.sent[i]:>5} "
+                f"{self.received[i]:>5} {self.last[i]:>7.1f} {self.mean(i):>7.1f} "
+                f"{self.best[i]:>7.1f} {self.worst[i]:>7.1f} {self.percentile(i, 95):>7.1f} "
+                f"{self.stdev(i):>6.1f}"
+            )
+        return "\n".join(lines) + "\n"
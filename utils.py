@@ -5,9 +5,20 @@ import re
 import socket
 import subprocess
 import platform
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
 import ipaddress
+from history_store import HistoryStore
+from cancellation import Cancelled
+from instrumentation import span
+from results import NetworkDiagnosis, PingPacket, PingResult, PortResult, ResolveResult, WhoisResult
+
+TIMEOUT_ERROR = "Tiempo agotado"
 
 class NetworkUtils:
     """Utilidades de red para la aplicación"""
@@ -31,7 +42,17 @@ class NetworkUtils:
     
     @staticmethod
     def get_local_ip() -> str:
-        """Obtener IP local del sistema"""
+        """Obtener IP local del sistema (en caché hasta que cambie la red)"""
+        return NETWORK_STATE.local_ip()
+    
+    @staticmethod
+    def get_default_gateway() -> Optional[str]:
+        """Obtener gateway predeterminado (en caché hasta que cambie la red)"""
+        return NETWORK_STATE.gateway()
+    
+    @staticmethod
+    def discover_local_ip() -> str:
+        """Averiguar la IP local sin caché"""
         try:
             # Conectar a un servidor externo para determinar la IP local
             s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -39,12 +60,15 @@ class NetworkUtils:
             local_ip = s.getsockname()[0]
             s.close()
             return local_ip
-        except Exception:
+        except OSError:
             return "127.0.0.1"
     
     @staticmethod
-    def get_default_gateway() -> Optional[str]:
-        """Obtener gateway predeterminado"""
+    def discover_default_gateway() -> Optional[str]:
+        """Averiguar el gateway predeterminado sin caché"""
+        routes = NetworkState.read_routes()
+        if routes is not None:
+            return NetworkState.gateway_from_routes(routes)
         try:
             if platform.system().lower() == "windows":
                 result = subprocess.run(
@@ -67,118 +91,437 @@ class NetworkUtils:
                 match = re.search(r'default via (\d+\.\d+\.\d+\.\d+)', result.stdout)
                 if match:
                     return match.group(1)
-        except Exception:
+        except (OSError, subprocess.SubprocessError):
             pass
         return None
     
     @staticmethod
-    def ping_host(host: str, count: int = 4, timeout: int = 5) -> Dict:
-        """Hacer ping a un host y retornar estadísticas"""
+    def ping_host(host: str, count: int = 4, timeout: int = 5, max_time: float = 30) -> PingResult:
+        """Hacer ping a un host y retornar estadísticas (max_time acota el proceso completo)"""
         try:
             if platform.system().lower() == "windows":
                 cmd = ["ping", "-n", str(count), "-w", str(timeout * 1000), host]
             else:
                 cmd = ["ping", "-c", str(count), "-W", str(timeout), host]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            
-            # Parsear resultados
-            stats = {
-                'host': host,
-                'packets_sent': count,
-                'packets_received': 0,
-                'packet_loss': 100.0,
-                'min_time': None,
-                'max_time': None,
-                'avg_time': None,
-                'success': False
-            }
-            
-            if result.returncode == 0:
-                output = result.stdout
-                
-                # Buscar estadísticas de pérdida de paquetes
-                if platform.system().lower() == "windows":
-                    loss_match = re.search(r'\((\d+)% loss\)', output)
-                    if loss_match:
-                        stats['packet_loss'] = float(loss_match.group(1))
-                        stats['packets_received'] = count - int(count * stats['packet_loss'] / 100)
-                    
-                    # Buscar tiempos
-                    time_matches = re.findall(r'time[<=](\d+)ms', output)
-                    if time_matches:
-                        times = [int(t) for t in time_matches]
-                        stats['min_time'] = min(times)
-                        stats['max_time'] = max(times)
-                        stats['avg_time'] = sum(times) / len(times)
-                        stats['success'] = True
-                
-                else:  # Linux/Unix
-                    loss_match = re.search(r'(\d+)% packet loss', output)
-                    if loss_match:
-                        stats['packet_loss'] = float(loss_match.group(1))
-                        stats['packets_received'] = count - int(count * stats['packet_loss'] / 100)
-                    
-                    # Buscar estadísticas de tiempo
-                    time_match = re.search(r'min/avg/max.*?= ([\d.]+)/([\d.]+)/([\d.]+)', output)
-                    if time_match:
-                        stats['min_time'] = float(time_match.group(1))
-                        stats['avg_time'] = float(time_match.group(2))
-                        stats['max_time'] = float(time_match.group(3))
-                        stats['success'] = True
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=max_time)
             
-            return stats
+            # Parsear resultados con el mismo analizador que usa la terminal
+            parser = PingStreamParser(host, expected=count)
+            parser.feed(result.stdout)
+            parser.finish()
+            return parser.snapshot()
             
+        except subprocess.TimeoutExpired:
+            return PingResult(host, packets_sent=count, error=TIMEOUT_ERROR)
         except Exception as e:
-            return {
-                'host': host,
-                'error': str(e),
-                'success': False
-            }
+            return PingResult(host, packets_sent=count, error=str(e))
     
     @staticmethod
-    def resolve_hostname(hostname: str) -> Dict:
-        """Resolver hostname a IP"""
+    def resolve_hostname(hostname: str) -> ResolveResult:
+        """Resolver hostname a IPv4 e IPv6"""
+        addresses = {socket.AF_INET: [], socket.AF_INET6: []}
         try:
-            # Resolver IPv4
-            ipv4_addresses = []
-            try:
-                result = socket.getaddrinfo(hostname, None, socket.AF_INET)
-                ipv4_addresses = list(set([r[4][0] for r in result]))
-            except socket.gaierror:
-                pass
-            
-            # Resolver IPv6
-            ipv6_addresses = []
-            try:
-                result = socket.getaddrinfo(hostname, None, socket.AF_INET6)
-                ipv6_addresses = list(set([r[4][0] for r in result]))
-            except socket.gaierror:
-                pass
-            
-            return {
-                'hostname': hostname,
-                'ipv4_addresses': ipv4_addresses,
-                'ipv6_addresses': ipv6_addresses,
-                'success': bool(ipv4_addresses or ipv6_addresses)
-            }
-            
+            with span('resolve'):
+                infos = socket.getaddrinfo(hostname, None)
+            for family, _, _, _, sockaddr in infos:
+                if family in addresses and sockaddr[0] not in addresses[family]:
+                    addresses[family].append(sockaddr[0])
+        except socket.gaierror:
+            pass
         except Exception as e:
-            return {
-                'hostname': hostname,
-                'error': str(e),
-                'success': False
-            }
+            return ResolveResult(hostname, error=str(e))
+        return ResolveResult(hostname, tuple(addresses[socket.AF_INET]), tuple(addresses[socket.AF_INET6]))
+    
+    @staticmethod
+    def scan_port(host: str, port: int, timeout: float = 1.0, token=None) -> PortResult:
+        """Intentar una conexión TCP; socket.gaierror si el host no se resuelve.
 
-class ConfigManager:
-    """Gestor de configuración de la aplicación"""
+        Con un CancelToken la espera se interrumpe al cancelar (Cancelled).
+        """
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            started = time.perf_counter()
+            with span('connect'):
+                if token is None:
+                    s.settimeout(timeout)
+                    errno = s.connect_ex((host, port))
+                else:
+                    errno = token.connect_ex(s, (host, port), timeout)
+            rtt_ms = round((time.perf_counter() - started) * 1000, 3)
+        return PortResult(host, port, errno == 0, rtt_ms, errno)
     
-    def __init__(self, config_dir: str = "network_tools_config"):
+    @staticmethod
+    def whois_query(domain: str, server: str = "whois.iana.org", timeout: float = 10.0,
+                    port: int = 43, token=None) -> WhoisResult:
+        """Consultar un servidor WHOIS (puerto 43 salvo que se indique otro).
+
+        Con un CancelToken la conexión y la lectura se interrumpen al cancelar
+        y se devuelve lo recibido hasta entonces con el motivo como error.
+        """
+        chunks = []
+        try:
+            with span('connect'):
+                if token is None:
+                    connection = socket.create_connection((server, port), timeout=timeout)
+                else:
+                    connection = NetworkUtils._token_connection(server, port, timeout, token)
+            with connection as s:
+                s.sendall(f"{domain}\r\n".encode())
+                while True:
+                    data = s.recv(4096) if token is None else token.recv(s, 4096, timeout)
+                    if not data:
+                        break
+                    chunks.append(data)
+            return WhoisResult(domain, server, b"".join(chunks).decode(errors='ignore'))
+        except Cancelled as e:
+            return WhoisResult(domain, server, b"".join(chunks).decode(errors='ignore'), error=e.reason)
+        except OSError as e:
+            return WhoisResult(domain, server, error=str(e))
+
+    @staticmethod
+    def _token_connection(host: str, port: int, timeout: float, token) -> socket.socket:
+        """Como socket.create_connection, pero con la espera interrumpible por el token"""
+        error = None
+        for family, kind, proto, _, address in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM):
+            s = socket.socket(family, kind, proto)
+            try:
+                code = token.connect_ex(s, address, timeout)
+                if code == 0:
+                    s.settimeout(timeout)
+                    return s
+                error = OSError(code, os.strerror(code))
+            except BaseException:
+                s.close()
+                raise
+            s.close()
+        raise error or OSError(f"No se pudo conectar con {host}:{port}")
+
+class PingStreamParser:
+    """Analiza la salida de ping a medida que llega.
+
+    Reconoce las respuestas de Linux, BSD/macOS y Windows (en inglés y en
+    español), produce un PingPacket por respuesta o pérdida y mantiene las
+    estadísticas (pérdida, mín/media/máx y jitter) actualizadas en todo
+    momento. El resumen final de ping, si aparece, corrige los contadores.
+    """
+
+    REPLY = re.compile(r'bytes from|Reply from|Respuesta desde', re.IGNORECASE)
+    ADDRESS = re.compile(r'(?:from|desde)\s+(?:\S+ \()?([0-9A-Fa-f.:]+[0-9A-Fa-f])\)?')
+    SEQ = re.compile(r'icmp_seq[= ](\d+)')
+    TTL = re.compile(r'ttl=(\d+)', re.IGNORECASE)
+    RTT = re.compile(r'(?:time|tiempo)[=<]\s*([\d.]+)\s*ms', re.IGNORECASE)
+    LOST = re.compile(
+        r'Request timeout for icmp_seq|no answer yet for icmp_seq|Request timed out|'
+        r'Tiempo de espera agotado|unreachable|inaccesible', re.IGNORECASE)
+    SUMMARY = re.compile(
+        r'(\d+) packets transmitted, (\d+) (?:packets )?received|'
+        r'(?:Sent|enviados) = (\d+), (?:Received|recibidos) = (\d+)', re.IGNORECASE)
+
+    def __init__(self, host: str = '', expected: Optional[int] = None):
+        self.host = host
+        self.expected = expected
+        self.sent = 0
+        self.received = 0
+        self.summary_seen = False
+        self.min_rtt = None
+        self.max_rtt = None
+        self.total_rtt = 0.0
+        self.jitter_total = 0.0
+        self.jitter_samples = 0
+        self._last_rtt = None
+        self._first_seq = None
+        self._max_seq = None
+        self._events = 0
+        self._partial = ''
+
+    def feed(self, text: str) -> List[PingPacket]:
+        """Procesar un fragmento de salida y devolver los paquetes nuevos"""
+        lines = (self._partial + text).split('\n')
+        self._partial = lines.pop()
+        packets = []
+        for line in lines:
+            packet = self.parse_line(line)
+            if packet:
+                packets.append(packet)
+        return packets
+
+    def finish(self) -> List[PingPacket]:
+        """Procesar la última línea incompleta y aplicar el número de pings esperado"""
+        packets = self.feed('\n') if self._partial else []
+        if not self.summary_seen and self.expected:
+            self.sent = max(self.sent, self.expected)
+        return packets
+
+    def parse_line(self, line: str) -> Optional[PingPacket]:
+        summary = self.SUMMARY.search(line)
+        if summary:
+            sent, received = (summary.group(1), summary.group(2)) if summary.group(1) else summary.group(3, 4)
+            self.sent, self.received = int(sent), int(received)
+            self.summary_seen = True
+            return None
+
+        seq_match = self.SEQ.search(line)
+        seq = int(seq_match.group(1)) if seq_match else None
+        if seq is None and self._first_seq is None:
+            # Windows no numera las respuestas: se usa el orden de llegada
+            seq = self._events + 1
+        rtt_match = self.RTT.search(line) if self.REPLY.search(line) else None
+        if rtt_match:
+            address = self.ADDRESS.search(line)
+            ttl = self.TTL.search(line)
+            packet = PingPacket(seq, address.group(1) if address else None,
+                                int(ttl.group(1)) if ttl else None, float(rtt_match.group(1)))
+            self._add_reply(packet.rtt_ms)
+        elif self.LOST.search(line):
+            packet = PingPacket(seq, lost=True)
+        else:
+            return None
+
+        self._events += 1
+        if seq_match:
+            if self._first_seq is None:
+                # Linux numera desde 1 y BSD desde 0
+                self._first_seq = 0 if seq == 0 else 1
+            self._max_seq = seq if self._max_seq is None else max(self._max_seq, seq)
+        if not self.summary_seen:
+            by_seq = self._max_seq - self._first_seq + 1 if self._max_seq is not None else 0
+            self.sent = max(self._events, by_seq)
+        return packet
+
+    def _add_reply(self, rtt: float) -> None:
+        self.received += 1
+        self.total_rtt += rtt
+        self.min_rtt = rtt if self.min_rtt is None else min(self.min_rtt, rtt)
+        self.max_rtt = rtt if self.max_rtt is None else max(self.max_rtt, rtt)
+        # Jitter como media de la diferencia absoluta entre RTT consecutivos
+        if self._last_rtt is not None:
+            self.jitter_total += abs(rtt - self._last_rtt)
+            self.jitter_samples += 1
+        self._last_rtt = rtt
+
+    def snapshot(self) -> PingResult:
+        """Estadísticas actuales"""
+        sent = max(self.sent, self.received)
+        received_rtts = self.received if self.min_rtt is not None else 0
+        return PingResult(
+            self.host,
+            packets_sent=sent,
+            packets_received=self.received,
+            packet_loss=round(100.0 * (sent - self.received) / sent, 1) if sent else 100.0,
+            min_time=self.min_rtt,
+            avg_time=round(self.total_rtt / received_rtts, 3) if received_rtts else None,
+            max_time=self.max_rtt,
+            success=self.received > 0,
+            jitter=round(self.jitter_total / self.jitter_samples, 3) if self.jitter_samples else None
+        )
+
+
+class NetworkState:
+    """IP local y gateway en caché, invalidados cuando cambia la red.
+
+    En Linux la huella es el contenido de /proc/net/route y la lista de
+    interfaces, que se lee en microsegundos; en otros sistemas los valores
+    se renuevan cada TTL segundos. start_monitor() avisa a los suscriptores
+    cuando algo cambia.
+    """
+
+    ROUTE_FILE = "/proc/net/route"
+    TTL = 30.0
+    # Entre lecturas de la huella los valores se sirven sin tocar /proc
+    CHECK_INTERVAL = 1.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        self._checked_at = 0.0
+        self._fingerprint_at = 0.0
+        self._local_ip = None
+        self._gateway = None
+        self._valid = False
+        self._listeners = []
+        self._monitor = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def read_routes(cls) -> Optional[bytes]:
+        try:
+            with open(cls.ROUTE_FILE, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    @staticmethod
+    def gateway_from_routes(routes: bytes) -> Optional[str]:
+        """Gateway de la ruta por defecto de menor métrica en /proc/net/route"""
+        best = None
+        for line in routes.splitlines()[1:]:
+            fields = line.split()
+            if len(fields) < 7 or fields[1] != b'00000000' or not int(fields[3], 16) & 0x2:
+                continue
+            metric = int(fields[6])
+            if best is None or metric < best[0]:
+                best = (metric, socket.inet_ntoa(int(fields[2], 16).to_bytes(4, 'little')))
+        return best[1] if best else None
+
+    def fingerprint(self):
+        routes = self.read_routes()
+        if routes is None:
+            return None
+        try:
+            interfaces = tuple(socket.if_nameindex())
+        except OSError:
+            interfaces = ()
+        return routes, interfaces
+
+    def _current(self):
+        """Huella actual y si los valores en caché siguen valiendo (con el cerrojo tomado)"""
+        now = time.monotonic()
+        if self._valid and now - self._fingerprint_at < self.CHECK_INTERVAL:
+            return self._fingerprint, True
+        fingerprint = self.fingerprint()
+        self._fingerprint_at = now
+        if fingerprint is None:
+            fresh = now - self._checked_at < self.TTL
+        else:
+            fresh = fingerprint == self._fingerprint
+        return fingerprint, self._valid and fresh
+
+    def refresh(self, force: bool = False) -> bool:
+        """Volver a averiguar los valores si la red cambió; True si cambiaron"""
+        with self._lock:
+            fingerprint, fresh = self._current()
+            if fresh and not force:
+                return False
+            previous = (self._local_ip, self._gateway) if self._valid else None
+            self._local_ip = NetworkUtils.discover_local_ip()
+            self._gateway = NetworkUtils.discover_default_gateway()
+            self._fingerprint = fingerprint
+            self._checked_at = time.monotonic()
+            self._valid = True
+            current = (self._local_ip, self._gateway)
+        if current == previous:
+            return False
+        for listener in list(self._listeners):
+            listener(*current)
+        return True
+
+    def local_ip(self) -> str:
+        self.refresh()
+        return self._local_ip
+
+    def gateway(self) -> Optional[str]:
+        self.refresh()
+        return self._gateway
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._valid = False
+
+    def subscribe(self, listener: Callable[[str, Optional[str]], None]) -> None:
+        """Registrar listener(ip_local, gateway), llamado desde el hilo del monitor"""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def start_monitor(self, interval: float = 2.0) -> None:
+        """Averiguar los valores y comprobar la huella en segundo plano, avisando de los cambios"""
+        if self._monitor and self._monitor.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            self.refresh()
+            while not self._stop.wait(interval):
+                with self._lock:
+                    self._fingerprint_at = 0.0
+                self.refresh()
+
+        self._monitor = threading.Thread(target=run, name='network-monitor', daemon=True)
+        self._monitor.start()
+
+    def stop_monitor(self) -> None:
+        self._stop.set()
+
+
+NETWORK_STATE = NetworkState()
+
+
+def atomic_write_json(path: str, data) -> None:
+    """Escribir JSON en un temporal y renombrarlo: nunca queda un archivo a medias"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class ConfigManager:
+    """Gestor de configuración de la aplicación.
+
+    La configuración se lee una vez y se sirve desde memoria. Los cambios
+    avisan a los suscriptores al momento y se guardan en segundo plano,
+    agrupados (debounce) y de forma atómica, así que la interfaz nunca
+    espera al disco.
+    """
+
+    DEFAULTS = {
+        'last_tool': 'PING',
+        'window_geometry': '1200x800',
+        'theme': 'dark',
+        'auto_save_output': False,
+        'max_history_entries': 100,
+        'default_timeout': 300,
+        'terminal_font_size': 10,
+        'show_welcome_message': True,
+        'auto_scroll_output': True,
+        'save_window_position': True,
+        'max_workers': 4,
+        'terminal_max_lines': 5000,
+        'output_batch_interval_ms': 50,
+        'output_batch_max_bytes': 64 * 1024,
+        'output_time_budget_ms': 15,
+        # 0 = sin endpoint de métricas; con un puerto se publica /metrics en 127.0.0.1
+        'metrics_port': 0,
+        # Medición de tramos (instrumentation.py), activable desde su panel
+        'instrumentation': False,
+        # Caché de resultados de SUBNET, WHOIS y NSLOOKUP (0 entradas = desactivada)
+        'result_cache_entries': 256,
+        'result_cache_persist': True,
+        # Segundos de validez por herramienta que sustituyen a los de result_cache.DEFAULT_TTLS
+        'result_cache_ttls': {},
+    }
+
+    # Archivo de configuración que usaban versiones anteriores (junto a main.py)
+    LEGACY_CONFIG = "config.json"
+
+    def __init__(self, config_dir: str = "network_tools_config", save_delay: float = 0.5):
         self.config_dir = config_dir
         self.config_file = os.path.join(config_dir, "config.json")
         self.favorites_file = os.path.join(config_dir, "favorites.json")
         self.history_file = os.path.join(config_dir, "history.json")
+        self.history_db = os.path.join(config_dir, "history.sqlite3")
         self.templates_file = os.path.join(config_dir, "templates.json")
+        self.result_cache_file = os.path.join(config_dir, "result_cache.json")
+        self.save_delay = save_delay
+        self.load_error = None
+        self._config = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        # Un solo escritor a la vez: una copia antigua nunca reemplaza a otra más reciente
+        self._write_lock = threading.Lock()
+        self._timer = None
+        self._dirty = False
         
         self._ensure_config_dir()
     
@@ -187,39 +530,94 @@ class ConfigManager:
         if not os.path.exists(self.config_dir):
             os.makedirs(self.config_dir)
     
-    def load_config(self) -> Dict:
-        """Cargar configuración principal"""
-        default_config = {
-            'last_tool': 'PING',
-            'window_geometry': '1200x800',
-            'theme': 'dark',
-            'auto_save_output': False,
-            'max_history_entries': 100,
-            'default_timeout': 300,
-            'terminal_font_size': 10,
-            'show_welcome_message': True,
-            'auto_scroll_output': True,
-            'save_window_position': True
-        }
-        
+    def _read_config_file(self, path: str) -> Dict:
         try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    # Merge con configuración por defecto
-                    default_config.update(config)
-        except Exception as e:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("el contenido no es un objeto JSON")
+            return data
+        except (OSError, ValueError) as e:
+            self.load_error = f"{path}: {e}"
             print(f"Error cargando configuración: {e}")
-        
-        return default_config
+            return {}
+
+    def _loaded(self) -> Dict:
+        if self._config is None:
+            config = dict(self.DEFAULTS)
+            if os.path.exists(self.config_file):
+                config.update(self._read_config_file(self.config_file))
+            elif os.path.exists(self.LEGACY_CONFIG):
+                # Migración: se adopta el config.json antiguo y se guarda en el nuevo directorio
+                config.update(self._read_config_file(self.LEGACY_CONFIG))
+                self._dirty = True
+                self._schedule_save()
+            self._config = config
+        return self._config
+
+    def load_config(self) -> Dict:
+        """Copia de la configuración actual (leída una sola vez)"""
+        with self._lock:
+            return dict(self._loaded())
     
+    def get(self, key: str, default=None):
+        with self._lock:
+            return self._loaded().get(key, default)
+
+    def set(self, key: str, value) -> None:
+        self.update({key: value})
+
+    def update(self, values: Dict) -> None:
+        """Cambiar valores, avisar a los suscriptores y programar el guardado"""
+        with self._lock:
+            config = self._loaded()
+            changed = {key: value for key, value in values.items() if config.get(key) != value}
+            if not changed:
+                return
+            config.update(changed)
+            self._dirty = True
+            self._schedule_save()
+        for key, value in changed.items():
+            for listener in list(self._listeners):
+                listener(key, value)
+
+    def subscribe(self, listener: Callable[[str, object], None]) -> None:
+        """Registrar listener(clave, valor), llamado en el hilo que hace el cambio"""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
     def save_config(self, config: Dict):
-        """Guardar configuración"""
-        try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"Error guardando configuración: {e}")
+        """Guardar configuración (en segundo plano)"""
+        self.update(config)
+
+    def _schedule_save(self):
+        # Se llama con el cerrojo tomado; cada cambio reinicia la espera
+        if self._timer:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.save_delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self) -> None:
+        """Escribir ya los cambios pendientes (también al cerrar la aplicación)"""
+        with self._write_lock:
+            with self._lock:
+                if self._timer:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return
+                snapshot = dict(self._config)
+                self._dirty = False
+            try:
+                atomic_write_json(self.config_file, snapshot)
+            except OSError as e:
+                print(f"Error guardando configuración: {e}")
+                with self._lock:
+                    self._dirty = True
     
     def load_favorites(self) -> List[Dict]:
         """Cargar favoritos"""
@@ -234,29 +632,24 @@ class ConfigManager:
     def save_favorites(self, favorites: List[Dict]):
         """Guardar favoritos"""
         try:
-            with open(self.favorites_file, 'w', encoding='utf-8') as f:
-                json.dump(favorites, f, indent=2, ensure_ascii=False)
+            atomic_write_json(self.favorites_file, favorites)
         except Exception as e:
             print(f"Error guardando favoritos: {e}")
     
-    def load_history(self) -> List[Dict]:
-        """Cargar historial"""
-        try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"Error cargando historial: {e}")
-        return []
-    
-    def save_history(self, history: List[Dict]):
-        """Guardar historial"""
-        try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(history, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"Error guardando historial: {e}")
+    def open_history(self) -> HistoryStore:
+        """Abrir el historial en SQLite, importando el history.json antiguo si existe"""
+        store = HistoryStore(self.history_db, os.path.join(self.config_dir, "outputs"))
+        if os.path.exists(self.history_file):
+            store.import_legacy_json(self.history_file)
+        return store
     
+    def open_result_cache(self):
+        """Caché de resultados configurada (persistente en result_cache.json si así se indica)"""
+        # Import local: result_cache importa utils
+        from result_cache import ResultCache
+        path = self.result_cache_file if self.get('result_cache_persist') else None
+        return ResultCache(self.get('result_cache_ttls'), self.get('result_cache_entries'), path)
+
     def load_templates(self) -> List[Dict]:
         """Cargar plantillas de comandos"""
         default_templates = [
@@ -300,8 +693,7 @@ class ConfigManager:
     def save_templates(self, templates: List[Dict]):
         """Guardar plantillas"""
         try:
-            with open(self.templates_file, 'w', encoding='utf-8') as f:
-                json.dump(templates, f, indent=2, ensure_ascii=False)
+            atomic_write_json(self.templates_file, templates)
         except Exception as e:
             print(f"Error guardando plantillas: {e}")
 
@@ -386,13 +778,125 @@ class OutputFormatter:
         else:
             return output
 
+class StreamingFormatter:
+    """Resaltado incremental de la salida, línea a línea.
+
+    Las reglas de cada herramienta se preparan una sola vez: las palabras
+    clave se comprueban como subcadenas y los patrones se compilan como
+    expresiones ancladas, de modo que clasificar una línea cuesta unas
+    pocas comparaciones. El resultado son segmentos (texto, etiqueta) para
+    insertar con etiquetas de Tk en lugar de volver a pintar la salida.
+    """
+
+    # Reglas comunes a todas las herramientas (mensajes de la propia aplicación).
+    # Cada regla es (etiqueta, palabras clave, expresión regular o None).
+    COMMON_RULES = [
+        ('error', ('❌', 'Error:', 'Error '), None),
+        ('ok', ('✅',), None),
+        ('warn', ('⚠️',), None),
+        ('info', ('⏱️', '💡', '🔍'), None),
+    ]
+
+    TOOL_RULES = {
+        'PING': [
+            ('ok', ('bytes from', 'Reply from', 'Respuesta desde'), None),
+            ('warn', ('Request timed out', 'no answer', 'Tiempo de espera agotado'), None),
+            ('error', ('nreachable', 'inaccesible', 'nknown host', 'could not find host',
+                       'Name or service not known'), None),
+            ('info', ('packet loss', 'Packets:', 'Paquetes:', 'min/avg/max', 'round-trip',
+                      'Minimum =', 'Mínimo ='), None),
+        ],
+        'TRACERT': [
+            ('warn', (), r'\s*\d+(?:\s+\*)+\s*(?:Request timed out\.?|Tiempo de espera agotado.*)?$'),
+            ('ok', (), r'\s*\d+\s'),
+            ('info', ('Trace complete', 'Traza completa', 'traceroute to', 'Tracing route', 'Traza a'), None),
+        ],
+        'FASTTRACE': [
+            ('warn', ('No se alcanzó',), r'\s*\d+\s+\*\s*$'),
+            ('ok', (), r'\s*\d+\s'),
+            ('info', ('Ruta completa', 'Traceroute paralelo'), None),
+        ],
+        'NETSTAT': [
+            ('ok', ('ESTABLISHED', 'ESTABLECIDO'), None),
+            ('info', ('LISTEN', 'ESCUCHANDO'), None),
+            ('warn', ('TIME_WAIT', 'CLOSE_WAIT', 'FIN_WAIT', 'SYN_SENT', 'LAST_ACK'), None),
+        ],
+        'SCANNER': [
+            ('ok', ('Abierto',), r'.*abiertos: \d'),
+            ('muted', ('Cerrado',), None),
+        ],
+        'NSLOOKUP': [
+            ('error', ('NXDOMAIN', "can't find", 'no se puede encontrar'), None),
+            ('ok', (), r'(?:Address|Addresses|Dirección|Name|Nombre):'),
+        ],
+    }
+    TOOL_RULES['PATHPING'] = TOOL_RULES['TRACERT']
+
+    _cache = {}
+
+    def __init__(self, rules):
+        self.rules = [(tag, tuple(keywords), re.compile(regex).match if regex else None)
+                      for tag, keywords, regex in rules]
+        # Las mismas comprobaciones en una lista plana (palabra o expresión, etiqueta), en orden de prioridad
+        self._checks = []
+        for tag, keywords, match in self.rules:
+            self._checks.extend((keyword, None, tag) for keyword in keywords)
+            if match:
+                self._checks.append((None, match, tag))
+
+    @classmethod
+    def for_tool(cls, tool_key: Optional[str]) -> 'StreamingFormatter':
+        """Formateador (preparado una vez y reutilizado) para una herramienta"""
+        formatter = cls._cache.get(tool_key)
+        if formatter is None:
+            formatter = cls(cls.TOOL_RULES.get(tool_key, []) + cls.COMMON_RULES)
+            cls._cache[tool_key] = formatter
+        return formatter
+
+    def tag_for(self, line: str) -> str:
+        """Etiqueta de la primera regla que coincide con la línea ('' si ninguna)"""
+        for keyword, match, tag in self._checks:
+            if keyword is not None:
+                if keyword in line:
+                    return tag
+            elif match(line):
+                return tag
+        return ''
+
+    def segments(self, text: str, prefix: str = '') -> List[Tuple[str, str]]:
+        """Dividir el texto en segmentos (texto, etiqueta) uniendo líneas consecutivas con la misma etiqueta"""
+        segments = []
+        append = segments.append
+        checks = self._checks
+        current_tag = None
+        current = []
+        # tag_for() en línea para ahorrar una llamada por línea
+        for line in text.splitlines(True):
+            for keyword, match, tag in checks:
+                if keyword is not None:
+                    if keyword in line:
+                        break
+                elif match(line):
+                    break
+            else:
+                tag = ''
+            if tag != current_tag:
+                if current:
+                    append((prefix + prefix.join(current) if prefix else ''.join(current), current_tag))
+                current, current_tag = [line], tag
+            else:
+                current.append(line)
+        if current:
+            append((prefix + prefix.join(current) if prefix else ''.join(current), current_tag))
+        return segments
+
 class SystemInfo:
     """Información del sistema y diagnósticos"""
     
     @staticmethod
-    def get_system_info() -> Dict:
-        """Obtener información completa del sistema"""
-        return {
+    def get_system_info(network: bool = True) -> Dict:
+        """Obtener información completa del sistema (network=False omite IP y gateway)"""
+        info = {
             'platform': platform.system(),
             'platform_release': platform.release(),
             'platform_version': platform.version(),
@@ -400,61 +904,96 @@ class SystemInfo:
             'hostname': platform.node(),
             'processor': platform.processor(),
             'python_version': platform.python_version(),
-            'local_ip': NetworkUtils.get_local_ip(),
-            'default_gateway': NetworkUtils.get_default_gateway()
         }
+        if network:
+            info['local_ip'] = NetworkUtils.get_local_ip()
+            info['default_gateway'] = NetworkUtils.get_default_gateway()
+        return info
     
+    DNS_SERVERS = ('8.8.8.8', '1.1.1.1')
+    TEST_DOMAINS = ('google.com', 'github.com')
+
     @staticmethod
-    def diagnose_network() -> Dict:
-        """Realizar diagnóstico básico de red"""
-        results = {}
-        
-        # Test conectividad local
-        local_ip = NetworkUtils.get_local_ip()
-        results['local_connectivity'] = {
-            'ip': local_ip,
-            'reachable': local_ip != '127.0.0.1'
-        }
-        
-        # Test gateway
-        gateway = NetworkUtils.get_default_gateway()
-        if gateway:
-            ping_result = NetworkUtils.ping_host(gateway, count=2)
-            results['gateway_connectivity'] = {
-                'gateway': gateway,
-                'reachable': ping_result.get('success', False),
-                'avg_time': ping_result.get('avg_time')
-            }
-        
-        # Test DNS
-        dns_servers = ['8.8.8.8', '1.1.1.1']
-        results['dns_connectivity'] = {}
-        
-        for dns in dns_servers:
-            ping_result = NetworkUtils.ping_host(dns, count=2)
-            results['dns_connectivity'][dns] = {
-                'reachable': ping_result.get('success', False),
-                'avg_time': ping_result.get('avg_time')
-            }
-        
-        # Test resolución DNS
-        test_domains = ['google.com', 'github.com']
-        results['dns_resolution'] = {}
-        
-        for domain in test_domains:
-            resolve_result = NetworkUtils.resolve_hostname(domain)
-            results['dns_resolution'][domain] = {
-                'resolvable': resolve_result.get('success', False),
-                'ipv4_addresses': resolve_result.get('ipv4_addresses', [])
-            }
-        
-        return results
+    def diagnose_network(deadline: float = 5.0,
+                         on_result: Optional[Callable[[str, object], None]] = None) -> NetworkDiagnosis:
+        """Realizar diagnóstico básico de red con todas las pruebas en paralelo.
+
+        Ninguna prueba espera a otra y el conjunto se corta a los deadline
+        segundos: lo que no haya respondido se marca en timed_out.
+        on_result(prueba, resultado) se llama a medida que llegan.
+        """
+        started = time.monotonic()
+        finish_at = started + deadline
+
+        def remaining():
+            return max(finish_at - time.monotonic(), 0.1)
+
+        def ping(host):
+            # El proceso de ping nunca sobrevive al plazo del diagnóstico
+            return NetworkUtils.ping_host(host, count=2, timeout=max(1, min(5, int(remaining()))),
+                                          max_time=remaining())
+
+        diagnosis = NetworkDiagnosis('127.0.0.1')
+
+        def gateway_check():
+            # El gateway queda anotado aunque su ping no llegue a tiempo
+            diagnosis.gateway = NetworkUtils.get_default_gateway()
+            return diagnosis.gateway, ping(diagnosis.gateway) if diagnosis.gateway else None
+
+        checks = {'local_ip': NetworkUtils.get_local_ip, 'gateway': gateway_check}
+        for dns in SystemInfo.DNS_SERVERS:
+            checks[f'dns:{dns}'] = partial(ping, dns)
+        for domain in SystemInfo.TEST_DOMAINS:
+            checks[f'resolve:{domain}'] = partial(NetworkUtils.resolve_hostname, domain)
+
+        executor = ThreadPoolExecutor(max_workers=len(checks), thread_name_prefix='diagnose')
+        futures = {executor.submit(check): name for name, check in checks.items()}
+        try:
+            for future in as_completed(futures, timeout=remaining()):
+                name = futures[future]
+                result = SystemInfo._store_check(diagnosis, name, future.result())
+                if on_result:
+                    on_result(name, result)
+        except FuturesTimeout:
+            pass
+        finally:
+            # No se espera a las pruebas colgadas (p. ej. getaddrinfo sin red)
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        for future, name in futures.items():
+            if not future.done():
+                diagnosis.timed_out.append(name)
+                result = SystemInfo._store_check(diagnosis, name, None)
+                if on_result:
+                    on_result(name, result)
+        diagnosis.elapsed = round(time.monotonic() - started, 3)
+        return diagnosis
+
+    @staticmethod
+    def _store_check(diagnosis: NetworkDiagnosis, name: str, result):
+        """Guardar en el diagnóstico el resultado de una prueba (None = tiempo agotado)"""
+        kind, _, target = name.partition(':')
+        if kind == 'local_ip':
+            diagnosis.local_ip = result or diagnosis.local_ip
+        elif kind == 'gateway':
+            if result is None:
+                return None
+            diagnosis.gateway, diagnosis.gateway_ping = result
+        elif kind == 'dns':
+            result = result or PingResult(target, error=TIMEOUT_ERROR)
+            diagnosis.dns_pings[target] = result
+        elif kind == 'resolve':
+            result = result or ResolveResult(target, error=TIMEOUT_ERROR)
+            diagnosis.resolutions[target] = result
+        return result
     
     @staticmethod
-    def generate_network_report() -> str:
+    def generate_network_report(deadline: float = 5.0,
+                                on_result: Optional[Callable[[str, object], None]] = None) -> str:
         """Generar reporte completo de red"""
-        system_info = SystemInfo.get_system_info()
-        network_diag = SystemInfo.diagnose_network()
+        system_info = SystemInfo.get_system_info(network=False)
+        network_diag = SystemInfo.diagnose_network(deadline, on_result)
+        timed_out = set(network_diag.timed_out)
         
         report = f"""
 🖥️ REPORTE DE DIAGNÓSTICO DE RED
@@ -464,38 +1003,46 @@ class SystemInfo:
 • Sistema Operativo: {system_info['platform']} {system_info['platform_release']}
 • Arquitectura: {system_info['architecture']}
 • Hostname: {system_info['hostname']}
-• IP Local: {system_info['local_ip']}
-• Gateway: {system_info['default_gateway'] or 'No detectado'}
+• IP Local: {network_diag.local_ip}
+• Gateway: {network_diag.gateway or ('⏱️ Sin respuesta' if 'gateway' in timed_out else 'No detectado')}
 
 🌐 CONECTIVIDAD DE RED:
 """
         
         # Conectividad local
-        local_conn = network_diag['local_connectivity']
-        status = "✅ Activa" if local_conn['reachable'] else "❌ Inactiva"
-        report += f"• Conectividad Local: {status} ({local_conn['ip']})\n"
+        status = "✅ Activa" if network_diag.local_connectivity else "❌ Inactiva"
+        report += f"• Conectividad Local: {status} ({network_diag.local_ip})\n"
         
         # Conectividad gateway
-        if 'gateway_connectivity' in network_diag:
-            gw_conn = network_diag['gateway_connectivity']
-            status = "✅ Alcanzable" if gw_conn['reachable'] else "❌ No alcanzable"
-            avg_time = f" ({gw_conn['avg_time']:.1f}ms)" if gw_conn['avg_time'] else ""
-            report += f"• Gateway: {status} ({gw_conn['gateway']}){avg_time}\n"
+        if network_diag.gateway_ping:
+            gw_ping = network_diag.gateway_ping
+            status = "✅ Alcanzable" if gw_ping.success else SystemInfo._failure(gw_ping, "❌ No alcanzable")
+            avg_time = f" ({gw_ping.avg_time:.1f}ms)" if gw_ping.avg_time else ""
+            report += f"• Gateway: {status} ({network_diag.gateway}){avg_time}\n"
+        elif 'gateway' in timed_out:
+            gateway = f" ({network_diag.gateway})" if network_diag.gateway else ""
+            report += f"• Gateway: ⏱️ Sin respuesta (tiempo agotado){gateway}\n"
         
         # DNS
         report += "\n🔍 SERVIDORES DNS:\n"
-        for dns, info in network_diag['dns_connectivity'].items():
-            status = "✅ Alcanzable" if info['reachable'] else "❌ No alcanzable"
-            avg_time = f" ({info['avg_time']:.1f}ms)" if info['avg_time'] else ""
+        for dns, ping in network_diag.dns_pings.items():
+            status = "✅ Alcanzable" if ping.success else SystemInfo._failure(ping, "❌ No alcanzable")
+            avg_time = f" ({ping.avg_time:.1f}ms)" if ping.avg_time else ""
             report += f"• {dns}: {status}{avg_time}\n"
         
         # Resolución DNS
         report += "\n🌍 RESOLUCIÓN DNS:\n"
-        for domain, info in network_diag['dns_resolution'].items():
-            status = "✅ Funcional" if info['resolvable'] else "❌ Falla"
-            ips = ", ".join(info['ipv4_addresses'][:2]) if info['ipv4_addresses'] else "No resuelto"
+        for domain, resolution in network_diag.resolutions.items():
+            status = "✅ Funcional" if resolution.success else SystemInfo._failure(resolution, "❌ Falla")
+            ips = ", ".join(resolution.ipv4_addresses[:2]) if resolution.ipv4_addresses else "No resuelto"
             report += f"• {domain}: {status} → {ips}\n"
         
-        report += f"\n📅 Reporte generado: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+        if timed_out:
+            report += f"\n⏱️ Sin respuesta en {deadline:g}s: {', '.join(network_diag.timed_out)}\n"
+        report += f"\n📅 Reporte generado: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ({network_diag.elapsed:.1f}s)\n"
         
-        return report
\ No newline at end of file
+        return report
+
+    @staticmethod
+    def _failure(result, default: str) -> str:
+        return "⏱️ Sin respuesta (tiempo agotado)" if result.error == TIMEOUT_ERROR else default
@@ -0,0 +1,218 @@
+# wol.py - Wake-on-LAN masivo: inventario, broadcast dirigido por interfaz y verificación
+import ipaddress
+import os
+import re
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+from cancellation import CancelToken
+from utils import NetworkState, NetworkUtils
+
+WOL_PORT = 9
+GLOBAL_BROADCAST = '255.255.255.255'
+
+MAC = re.compile(r'^[0-9A-Fa-f]{2}([:-]?)(?:[0-9A-Fa-f]{2}\1){4}[0-9A-Fa-f]{2}$')
+SEPARATORS = re.compile(r'[\s,;]+')
+
+
+def parse_mac(text: str) -> bytes:
+    """Bytes de una MAC (aa:bb:cc:dd:ee:ff, aa-bb-..., aabbccddeeff); ValueError si no lo es"""
+    text = text.strip()
+    if not MAC.match(text):
+        raise ValueError(f"Dirección MAC inválida: {text}")
+    return bytes.fromhex(text.replace(':', '').replace('-', ''))
+
+
+def magic_packet(mac: bytes) -> bytes:
+    return b'\xff' * 6 + mac * 16
+
+
+@dataclass(slots=True)
+class WolTarget:
+    """Un equipo del inventario: MAC y, si se conocen, su IP y su nombre"""
+    mac: bytes
+    ip: Optional[str] = None
+    name: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        return self.name or self.ip or self.mac.hex(':')
+
+
+def _parse_line(line: str) -> Optional[WolTarget]:
+    mac, ip, names = None, None, []
+    for token in SEPARATORS.split(line.strip()):
+        if not token:
+            continue
+        if mac is None and MAC.match(token):
+            mac = parse_mac(token)
+        elif ip is None and NetworkUtils.validate_ip_address(token):
+            ip = token
+        else:
+            names.append(token)
+    if mac is None:
+        return None
+    return WolTarget(mac, ip, ' '.join(names) or None)
+
+
+def parse_targets(source: str) -> List[WolTarget]:
+    """Equipos de una lista de MACs o de un archivo de inventario.
+
+    Cada línea del inventario lleva una MAC y opcionalmente una IP y un
+    nombre, separados por espacios, comas o punto y coma (sirve un CSV).
+    Las líneas en blanco y los comentarios (#) se ignoran, y la primera
+    línea puede ser una cabecera sin MAC. Una MAC repetida cuenta una vez.
+    """
+    from_file = os.path.isfile(source)
+    if from_file:
+        with open(source, 'r', encoding='utf-8-sig') as f:
+            lines = f.read().splitlines()
+    else:
+        # En línea: las MACs van separadas por comas, espacios o punto y coma
+        lines = [token for token in SEPARATORS.split(source) if token]
+    targets, seen = [], set()
+    for number, line in enumerate(lines, 1):
+        line = line.split('#', 1)[0]
+        if not line.strip():
+            continue
+        target = _parse_line(line)
+        if target is None:
+            if number == 1 and from_file:
+                continue
+            if not from_file:
+                raise ValueError(f"Dirección MAC inválida: {line}")
+            raise ValueError(f"Línea {number}: no contiene una dirección MAC válida: {line.strip()}")
+        if target.mac not in seen:
+            seen.add(target.mac)
+            targets.append(target)
+    if not targets:
+        raise ValueError("No se indicó ninguna dirección MAC")
+    return targets
+
+
+def interface_networks() -> List[Tuple[str, ipaddress.IPv4Network]]:
+    """Redes IPv4 conectadas a cada interfaz (sin loopback)"""
+    networks = []
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        for interface, addresses in psutil.net_if_addrs().items():
+            for address in addresses:
+                if address.family != socket.AF_INET or not address.netmask:
+                    continue
+                network = ipaddress.ip_network(f"{address.address}/{address.netmask}", strict=False)
+                if not network.is_loopback and network.prefixlen < 32:
+                    networks.append((interface, network))
+        return networks
+    # Sin psutil: las rutas directas (sin gateway) de /proc/net/route
+    routes = NetworkState.read_routes()
+    for line in (routes or b'').splitlines()[1:]:
+        fields = line.split()
+        if len(fields) < 8 or fields[1] == b'00000000' or fields[2] != b'00000000':
+            continue
+        destination = socket.inet_ntoa(int(fields[1], 16).to_bytes(4, 'little'))
+        mask = socket.inet_ntoa(int(fields[7], 16).to_bytes(4, 'little'))
+        network = ipaddress.ip_network(f"{destination}/{mask}", strict=False)
+        if not network.is_loopback and network.prefixlen < 32:
+            networks.append((fields[0].decode(), network))
+    return networks
+
+
+def broadcast_addresses(target: WolTarget, networks: List[Tuple[str, ipaddress.IPv4Network]]) -> List[str]:
+    """Broadcast dirigido de la red del equipo, o de todas las interfaces si no se sabe cuál es"""
+    if target.ip:
+        address = ipaddress.ip_address(target.ip)
+        matching = [str(network.broadcast_address) for _, network in networks
+                    if address.version == 4 and address in network]
+        if matching:
+            return matching[:1]
+    broadcasts = sorted({str(network.broadcast_address) for _, network in networks})
+    return broadcasts or [GLOBAL_BROADCAST]
+
+
+class BulkWakeOnLan:
+    """Envío de paquetes mágicos a muchos equipos desde un único socket.
+
+    Cada ronda manda un paquete por equipo y broadcast, separados por pace
+    segundos para no saturar los conmutadores; las rondas se repiten
+    repeats veces con interval segundos entre ellas, porque un paquete
+    UDP perdido no se reintenta solo.
+    """
+
+    def __init__(self, targets: List[WolTarget], repeats: int = 3, pace: float = 0.002,
+                 interval: float = 0.5, port: int = WOL_PORT,
+                 networks: Optional[List[Tuple[str, ipaddress.IPv4Network]]] = None):
+        self.targets = targets
+        self.repeats = repeats
+        self.pace = pace
+        self.interval = interval
+        self.port = port
+        self.networks = interface_networks() if networks is None else networks
+        self.plan = [(target, magic_packet(target.mac), broadcast_addresses(target, self.networks))
+                     for target in targets]
+
+    def send(self, token: Optional[CancelToken] = None,
+             on_round: Optional[Callable[[int, int], None]] = None) -> int:
+        """Enviar todas las rondas; devuelve los paquetes enviados (menos si se cancela)"""
+        token = token or CancelToken()
+        sent = 0
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            for round_number in range(1, self.repeats + 1):
+                for target, packet, broadcasts in self.plan:
+                    for broadcast in broadcasts:
+                        if token.cancelled:
+                            return sent
+                        s.sendto(packet, (broadcast, self.port))
+                        sent += 1
+                        if self.pace:
+                            token.wait(self.pace)
+                if on_round:
+                    on_round(round_number, sent)
+                if round_number < self.repeats and self.interval and token.wait(self.interval):
+                    return sent
+        return sent
+
+
+def verify_awake(targets: Iterable[WolTarget], duration: float, token: Optional[CancelToken] = None,
+                 on_up: Optional[Callable[[WolTarget, float], None]] = None, workers: int = 64,
+                 round_interval: float = 2.0) -> Set[bytes]:
+    """Barrido de ping concurrente hasta que respondan todos o pasen duration segundos.
+
+    Solo se comprueban los equipos con IP; devuelve las MACs de los que
+    respondieron. on_up recibe el equipo y los segundos que tardó. Al
+    cancelar se vuelve enseguida y los ping en curso terminan solos.
+    """
+    token = token or CancelToken()
+    pending = {target.mac: target for target in targets if target.ip}
+    up: Set[bytes] = set()
+    if not pending:
+        return up
+    started = time.monotonic()
+    deadline = started + duration
+    executor = ThreadPoolExecutor(max_workers=min(workers, len(pending)), thread_name_prefix='wol-verify')
+    try:
+        while pending and not token.cancelled and time.monotonic() < deadline:
+            round_started = time.monotonic()
+            waiting = {executor.submit(NetworkUtils.ping_host, target.ip, 1, 1, 3): target
+                       for target in pending.values()}
+            while waiting and not token.cancelled:
+                done, _ = wait(waiting, timeout=0.05, return_when=FIRST_COMPLETED)
+                for future in done:
+                    target = waiting.pop(future)
+                    if future.result().success:
+                        up.add(target.mac)
+                        del pending[target.mac]
+                        if on_up:
+                            on_up(target, time.monotonic() - started)
+            if pending:
+                token.wait(min(round_interval - (time.monotonic() - round_started),
+                               deadline - time.monotonic()))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return up